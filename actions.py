@@ -3,9 +3,21 @@
 
 __license__ = "MIT"
 
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from download_scheduler import DownloadScheduler
+from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
 from humble_download import HumbleDownload
+from profiler import Profiler
 from progress_tracker import ProgressTracker
+from run_journal import RunJournal
+from sync_index import SyncIndex
 from config_data import ConfigData
+from dedup import Dedup
 import logger
 
 
@@ -14,7 +26,8 @@ class Action:
     def list_downloads(hapi, game_keys):
         for key in game_keys:
             selector_matched_key_once = False
-            current_order = hapi.get_order(key)
+            # Cached orders may hold expired download urls.
+            current_order = hapi.get_order(key, refresh=ConfigData.print_url)
 
             for current_subproduct in current_order.subproducts or []:
                 selector_matched_subproduct_once = False
@@ -43,9 +56,33 @@ class Action:
                                                  dl_struct.download_web)
                         print(string)
 
+    @staticmethod
+    def manage_state():
+        """
+            Imports or exports the .md5 files of the download location from or
+            to the state database.
+
+            :return:  None
+        """
+        if not HumbleState.enabled():
+            logger.display_message(False, "State",
+                                   "The state database is disabled.")
+            return
+        if ConfigData.import_md5:
+            logger.display_message(
+                    False, "State", "Imported %d checksums." %
+                    HumbleHash.import_md5files(ConfigData.download_location))
+        if ConfigData.export_md5:
+            logger.display_message(
+                    False, "State", "Exported %d checksums." %
+                    HumbleHash.export_md5files())
+
     @staticmethod
     def batch_download(hapi, game_keys):
+        if Action.resume_interrupted(hapi, game_keys):
+            return
         ProgressTracker.reset()
+        Dedup.reset()
         ProgressTracker.item_count_total = len(game_keys)
         download_size_total = 0
         item_count_total = 0
@@ -53,17 +90,17 @@ class Action:
         # Create initial list of Humble Downloads.
         # Platforms that are turned off are filtered here, and the download
         # size is computed. Checksums are also calculated for finished
-        # downloads. This initial query could be paralelized for speed gains
-        for key in game_keys:
+        # downloads. Orders are retrieved by a pool of workers, but results
+        # are consumed in the order of game_keys so the output stays stable.
+        for key, humble_downloads in Action.needed_downloads_from_keys(
+                hapi, game_keys):
             ProgressTracker.item_count_current += 1
             logger.display_message(
                     False, "Processing",
-                    "Retrieving order details for order %s (%d/%d)." %
+                    "Retrieved order details for order %s (%d/%d)." %
                     (key, ProgressTracker.item_count_current,
                      ProgressTracker.item_count_total))
 
-            humble_downloads = HumbleDownload.needed_downloads_from_key(hapi,
-                                                                        key)
             item_count_total += len(humble_downloads)
             download_size_total += sum(
                     dl.humble_file_size for dl in humble_downloads)
@@ -78,22 +115,366 @@ class Action:
         ProgressTracker.item_count_total = item_count_total
         ProgressTracker.download_size_total = download_size_total
 
-        # Now, download the files after updating the url in case they expired
+        # Now, download the files. Urls which expired since the orders were
+        # retrieved are refreshed when the server rejects them.
+        humble_downloads = []
         for key in key_downloads:
-            HumbleDownload.update_download_list_url(
-                    hapi, key_downloads.get(key))
-            for hd in key_downloads.get(key):
-                ProgressTracker.assign_download(hd)
-                ProgressTracker.display_summary()
-                logger.display_message(False, "Download", hd.status_message)
+            humble_downloads.extend(key_downloads.get(key))
+
+        RunJournal.begin()
+        RunJournal.plan(humble_downloads)
+        RunJournal.scanned()
+
+        scheduler = DownloadScheduler(ConfigData.download_workers,
+                                      ConfigData.host_connections,
+                                      ConfigData.download_order)
+        scheduler.run(humble_downloads, lambda hd: Action.download(hapi, hd))
+
+        RunJournal.end()
+        Dedup.report()
+        logger.display_message(False, "Processing", "Finished.")
+
+    @staticmethod
+    def resume_interrupted(hapi, game_keys):
+        """
+            Resumes the run interrupted with a complete RunJournal, if any:
+            the files left of the orders of game_keys are transferred without
+            scanning the orders, and partial files are resumed.  The files of
+            other orders, and orders added since, are left to the next run.
+
+            :param hapi:  The HumbleApi instance used to refresh expired urls.
+            :param game_keys:  The list of keys to download.
+            :return:  True if an interrupted run was resumed.
+        """
+        journal = None if ConfigData.rescan else RunJournal.load()
+        if journal is None:
+            return False
+
+        # Platforms turned off since the journal was written are left out.
+        requested_keys = set(game_keys)
+        planned = [HumbleDownload.from_dict(download)
+                   for download in journal["remaining"]]
+        humble_downloads = [
+                hd for hd in planned
+                if hd.order_number in requested_keys and
+                ConfigData.download_platforms.get(hd.platform, False)]
+        logger.display_message(
+                False, "Processing",
+                "Resuming an interrupted run without scanning the orders: "
+                "%d files left, %d in flight and %d failed." %
+                (len(humble_downloads), len(journal["in_flight"]),
+                 len(journal["failed"])))
+        skipped_keys = set(hd.order_number for hd in planned) - requested_keys
+        if len(skipped_keys) > 0:
+            logger.display_message(
+                    False, "Processing",
+                    "%d orders of the interrupted run were not requested, "
+                    "their files are left to the next run." %
+                    len(skipped_keys))
+        RunJournal.reopen()
+
+        # A file in flight may have been completed just before the
+        # interruption, the others are not checked again.
+        remaining = []
+        for hd in humble_downloads:
+            if hd.full_filename in journal["in_flight"] and hd.check_status():
+                RunJournal.finished(hd, True)
+            else:
+                remaining.append(hd)
+
+        ProgressTracker.reset()
+        Dedup.reset()
+        ProgressTracker.item_count_total = len(remaining)
+        ProgressTracker.download_size_total = sum(
+                hd.humble_file_size or 0 for hd in remaining)
+        scheduler = DownloadScheduler(ConfigData.download_workers,
+                                      ConfigData.host_connections,
+                                      ConfigData.download_order)
+        scheduler.run(remaining, lambda hd: Action.download(hapi, hd))
+
+        RunJournal.end()
+        Dedup.report()
+        logger.display_message(False, "Processing", "Finished.")
+        return True
+
+    @staticmethod
+    def pipeline_download(hapi, game_keys):
+        """
+            Downloads the files of game_keys like batch_download, but as a
+            pipeline: a pool of ConfigData.order_workers threads retrieves the
+            orders, another pool checks the status of their files, and the
+            files needed are handed to the DownloadScheduler as soon as they
+            are found.  The first transfer starts once the first order is
+            checked instead of after the whole library, and the stages are
+            connected by queues of at most ConfigData.pipeline_queue orders
+            and files, so memory does not grow with the size of the library.
+            The totals of the progress grow as orders are checked.
+
+            :param hapi:  The HumbleApi instance used to retrieve the orders.
+            :param game_keys:  The list of keys to download.
+            :return:  None
+        """
+        if Action.resume_interrupted(hapi, game_keys):
+            return
+        ProgressTracker.reset()
+        Dedup.reset()
+        RunJournal.begin()
+        orders = queue.Queue(ConfigData.pipeline_queue)
+        scheduler = DownloadScheduler(ConfigData.download_workers,
+                                      ConfigData.host_connections,
+                                      ConfigData.download_order,
+                                      ConfigData.pipeline_queue)
+        keys = iter(game_keys)
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+        order_count = [0]
+
+        def fail(e):
+            with lock:
+                errors.append(e)
+            stop.set()
+
+        def fetch():
+            while not stop.is_set():
+                with lock:
+                    key = next(keys, None)
+                if key is None:
+                    return
+                try:
+                    orders.put((key, HumbleDownload.downloads_from_key(
+                            hapi, key)))
+                except Exception as e:
+                    fail(e)
+
+        def check():
+            # Orders are taken until the end of the queue even after a
+            # failure, so that fetch() never waits for room forever.
+            while True:
+                item = orders.get()
+                if item is None:
+                    return
+                if stop.is_set():
+                    continue
+                key, humble_downloads = item
+                try:
+                    humble_downloads = HumbleDownload.needed_downloads(
+                            humble_downloads, key)
+                    RunJournal.plan(humble_downloads)
+                except Exception as e:
+                    fail(e)
+                    continue
+
+                with ProgressTracker.lock:
+                    order_count[0] += 1
+                    ProgressTracker.item_count_total += len(humble_downloads)
+                    ProgressTracker.download_size_total += sum(
+                            hd.humble_file_size or 0
+                            for hd in humble_downloads)
+                    logger.display_message(
+                            False, "Processing",
+                            "Added %d downloads for order %s (%d/%d)." %
+                            (len(humble_downloads), key, order_count[0],
+                             len(game_keys)))
+                for hd in humble_downloads:
+                    if not scheduler.submit(hd):
+                        stop.set()
+                        break
+
+        workers = max(1, ConfigData.order_workers)
+        fetchers = [threading.Thread(target=fetch, name="fetch-%d" % i,
+                                     daemon=True) for i in range(workers)]
+        checkers = [threading.Thread(target=check, name="check-%d" % i,
+                                     daemon=True) for i in range(workers)]
+        scheduler.start(lambda hd: Action.download(hapi, hd))
+        for thread in fetchers + checkers:
+            thread.start()
+
+        for thread in fetchers:
+            thread.join()
+        for _ in checkers:
+            orders.put(None)
+        for thread in checkers:
+            thread.join()
+        if len(errors) == 0 and not stop.is_set():
+            RunJournal.scanned()
+        scheduler.close()
+        scheduler.join()
+        if len(errors) > 0:
+            raise errors[0]
+
+        RunJournal.end()
+        Dedup.report()
+        logger.display_message(False, "Processing", "Finished.")
+
+    @staticmethod
+    def download(hapi, hd):
+        """
+            Downloads a single file and accounts for it in the ProgressTracker.
+            Called from the DownloadScheduler worker threads.  A file already
+            present locally under another path is placed from it by Dedup
+            instead, after any running download of the same file.
+
+            :param hapi:  The HumbleApi instance used to refresh expired urls.
+            :param hd:  The HumbleDownload to transfer.
+            :return:  None
+        """
+        ProgressTracker.start_download(hd)
+        ProgressTracker.display_summary()
+        logger.display_message(False, "Download", hd.status_message)
+        RunJournal.started(hd)
+        success = False
+        try:
+            with Dedup.lock(hd.humble_md5):
+                if Dedup.link(hd):
+                    success = True
+                    return
                 logger.display_message(
                         False, "Download",
                         "Downloading %s." % hd.humble_file_size_human)
-                hd.download_file()
+                with Profiler.phase("transfer"):
+                    hd.download_file(hapi)
+                success = not hd.status_message
+        finally:
+            ProgressTracker.finish_download(hd)
+            SyncIndex.finish(hd, success)
+            RunJournal.finished(hd, success)
+
+    @staticmethod
+    def verify(hapi, game_keys):
+        """
+            Hashes every downloaded file of the library on a pool of threads
+            and reports mismatching, missing and orphaned files.  hashlib
+            releases the GIL while hashing, so threads use every core; reads
+            are limited to ConfigData.disk_readers files per device.
 
-                if hd.humble_file_size is not None:
-                    ProgressTracker.download_size_current += (
-                            hd.humble_file_size)
-                ProgressTracker.item_count_current += 1
+            :param hapi:  The HumbleApi instance used to retrieve the orders.
+            :param game_keys:  The list of keys to verify.
+            :return:  None
+        """
+        expected = []
+        for _, humble_downloads in Action.map_orders(
+                hapi, game_keys, HumbleDownload.downloads_from_key):
+            expected.extend(humble_downloads)
+        # Files sharing their path with another one were saved by Dedup
+        # under a distinct filename.
+        Dedup.reset()
+        for hd in expected:
+            Dedup.claim(hd)
 
-        logger.display_message(False, "Processing", "Finished.")
+        missing = []
+        present = []
+        for hd in expected:
+            try:
+                present.append((hd, os.stat(hd.full_filename)))
+            except FileNotFoundError:
+                missing.append(hd)
+
+        devices = {}
+        for _, stat in present:
+            devices.setdefault(
+                    stat.st_dev, threading.BoundedSemaphore(
+                            ConfigData.disk_readers))
+        workers = ConfigData.verify_workers or os.cpu_count() or 1
+        workers = max(1, min(workers,
+                             ConfigData.disk_readers * max(1, len(devices))))
+        logger.display_message(
+                False, "Verify", "Hashing %d files with %d workers." %
+                (len(present), workers))
+
+        def hash_file(item):
+            hd, stat = item
+            with devices[stat.st_dev], Profiler.phase("hashing"):
+                return HumbleHash.calculate_checksum(hd.full_filename,
+                                                     notify=False)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            checksums = list(executor.map(hash_file, present))
+        elapsed = time.monotonic() - start
+
+        mismatches = [hd for (hd, _), checksum in zip(present, checksums)
+                      if checksum != hd.humble_md5]
+        orphans = Action.orphaned_files(
+                set(hd.full_filename for hd in expected))
+
+        # The next sync checks the files of these orders again.
+        for hd in mismatches + missing:
+            SyncIndex.forget(hd.order_number)
+
+        for hd in mismatches:
+            logger.display_message(False, "Mismatch", hd.full_filename)
+        for hd in missing:
+            logger.display_message(False, "Missing", hd.full_filename)
+        for full_filename in orphans:
+            logger.display_message(False, "Orphan", full_filename)
+
+        total_size = sum(stat.st_size for _, stat in present)
+        logger.display_message(
+                False, "Verify",
+                "%d files verified, %d mismatches, %d missing, %d orphans." %
+                (len(present) - len(mismatches), len(mismatches),
+                 len(missing), len(orphans)))
+        logger.display_message(
+                False, "Verify", "Hashed %s in %.1fs (%.1f MB/s)." %
+                (ProgressTracker.format_filesize(total_size), elapsed,
+                 total_size / 1000000 / elapsed if elapsed > 0 else 0))
+
+    @staticmethod
+    def orphaned_files(expected_filenames):
+        """
+            Lists the files of the download location that are not part of the
+            library, ignoring the files hb-downloader keeps next to them.
+
+            :param expected_filenames:  The set of expected full filenames.
+            :return:  A sorted list of full filenames.
+        """
+        orphans = []
+        for root, directories, filenames in os.walk(
+                ConfigData.download_location):
+            if root == ConfigData.download_location and (
+                    ConfigData.CACHE_DIRECTORY in directories):
+                directories.remove(ConfigData.CACHE_DIRECTORY)
+            for filename in filenames:
+                full_filename = os.path.join(root, filename)
+                if (full_filename in expected_filenames or
+                        filename.endswith((".md5", ".segments", ".tmp")) or
+                        filename.startswith(
+                                ConfigData.STATE_DATABASE_FILENAME) or
+                        filename == ConfigData.JOURNAL_FILENAME):
+                    continue
+                orphans.append(full_filename)
+        return sorted(orphans)
+
+    @staticmethod
+    def needed_downloads_from_keys(hapi, game_keys):
+        """
+            Retrieves and checks the orders matching game_keys.
+
+            :param hapi:  The HumbleApi instance used to retrieve the orders.
+            :param game_keys:  The list of keys to retrieve.
+            :return:  A generator of (key, humble_downloads) tuples, in the
+            same order as game_keys.
+        """
+        return Action.map_orders(hapi, game_keys,
+                                 HumbleDownload.needed_downloads_from_key)
+
+    @staticmethod
+    def map_orders(hapi, game_keys, retrieve):
+        """
+            Calls retrieve(hapi, key) for every key using a bounded pool of
+            ConfigData.order_workers threads.
+
+            :param hapi:  The HumbleApi instance used to retrieve the orders.
+            :param game_keys:  The list of keys to retrieve.
+            :param retrieve:  The function returning the downloads of a key.
+            :return:  A generator of (key, result) tuples, in the same order as
+            game_keys.
+        """
+        workers = max(1, ConfigData.order_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Executor.map submits every key up front but yields results in
+            # submission order.
+            results = executor.map(lambda key: retrieve(hapi, key), game_keys)
+            for key, result in zip(game_keys, results):
+                yield key, result
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Runs the benchmarks of the download, hash and order parsing hot paths and
+    writes their results as JSON, so they can be compared between commits.
+    Run from the root of the repository:
+
+        python -m benchmarks --output results.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from . import download, hash_engines, order_model
+
+__license__ = "MIT"
+
+BENCHMARKS = ["checksum", "download", "order_model"]
+
+
+def revision():
+    """
+        :return:  The git commit being measured, or None outside of a
+        repository.
+    """
+    try:
+        return subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """
+        Runs the selected benchmarks.
+
+        :param args:  The parsed command line.
+        :return:  The report, a dictionary serializable as JSON.
+    """
+    size = args.size * 1048576
+    results = []
+    if "checksum" in args.benchmarks:
+        results += hash_engines.benchmark(size, args.repeat)
+    if "download" in args.benchmarks:
+        results += download.benchmark(size, args.repeat)
+    if "order_model" in args.benchmarks:
+        results += order_model.benchmark(args.orders, args.repeat,
+                                         recorded=args.recorded_orders)
+    return {"timestamp": time.time(), "revision": revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(), "results": results}
+
+
+def compare(report, baseline):
+    """
+        Compares the wall clock times, or the memory for memory benchmarks, of
+        a report to the ones of a baseline report, measurement by measurement.
+
+        :param report:  The report of the current run.
+        :param baseline:  A report written by a previous run.
+        :return:  A list of (benchmark, params, ratio) tuples, a ratio above 1
+        meaning the current run is slower or uses more memory.
+    """
+    previous = {(r["benchmark"], json.dumps(r["params"], sort_keys=True)): r
+                for r in baseline["results"]}
+    ratios = []
+    for current in report["results"]:
+        key = (current["benchmark"], json.dumps(current["params"],
+                                                sort_keys=True))
+        measure = ("wall_seconds" if "wall_seconds" in current
+                   else "bytes_per_order")
+        if key in previous and previous[key].get(measure):
+            ratios.append((current["benchmark"], current["params"],
+                           current[measure] / previous[key][measure]))
+    return ratios
+
+
+def parse_command_line(argv=None):
+    parser = argparse.ArgumentParser(
+            description=__doc__.strip().split("\n")[0])
+    parser.add_argument("benchmarks", nargs="*", default=BENCHMARKS,
+                        help="The benchmarks to run, among %s." %
+                        ", ".join(BENCHMARKS))
+    parser.add_argument("--size", type=int, default=256,
+                        help="The size of the files hashed and downloaded, "
+                             "in MB.")
+    parser.add_argument("--orders", type=int, default=1000,
+                        help="The number of synthetic orders parsed.")
+    parser.add_argument("--recorded_orders", type=str, default=None,
+                        help="An order cache directory, whose orders are "
+                             "parsed instead of synthetic ones.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="The number of runs per measurement, the best "
+                             "one being kept.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="The file receiving the JSON results, standard "
+                             "output by default.")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="The results of a previous run, to which the "
+                             "times of this run are compared.")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("Unknown benchmark %s." % name)
+    return args
+
+
+def main():
+    args = parse_command_line()
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        for benchmark, params, ratio in compare(report, baseline):
+            print("%-12s %-50s %6.2fx" % (benchmark, json.dumps(params),
+                                         ratio), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
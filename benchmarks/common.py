@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import socketserver
+import time
+from http.server import HTTPServer
+
+__license__ = "MIT"
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ An HTTPServer handling each request on a thread, as the one of
+        http.server does from Python 3.7. """
+    daemon_threads = True
+
+
+def best_of(repeat, function, *args, **kwargs):
+    """
+        Runs a function several times and keeps its best times, which are the
+        least disturbed by the rest of the system.
+
+        :param repeat:  The number of runs.
+        :param function:  The function to time.
+        :param list args: (optional) Positional args to pass to function.
+        :param dict kwargs: (optional) Keyword args to pass to function.
+        :return:  A tuple of the best wall clock and CPU times, in seconds.
+    """
+    best_wall, best_cpu = None, None
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        function(*args, **kwargs)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+    return best_wall, best_cpu
+
+
+def result(benchmark, params, wall, cpu, size=None, count=None):
+    """
+        Builds the record of a measurement.
+
+        :param benchmark:  The name of the benchmark.
+        :param params:  The parameters of the measurement.
+        :param wall:  The wall clock time, in seconds.
+        :param cpu:  The CPU time, in seconds.
+        :param size:  (optional) The number of bytes processed.
+        :param count:  (optional) The number of items processed.
+        :return:  A dictionary serializable as JSON.
+    """
+    record = {"benchmark": benchmark, "params": params,
+              "wall_seconds": wall, "cpu_seconds": cpu}
+    if size is not None:
+        record["bytes"] = size
+        record["mb_per_second"] = size / 1048576 / wall if wall else None
+        record["cpu_seconds_per_gb"] = cpu * 1073741824 / size if size else None
+    if count is not None:
+        record["items"] = count
+        record["items_per_second"] = count / wall if wall else None
+    return record
+
+
+def synthetic_content(size):
+    """
+        Generates incompressible content, repeating a 1 MB random block.
+
+        :param size:  The size of the content in bytes.
+        :return:  The content.
+        :rtype: bytes
+    """
+    block = os.urandom(min(size, 1048576))
+    return (block * (size // max(1, len(block)) + 1))[:size]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Measures HumbleDownload.download_file against a local HTTP server serving
+    a synthetic file from memory, with a single stream or in segments.
+"""
+import hashlib
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from config_data import ConfigData
+from humble_api.humble_state import HumbleState
+from humble_api.humble_hash import HumbleHash
+from humble_api.model.order import Order
+from humble_download import HumbleDownload
+from .common import (ThreadingHTTPServer, best_of, result,
+                     synthetic_content)
+from .synthetic import order_json
+
+__license__ = "MIT"
+
+
+class ContentHandler(BaseHTTPRequestHandler):
+    """ Serves the content of the server for any path, honoring byte ranges. """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = self.server.content
+        start, end = 0, len(content) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(end, int(match.group(2)))
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" %
+                             (start, end, len(content)))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with memoryview(content) as view:
+            self.wfile.write(view[start:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+def benchmark(size, repeat, segments=None):
+    """
+        Runs the download benchmark.
+
+        :param size:  The size of the file downloaded, in bytes.
+        :param repeat:  The number of runs per measurement.
+        :param segments:  (optional) The segment counts to measure, 1 being a
+        single stream.
+        :return:  The list of results.
+    """
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ContentHandler)
+    httpd.content = synthetic_content(size)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url_base = "http://127.0.0.1:%d" % httpd.server_address[1]
+
+    order = Order(order_json("benchmark", url_base, subproducts=1, downloads=1,
+                             structs=1, file_size=size))
+    subproduct = order.subproducts[0]
+    download = subproduct.downloads[0]
+    struct = download.download_structs[0]
+    struct.md5 = hashlib.md5(httpd.content).hexdigest()
+    struct.sha1 = None
+
+    saved = (ConfigData.download_location, ConfigData.segments,
+             ConfigData.segment_threshold, HumbleHash.write_md5,
+             HumbleState.database_filename)
+    results = []
+    try:
+        HumbleHash.write_md5 = False
+        HumbleState.database_filename = None
+        ConfigData.segment_threshold = 0
+        with tempfile.TemporaryDirectory() as directory:
+            ConfigData.download_location = directory
+            for segment_count in segments or [1, 4]:
+                ConfigData.segments = segment_count
+                hd = HumbleDownload(download, struct, order, subproduct,
+                                    order.gamekey)
+
+                def transfer():
+                    hd.remove()
+                    hd.download_file()
+                    if hd.status_message:
+                        raise RuntimeError(hd.status_message)
+
+                wall, cpu = best_of(repeat, transfer)
+                results.append(result(
+                        "download",
+                        {"segments": segment_count,
+                         "chunk_size": ConfigData.chunk_size},
+                        wall, cpu, size=size))
+    finally:
+        (ConfigData.download_location, ConfigData.segments,
+         ConfigData.segment_threshold, HumbleHash.write_md5,
+         HumbleState.database_filename) = saved
+        httpd.shutdown()
+        httpd.server_close()
+    return results
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Measures HumbleHash.calculate_checksum with every engine and several chunk
+    sizes, on a synthetic file.
+
+    The file is written once and read from the page cache by every run, unless
+    an engine drops it from the cache, so the figures mostly reflect CPU and
+    memory costs.
+"""
+import os
+import tempfile
+from humble_api.humble_hash import HumbleHash
+from .common import best_of, result, synthetic_content
+
+__license__ = "MIT"
+
+CHUNK_SIZES = [65536, 1048576, 8192000]
+
+
+def benchmark(size, repeat, chunk_sizes=None):
+    """
+        Runs the checksum benchmark.
+
+        :param size:  The size of the file hashed, in bytes.
+        :param repeat:  The number of runs per measurement.
+        :param chunk_sizes:  (optional) The chunk sizes to measure.
+        :return:  The list of results.
+    """
+    saved = (HumbleHash.engine, HumbleHash.chunk_size, HumbleHash.write_md5)
+    results = []
+    try:
+        HumbleHash.write_md5 = False
+        with tempfile.TemporaryDirectory() as directory:
+            full_filename = os.path.join(directory, "checksum.bin")
+            with open(full_filename, "wb") as f:
+                f.write(synthetic_content(size))
+
+            for chunk_size in chunk_sizes or CHUNK_SIZES:
+                for engine in HumbleHash.engines:
+                    HumbleHash.engine = engine
+                    HumbleHash.chunk_size = chunk_size
+                    wall, cpu = best_of(repeat, HumbleHash.calculate_checksum,
+                                        full_filename, notify=False)
+                    results.append(result(
+                            "checksum",
+                            {"engine": engine, "chunk_size": chunk_size},
+                            wall, cpu, size=size))
+    finally:
+        HumbleHash.engine, HumbleHash.chunk_size, HumbleHash.write_md5 = saved
+    return results
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    A local stand-in for humblebundle.com, to load test the downloader without
+    touching the real service.  It serves a synthetic account through the
+    order list and order endpoints used by HumbleApi, and signed download urls
+    with Range support.  Latency, 429 and 5xx errors and url expiry can be
+    configured.  Run from the root of the repository:
+
+        python -m benchmarks.mock_humble_server --orders 5000 --port 8080
+
+    then point the downloader at it:
+
+        hb-downloader.py --api_base_url http://127.0.0.1:8080 -c mock download
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+from .common import ThreadingHTTPServer, synthetic_content
+from .synthetic import order_json
+
+__license__ = "MIT"
+
+
+class MockHumbleServer(ThreadingHTTPServer):
+    """
+        Serves a synthetic account of orders gamekeys, each one made of
+        subproducts with a single platform and file.  Files share their
+        content but its last bytes, derived from their path, so any number of
+        them can be served from memory and none is deduplicated by the
+        downloader.
+    """
+    # The number of bytes distinct to every file.
+    SUFFIX_SIZE = 16
+
+    def __init__(self, address=("127.0.0.1", 0), orders=100, subproducts=5,
+                 file_size=1048576, cookie="mock", latency=0.0,
+                 error_rate=0.0, url_ttl=3600, seed=0):
+        """
+            Parameterized constructor for the MockHumbleServer.
+
+            :param address:  The (host, port) to listen on, port 0 picking a
+            free one.
+            :param orders:  The number of orders of the account.
+            :param subproducts:  The number of subproducts of each order.
+            :param file_size:  The size of every file in bytes.
+            :param cookie:  The only _simpleauth_sess cookie accepted.
+            :param latency:  The delay before every response, in seconds.
+            :param error_rate:  The probability of a request failing with a
+            429 or a 503.
+            :param url_ttl:  The number of seconds a download url stays valid.
+            :param seed:  The seed of the error injection.
+        """
+        super(MockHumbleServer, self).__init__(address, MockHumbleHandler)
+        self.gamekeys = ["mock%06d" % index for index in range(orders)]
+        self.subproducts = subproducts
+        self.content = synthetic_content(file_size)
+        self.common_size = file_size - min(file_size,
+                                           MockHumbleServer.SUFFIX_SIZE)
+        # The MD5 of every file is computed from this one of the shared part.
+        self._common_hash = hashlib.md5(self.content[:self.common_size])
+        self.cookie = cookie
+        self.latency = latency
+        self.error_rate = error_rate
+        self.url_ttl = url_ttl
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        """ :return:  The url to give to HumbleApi as its base_url. """
+        return "http://%s:%d" % self.server_address[:2]
+
+    def sign(self, path, expiry=None):
+        """
+            Signs the path of a download like dl.humble.com does.
+
+            :param path:  The path of the download.
+            :param expiry:  (optional) The expiry of the url as a UNIX
+            timestamp, url_ttl seconds from now by default.
+            :return:  The query string of the signed url.
+        """
+        if expiry is None:
+            expiry = int(time.time()) + self.url_ttl
+        return "?ttl=%d&t=%s" % (expiry, self.signature(path, expiry))
+
+    def signature(self, path, expiry):
+        """
+            :param path:  The path of the download.
+            :param expiry:  The expiry of the url as a UNIX timestamp.
+            :return:  The token of a signed url.
+        """
+        return hashlib.md5(("%s:%d:%s" % (path, expiry, self.cookie))
+                           .encode()).hexdigest()[:16]
+
+    def file_suffix(self, path):
+        """
+            :param path:  The path of a download.
+            :return:  The last bytes of the file, distinct for every path.
+        """
+        return hashlib.md5(path.encode()).digest()[
+                :len(self.content) - self.common_size]
+
+    def file_md5(self, path):
+        """
+            :param path:  The path of a download.
+            :return:  The MD5 of the file.
+        """
+        file_hash = self._common_hash.copy()
+        file_hash.update(self.file_suffix(path))
+        return file_hash.hexdigest()
+
+    def order(self, gamekey):
+        """
+            :param gamekey:  The identifier of the order.
+            :return:  The JSON of the order, with freshly signed urls.
+        """
+        return order_json(gamekey, self.base_url + "/download",
+                          subproducts=self.subproducts, downloads=1,
+                          structs=1, file_size=len(self.content),
+                          md5=lambda path: self.file_md5("/download" + path),
+                          url_suffix=lambda path: self.sign("/download" + path))
+
+    def inject_error(self):
+        """
+            Counts a request and decides whether it should fail.
+
+            :return:  The status of the injected error, or None.
+        """
+        with self._lock:
+            self.requests += 1
+            if self._random.random() >= self.error_rate:
+                return None
+            return self._random.choice([429, 503])
+
+
+class MockHumbleHandler(BaseHTTPRequestHandler):
+    """ Answers the requests of the MockHumbleServer. """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        if server.latency > 0:
+            time.sleep(server.latency)
+
+        error = server.inject_error()
+        if error is not None:
+            self.send_body(error, b"", {"Retry-After": "1"})
+            return
+
+        url = urlparse(self.path)
+        if url.path.startswith("/download/"):
+            self.send_download(url)
+            return
+
+        if "_simpleauth_sess=%s" % server.cookie not in \
+                self.headers.get("Cookie", ""):
+            self.send_json({"error_id": "login_required",
+                            "errors": {"auth": ["Login required"]}})
+        elif url.path == "/api/v1/user/order":
+            self.send_json([{"gamekey": key} for key in server.gamekeys])
+        elif url.path.startswith("/api/v1/order/"):
+            gamekey = url.path.split("/")[-1]
+            if gamekey not in server.gamekeys:
+                self.send_body(404, b"")
+                return
+            # Orders never change, only their signed urls do.
+            etag = '"%s"' % gamekey
+            if self.headers.get("If-None-Match") == etag:
+                self.send_body(304, b"", {"ETag": etag})
+                return
+            self.send_json(server.order(gamekey), {"ETag": etag})
+        else:
+            self.send_body(404, b"")
+
+    def send_download(self, url):
+        """
+            Serves a download, checking its signature and honoring single byte
+            ranges.
+
+            :param url:  The parsed url of the request.
+            :return:  None
+        """
+        server = self.server
+        query = parse_qs(url.query)
+        try:
+            expiry = int(query["ttl"][0])
+            token = query["t"][0]
+        except (KeyError, ValueError):
+            self.send_body(403, b"")
+            return
+        if expiry < time.time() or \
+                token != server.signature(url.path, expiry):
+            self.send_body(403, b"")
+            return
+
+        size = len(server.content)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        headers = {"Accept-Ranges": "bytes"}
+        status = 200
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(end, int(match.group(2)))
+            if start > end:
+                self.send_body(416, b"")
+                return
+            status = 206
+            headers["Content-Range"] = "bytes %d-%d/%d" % (start, end, size)
+        common_size = server.common_size
+        suffix = server.file_suffix(url.path)
+        with memoryview(server.content) as view:
+            self.send_body(status, [
+                    view[start:min(end + 1, common_size)],
+                    suffix[max(0, start - common_size):
+                           max(0, end + 1 - common_size)]], headers)
+
+    def send_json(self, data, headers=None):
+        """ Sends a JSON document. """
+        headers = dict(headers or {})
+        headers["Content-Type"] = "application/json"
+        self.send_body(200, json.dumps(data).encode(), headers)
+
+    def send_body(self, status, body, headers=None):
+        """
+            Sends a complete response.
+
+            :param status:  The HTTP status.
+            :param body:  The bytes-like body, or a list of its bytes-like
+            parts.
+            :param headers:  (optional) The extra headers.
+            :return:  None
+        """
+        parts = body if isinstance(body, list) else [body]
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length",
+                         str(sum(len(part) for part in parts)))
+        self.end_headers()
+        for part in parts:
+            self.wfile.write(part)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--orders", type=int, default=1000,
+                        help="The number of orders of the account.")
+    parser.add_argument("--subproducts", type=int, default=5,
+                        help="The number of subproducts of each order.")
+    parser.add_argument("--file_size", type=int, default=1048576,
+                        help="The size of every file in bytes.")
+    parser.add_argument("--cookie", default="mock",
+                        help="The session cookie accepted.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="The delay before every response, in seconds.")
+    parser.add_argument("--error_rate", type=float, default=0.0,
+                        help="The probability of a 429 or 503 response.")
+    parser.add_argument("--url_ttl", type=int, default=3600,
+                        help="The lifetime of download urls, in seconds.")
+    args = parser.parse_args()
+
+    httpd = MockHumbleServer((args.host, args.port), args.orders,
+                             args.subproducts, args.file_size, args.cookie,
+                             args.latency, args.error_rate, args.url_ttl)
+    print("Serving %d orders on %s with the cookie %s." %
+          (args.orders, httpd.base_url, args.cookie))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
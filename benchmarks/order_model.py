@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Measures the construction of Order objects from order JSON, either
+    synthetic or recorded by the order cache, and the memory they retain.
+"""
+import gc
+import glob
+import json
+import os
+import tracemalloc
+from humble_api.model.base_model import BaseModel
+from humble_api.model.order import Order
+from .common import best_of, result
+from .synthetic import order_json
+
+__license__ = "MIT"
+
+
+def load_orders(directory):
+    """
+        Loads the orders recorded by an OrderCache.
+
+        :param directory:  The directory of the cache, such as
+        <download location>/.hb-downloader-cache/orders.
+        :return:  The list of order JSON dictionaries.
+    """
+    orders = []
+    for filename in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(filename, "r") as f:
+            orders.append(json.load(f)["data"])
+    return orders
+
+
+def benchmark(orders, repeat, subproducts=20, recorded=None):
+    """
+        Runs the order model benchmark.
+
+        :param orders:  The number of synthetic orders.
+        :param repeat:  The number of runs per measurement.
+        :param subproducts:  (optional) The number of subproducts per synthetic
+        order.
+        :param recorded:  (optional) The directory of recorded orders, used
+        instead of synthetic ones.
+        :return:  The list of results.
+    """
+    if recorded:
+        data = load_orders(recorded)
+        params = {"source": "recorded", "orders": len(data)}
+    else:
+        data = [order_json("key%06d" % index, "https://dl.humble.com",
+                           subproducts=subproducts)
+                for index in range(orders)]
+        params = {"source": "synthetic", "orders": orders,
+                  "subproducts": subproducts}
+
+    def build():
+        for order in data:
+            Order(order)
+
+    wall, cpu = best_of(repeat, build)
+    results = [result("order_model", params, wall, cpu, count=len(data))]
+
+    texts = [json.dumps(order) for order in data]
+    for keep_data in [True, False]:
+        for materialize in [False, True]:
+            results.append({
+                "benchmark": "order_memory",
+                "params": dict(params, keep_data=keep_data,
+                               materialize=materialize),
+                "bytes_per_order": memory(texts, keep_data, materialize)})
+    return results
+
+
+def memory(texts, keep_data, materialize):
+    """
+        Measures the memory retained by orders parsed from their JSON text,
+        the JSON itself being released as it would after a request.
+
+        :param texts:  The JSON texts of the orders.
+        :param keep_data:  The value of BaseModel.keep_data.
+        :param materialize:  Whether every download of the orders is accessed,
+        as when their status is checked, or none is.
+        :return:  The number of bytes retained per order.
+    """
+    saved = BaseModel.keep_data
+    BaseModel.keep_data = keep_data
+    gc.collect()
+    tracemalloc.start()
+    try:
+        orders = []
+        for text in texts:
+            order = Order(json.loads(text))
+            if materialize:
+                for subproduct in order.subproducts or []:
+                    for download in subproduct.downloads:
+                        download.download_structs
+            orders.append(order)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        BaseModel.keep_data = saved
+    return retained // max(1, len(texts))
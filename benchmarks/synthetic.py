@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+
+__license__ = "MIT"
+
+PLATFORMS = ["windows", "mac", "linux", "audio", "ebook"]
+
+
+def download_struct_json(url, name, file_size, md5=None):
+    """
+        Generates the JSON of a DownloadStruct.
+
+        :param url:  The web download url.
+        :param name:  The name of the file format, such as "64-bit .deb".
+        :param file_size:  The size of the file in bytes.
+        :param md5:  (optional) The MD5 of the file, derived from url if None.
+        :return:  A dictionary as sent by humblebundle.com.
+    """
+    if md5 is None:
+        md5 = hashlib.md5(url.encode()).hexdigest()
+    return {"name": name, "md5": md5,
+            "sha1": hashlib.sha1(md5.encode()).hexdigest(),
+            "file_size": file_size,
+            "human_size": "%.1f MB" % (file_size / 1048576),
+            "small": 0,
+            "url": {"web": url, "bittorrent": url + ".torrent"}}
+
+
+def order_json(gamekey, url_base, subproducts=20, downloads=3, structs=2,
+               file_size=104857600, md5=None, url_suffix=""):
+    """
+        Generates the JSON of an order, shaped like the ones returned by the
+        order API.
+
+        :param gamekey:  The identifier of the order.
+        :param url_base:  The base of the download urls, such as
+        "https://dl.humble.com".
+        :param subproducts:  The number of subproducts of the order.
+        :param downloads:  The number of platforms of each subproduct.
+        :param structs:  The number of files of each platform.
+        :param file_size:  The size of every file in bytes.
+        :param md5:  (optional) The MD5 of every file, or a function of the
+        path of a file returning its MD5, derived from its url if None.
+        :param url_suffix:  (optional) A function of the path of a file
+        returning the string appended to its url, such as a signature.
+        :return:  A dictionary as sent by humblebundle.com.
+    """
+    machine_name = "bundle_%s" % gamekey
+    order = {"gamekey": gamekey, "created": "2017-01-01T00:00:00",
+             "amount_to_charge": 12.0,
+             "product": {"category": "bundle", "machine_name": machine_name,
+                         "human_name": "Bundle %s" % gamekey,
+                         "post_purchase_text": "", "supports_canonical": False,
+                         "partial_gift_enabled": True},
+             "subscriptions": [], "subproducts": []}
+
+    for index in range(subproducts):
+        name = "game%s%d" % (gamekey, index)
+        subproduct = {"machine_name": name, "human_name": "Game %d" % index,
+                      "url": "https://example.com/%s" % name,
+                      "icon": "https://example.com/%s.png" % name,
+                      "custom_download_page_box_html": None,
+                      "payee": {"human_name": "Studio %d" % index,
+                                "machine_name": "studio%d" % index},
+                      "downloads": []}
+        for platform in PLATFORMS[:downloads]:
+            paths = ["/%s/%s_%d.bin" % (name, platform, number)
+                     for number in range(structs)]
+            files = [download_struct_json(
+                     url_base + path + (url_suffix(path) if url_suffix else ""),
+                     "%s file %d" % (platform, number), file_size,
+                     md5(path) if callable(md5) else md5)
+                     for number, path in enumerate(paths)]
+            subproduct["downloads"].append(
+                    {"machine_name": "%s_%s" % (name, platform),
+                     "platform": platform, "download_struct": files,
+                     "options_dict": {}, "download_identifier": "",
+                     "download_version_number": None,
+                     "android_app_only": False})
+        order["subproducts"].append(subproduct)
+    return order
@@ -9,17 +9,63 @@ __license__ = "MIT"
 class ConfigData(object):
     VERSION = "0.5.0"
     BUG_REPORT_URL = "https://github.com/MayeulC/hb-downloader/issues"
+    STATE_DATABASE_FILENAME = ".hb-downloader-state.sqlite"
+    CACHE_DIRECTORY = ".hb-downloader-cache"
+    JOURNAL_FILENAME = ".hb-downloader-journal.jsonl"
     action = ""
     print_url = False
     download_location = ""
     debug = False
     auth_sess_cookie = ""
+    api_base_url = "https://www.humblebundle.com"
     write_md5 = True
     read_md5 = True
     force_md5 = False
     chunk_size = 8192000
+    hash_engine = "readinto"
     ignore_md5 = False
+    compute_sha1 = False
+    state_database = True
+    verify_mode = "trust"
+    reverify_days = 0
+    order_cache = True
+    order_cache_ttl = 168
+    refresh_orders = False
+    import_md5 = False
+    export_md5 = False
     resume_downloads = True
+    url_expiry_margin = 300
+    url_refresh_attempts = 3
+    http_retries = 3
+    http_backoff = 1.0
+    http_pool_size = 0
+    download_pool_size = 0
+    download_timeout = 60
+    preallocate = True
+    metrics_file = ""
+    metrics_format = "json"
+    keep_order_data = False
+    profile = False
+    profile_cpu = False
+    profile_memory = False
+    profile_report = "hb-downloader-profile.txt"
+    max_rate = "0"
+    transfer_rate = "0"
+    rate_schedule = []
+    order_workers = 4
+    verify_workers = 0
+    disk_readers = 2
+    download_workers = 1
+    host_connections = 2
+    download_order = "none"
+    pipeline = False
+    incremental_sync = True
+    dedup = "hardlink"
+    run_journal = True
+    rescan = False
+    pipeline_queue = 64
+    segments = 1
+    segment_threshold = 1073741824
 
     download_platforms = {
         'audio': True,
@@ -5,7 +5,17 @@ import os
 import yaml
 import logger
 from config_data import ConfigData
+from dedup import Dedup
+from download_scheduler import DownloadScheduler
 from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
+from humble_api.model.base_model import BaseModel
+from humble_api.retry_policy import RetryPolicy
+from humble_download import HumbleDownload
+from metrics import Metrics
+from rate_limiter import RateLimiter
+from run_journal import RunJournal
+from sync_index import SyncIndex
 
 __author__ = "Brian Schkerke"
 __copyright__ = "Copyright 2016 Brian Schkerke"
@@ -17,6 +27,7 @@ class Configuration(object):
             'games': ['android', 'asmjs', 'linux', 'mac', 'windows'],
             'ebooks': ['ebook'],
             'audio': ['audio']}
+    verify_modes = ["trust", "checksum"]
 
     @staticmethod
     def validate_configuration():
@@ -33,6 +44,57 @@ class Configuration(object):
             return False, (
                     "Download location is not writable by the current user.")
 
+        if ConfigData.http_retries < 0:
+            return False, "The number of HTTP retries cannot be negative."
+
+        if ConfigData.metrics_format not in Metrics.FORMATS:
+            return False, "Unknown metrics format %s." % \
+                ConfigData.metrics_format
+
+        if ConfigData.hash_engine not in HumbleHash.engines:
+            return False, "Unknown hash engine %s." % ConfigData.hash_engine
+
+        if ConfigData.verify_mode not in Configuration.verify_modes:
+            return False, "Unknown verify mode %s." % ConfigData.verify_mode
+
+        if ConfigData.order_workers < 1:
+            return False, "The number of order workers must be at least 1."
+
+        if ConfigData.verify_workers < 0:
+            return False, "The number of verify workers cannot be negative."
+
+        if ConfigData.disk_readers < 1:
+            return False, "The number of disk readers must be at least 1."
+
+        if ConfigData.download_workers < 1:
+            return False, "The number of download workers must be at least 1."
+
+        if ConfigData.host_connections < 1:
+            return False, "The number of host connections must be at least 1."
+
+        if ConfigData.download_order not in DownloadScheduler.ORDERS:
+            return False, "Unknown download order %s." % (
+                    ConfigData.download_order)
+
+        if ConfigData.dedup not in Dedup.MODES:
+            return False, "Unknown dedup mode %s." % ConfigData.dedup
+
+        if ConfigData.pipeline_queue < 1:
+            return False, "The pipeline queue must hold at least 1 item."
+
+        if ConfigData.segments < 1:
+            return False, "The number of segments must be at least 1."
+
+        try:
+            RateLimiter.parse_rate(ConfigData.max_rate)
+            RateLimiter.parse_rate(ConfigData.transfer_rate)
+            for window in ConfigData.rate_schedule:
+                RateLimiter.parse_rate(window["rate"])
+                RateLimiter.parse_time(window["start"])
+                RateLimiter.parse_time(window["end"])
+        except (KeyError, TypeError, ValueError) as e:
+            return False, "Invalid rate configuration: %s" % e
+
         return True, ""
 
     @staticmethod
@@ -56,16 +118,85 @@ class Configuration(object):
                 "force_md5", ConfigData.force_md5)
         ConfigData.chunk_size = saved_config.get(
                 "chunksize", ConfigData.chunk_size)
+        ConfigData.hash_engine = saved_config.get(
+                "hash_engine", ConfigData.hash_engine)
         ConfigData.debug = saved_config.get(
                 "debug", ConfigData.debug)
         ConfigData.download_location = saved_config.get(
                 "download-location", ConfigData.download_location)
         ConfigData.auth_sess_cookie = saved_config.get(
                 "session-cookie", ConfigData.auth_sess_cookie)
+        ConfigData.api_base_url = saved_config.get(
+                "api_base_url", ConfigData.api_base_url)
         ConfigData.resume_downloads = saved_config.get(
                 "resume_downloads", ConfigData.resume_downloads)
         ConfigData.ignore_md5 = saved_config.get(
                 "ignore_md5", ConfigData.ignore_md5)
+        ConfigData.url_expiry_margin = saved_config.get(
+                "url_expiry_margin", ConfigData.url_expiry_margin)
+        ConfigData.url_refresh_attempts = saved_config.get(
+                "url_refresh_attempts", ConfigData.url_refresh_attempts)
+        ConfigData.http_retries = saved_config.get(
+                "http_retries", ConfigData.http_retries)
+        ConfigData.http_backoff = saved_config.get(
+                "http_backoff", ConfigData.http_backoff)
+        ConfigData.http_pool_size = saved_config.get(
+                "http_pool_size", ConfigData.http_pool_size)
+        ConfigData.download_pool_size = saved_config.get(
+                "download_pool_size", ConfigData.download_pool_size)
+        ConfigData.download_timeout = saved_config.get(
+                "download_timeout", ConfigData.download_timeout)
+        ConfigData.preallocate = saved_config.get(
+                "preallocate", ConfigData.preallocate)
+        ConfigData.keep_order_data = saved_config.get(
+                "keep_order_data", ConfigData.keep_order_data)
+        ConfigData.metrics_file = saved_config.get(
+                "metrics_file", ConfigData.metrics_file) or ""
+        ConfigData.metrics_format = saved_config.get(
+                "metrics_format", ConfigData.metrics_format)
+        ConfigData.max_rate = saved_config.get(
+                "max_rate", ConfigData.max_rate)
+        ConfigData.transfer_rate = saved_config.get(
+                "transfer_rate", ConfigData.transfer_rate)
+        ConfigData.rate_schedule = saved_config.get(
+                "rate_schedule", ConfigData.rate_schedule) or []
+        ConfigData.compute_sha1 = saved_config.get(
+                "compute_sha1", ConfigData.compute_sha1)
+        ConfigData.state_database = saved_config.get(
+                "state_database", ConfigData.state_database)
+        ConfigData.verify_mode = saved_config.get(
+                "verify_mode", ConfigData.verify_mode)
+        ConfigData.reverify_days = saved_config.get(
+                "reverify_days", ConfigData.reverify_days)
+        ConfigData.order_cache = saved_config.get(
+                "order_cache", ConfigData.order_cache)
+        ConfigData.order_cache_ttl = saved_config.get(
+                "order_cache_ttl", ConfigData.order_cache_ttl)
+        ConfigData.order_workers = saved_config.get(
+                "order_workers", ConfigData.order_workers)
+        ConfigData.verify_workers = saved_config.get(
+                "verify_workers", ConfigData.verify_workers)
+        ConfigData.disk_readers = saved_config.get(
+                "disk_readers", ConfigData.disk_readers)
+        ConfigData.download_workers = saved_config.get(
+                "download_workers", ConfigData.download_workers)
+        ConfigData.host_connections = saved_config.get(
+                "host_connections", ConfigData.host_connections)
+        ConfigData.download_order = saved_config.get(
+                "download_order", ConfigData.download_order)
+        ConfigData.pipeline = saved_config.get(
+                "pipeline", ConfigData.pipeline)
+        ConfigData.incremental_sync = saved_config.get(
+                "incremental_sync", ConfigData.incremental_sync)
+        ConfigData.dedup = saved_config.get("dedup", ConfigData.dedup)
+        ConfigData.run_journal = saved_config.get(
+                "run_journal", ConfigData.run_journal)
+        ConfigData.pipeline_queue = saved_config.get(
+                "pipeline_queue", ConfigData.pipeline_queue)
+        ConfigData.segments = saved_config.get(
+                "segments", ConfigData.segments)
+        ConfigData.segment_threshold = saved_config.get(
+                "segment_threshold", ConfigData.segment_threshold)
 
     @staticmethod
     def parse_command_line():
@@ -87,10 +218,119 @@ class Configuration(object):
                 "-cs", "--chunksize", default=ConfigData.chunk_size, type=int,
                 help=("The size to use when calculating MD5s and downloading"
                       "files."))
+        parser.add_argument(
+                "-he", "--hash_engine", default=ConfigData.hash_engine,
+                choices=HumbleHash.engines,
+                help=("How files are read to be hashed: \"read\" allocates "
+                      "each chunk, \"readinto\" reuses a buffer and "
+                      "\"mmap\" maps the file.  The last two keep hashed "
+                      "files out of the page cache."))
         parser.add_argument(
                 "-c", "--auth_cookie",
                 default=ConfigData.auth_sess_cookie, type=str,
                 help="The _simple_auth cookie value from a web browser")
+        parser.add_argument(
+                "-ab", "--api_base_url", default=ConfigData.api_base_url,
+                type=str,
+                help=("The root of the Humble Bundle API, for instance a local "
+                      "mock server started with "
+                      "\"python -m benchmarks.mock_humble_server\"."))
+        parser.add_argument(
+                "-vm", "--verify_mode", default=ConfigData.verify_mode,
+                choices=Configuration.verify_modes,
+                help=("\"trust\" accepts the stored checksum of a file whose "
+                      "size and modification time are unchanged, "
+                      "\"checksum\" hashes every existing file again."))
+        parser.add_argument(
+                "-rv", "--reverify_days", default=ConfigData.reverify_days,
+                type=float,
+                help=("In trust mode, hash files whose last verification is "
+                      "older than this number of days. 0 never does."))
+        parser.add_argument(
+                "-r", "--refresh", action="store_true",
+                default=ConfigData.refresh_orders,
+                help="Retrieve every order again instead of using the cache.")
+        parser.add_argument(
+                "-p", "--profile", action="store_true",
+                default=ConfigData.profile,
+                help=("Time the phases of the run and write a report to "
+                      "--profile_report at exit."))
+        parser.add_argument(
+                "--profile_cpu", action="store_true",
+                default=ConfigData.profile_cpu,
+                help="Also profile the CPU with cProfile. Implies --profile.")
+        parser.add_argument(
+                "--profile_memory", action="store_true",
+                default=ConfigData.profile_memory,
+                help=("Also trace memory allocations with tracemalloc. "
+                      "Implies --profile."))
+        parser.add_argument(
+                "--profile_report", default=ConfigData.profile_report,
+                type=str, help="The file receiving the profiling report.")
+        parser.add_argument(
+                "-ow", "--order_workers",
+                default=ConfigData.order_workers, type=int,
+                help=("The number of orders to retrieve and check "
+                      "concurrently."))
+        parser.add_argument(
+                "-dw", "--download_workers",
+                default=ConfigData.download_workers, type=int,
+                help="The number of files to download concurrently.")
+        parser.add_argument(
+                "-hc", "--host_connections",
+                default=ConfigData.host_connections, type=int,
+                help=("The maximum number of concurrent downloads from a "
+                      "single host."))
+        parser.add_argument(
+                "-do", "--download_order", default=ConfigData.download_order,
+                choices=DownloadScheduler.ORDERS,
+                help=("The order in which files are downloaded, by file "
+                      "size. \"none\" keeps the library order."))
+        parser.add_argument(
+                "-pl", "--pipeline", action="store_true",
+                default=ConfigData.pipeline,
+                help=("Start downloading while the orders are still being "
+                      "retrieved and checked, instead of after all of them."))
+        parser.add_argument(
+                "-fs", "--full_sync", action="store_true",
+                help=("Check the files of every order, including the ones "
+                      "unchanged since they were last downloaded."))
+        parser.add_argument(
+                "-dd", "--dedup", default=ConfigData.dedup,
+                choices=Dedup.MODES,
+                help=("How a file already downloaded under another path is "
+                      "placed instead of being downloaded again."))
+        parser.add_argument(
+                "--rescan", action="store_true", default=ConfigData.rescan,
+                help=("Scan the orders again instead of resuming the "
+                      "interrupted run recorded in the journal."))
+        parser.add_argument(
+                "-mr", "--max_rate", default=ConfigData.max_rate, type=str,
+                help=("The maximum bandwidth used by all downloads, in bytes "
+                      "per second with an optional K, M or G suffix. 0 "
+                      "disables the limit."))
+        parser.add_argument(
+                "-tr", "--transfer_rate", default=ConfigData.transfer_rate,
+                type=str,
+                help=("The maximum bandwidth used by each download, in the "
+                      "same format as --max_rate."))
+        parser.add_argument(
+                "-mf", "--metrics_file", default=ConfigData.metrics_file,
+                type=str,
+                help=("Write the transfer and API metrics of the run to this "
+                      "file."))
+        parser.add_argument(
+                "-mt", "--metrics_format", default=ConfigData.metrics_format,
+                choices=Metrics.FORMATS,
+                help="The format of the metrics file.")
+        parser.add_argument(
+                "-sg", "--segments", default=ConfigData.segments, type=int,
+                help=("The number of byte ranges large files are split into "
+                      "and downloaded concurrently."))
+        parser.add_argument(
+                "-st", "--segment_threshold",
+                default=ConfigData.segment_threshold, type=int,
+                help="The size from which a file is downloaded in segments.")
 
         sub = parser.add_subparsers(
                 title="action", dest="action",
@@ -112,7 +352,35 @@ class Configuration(object):
                         "parameters are specified, this will default to "
                         "downloading everything in the library."))
 
-        for action in [a_list, a_download]:
+        a_state = sub.add_parser(
+                "state", help=(
+                        "Maintain the state database which stores the "
+                        "checksums of downloaded files."))
+        a_state.add_argument(
+                "--import-md5", action="store_true", dest="import_md5",
+                help=("Import the existing .md5 files of the download "
+                      "location in the state database."))
+        a_state.add_argument(
+                "--export-md5", action="store_true", dest="export_md5",
+                help=("Write a .md5 file next to every file known to the "
+                      "state database."))
+
+        a_verify = sub.add_parser(
+                "verify", help=(
+                        "Hash every downloaded file of the library and report "
+                        "the files that are corrupted, missing or unknown to "
+                        "the library."))
+        a_verify.add_argument(
+                "-vw", "--verify_workers", type=int,
+                default=ConfigData.verify_workers,
+                help=("The number of files hashed concurrently. 0 uses one "
+                      "worker per CPU core."))
+        a_verify.add_argument(
+                "-dr", "--disk_readers", type=int,
+                default=ConfigData.disk_readers,
+                help="The number of files read concurrently from each disk.")
+
+        for action in [a_list, a_download, a_verify]:
             item_type = action.add_subparsers(title="type", dest="item_type")
             games = item_type.add_parser("games")
             games.add_argument(
@@ -133,7 +401,32 @@ class Configuration(object):
 
         ConfigData.download_location = args.download_location
         ConfigData.chunk_size = args.chunksize
+        ConfigData.hash_engine = args.hash_engine
         ConfigData.auth_sess_cookie = args.auth_cookie
+        ConfigData.api_base_url = args.api_base_url
+        ConfigData.verify_mode = args.verify_mode
+        ConfigData.reverify_days = args.reverify_days
+        ConfigData.order_workers = args.order_workers
+        ConfigData.refresh_orders = args.refresh
+        ConfigData.profile_cpu = args.profile_cpu
+        ConfigData.profile_memory = args.profile_memory
+        ConfigData.profile = (args.profile or args.profile_cpu or
+                              args.profile_memory)
+        ConfigData.profile_report = args.profile_report
+        ConfigData.download_workers = args.download_workers
+        ConfigData.host_connections = args.host_connections
+        ConfigData.download_order = args.download_order
+        ConfigData.pipeline = args.pipeline
+        ConfigData.dedup = args.dedup
+        ConfigData.rescan = args.rescan
+        if args.full_sync:
+            ConfigData.incremental_sync = False
+        ConfigData.metrics_file = args.metrics_file
+        ConfigData.metrics_format = args.metrics_format
+        ConfigData.max_rate = args.max_rate
+        ConfigData.transfer_rate = args.transfer_rate
+        ConfigData.segments = args.segments
+        ConfigData.segment_threshold = args.segment_threshold
 
     @staticmethod
     def configure_action(args):
@@ -141,6 +434,16 @@ class Configuration(object):
             args.platform = None
         if "print_url" not in dir(args):
             args.print_url = False
+        if "item_type" not in dir(args):
+            args.item_type = None
+        if "verify_workers" not in dir(args):
+            args.verify_workers = ConfigData.verify_workers
+        if "disk_readers" not in dir(args):
+            args.disk_readers = ConfigData.disk_readers
+        if "import_md5" not in dir(args):
+            args.import_md5 = False
+        if "export_md5" not in dir(args):
+            args.export_md5 = False
 
         if args.action is not None:
             if args.platform is None:
@@ -158,6 +461,10 @@ class Configuration(object):
             args.action = "download"
         ConfigData.action = args.action
         ConfigData.print_url = args.print_url
+        ConfigData.import_md5 = args.import_md5
+        ConfigData.export_md5 = args.export_md5
+        ConfigData.verify_workers = args.verify_workers
+        ConfigData.disk_readers = args.disk_readers
 
     @staticmethod
     def dump_configuration():
@@ -178,22 +485,146 @@ class Configuration(object):
                 True, "Config", "force_md5=%s" % ConfigData.force_md5)
         logger.display_message(
                 True, "Config", "ignore_md5=%s" % ConfigData.ignore_md5)
+        logger.display_message(
+                True, "Config", "compute_sha1=%s" % ConfigData.compute_sha1)
+        logger.display_message(
+                True, "Config", "state_database=%s" %
+                ConfigData.state_database)
+        logger.display_message(
+                True, "Config", "verify_mode=%s" % ConfigData.verify_mode)
+        logger.display_message(
+                True, "Config", "reverify_days=%s" % ConfigData.reverify_days)
         logger.display_message(
                 True, "Config", "debug=%s" % ConfigData.debug)
+        logger.display_message(
+                True, "Config", "api_base_url=%s" % ConfigData.api_base_url)
         logger.display_message(
                 True, "Config", "download_location=%s" %
                 ConfigData.download_location)
         logger.display_message(
                 True, "Config", "chunksize=%s" % ConfigData.chunk_size)
+        logger.display_message(
+                True, "Config", "hash_engine=%s" % ConfigData.hash_engine)
         logger.display_message(
                 True, "Config", "resume_downloads=%s" %
                 ConfigData.resume_downloads)
+        logger.display_message(
+                True, "Config", "url_expiry_margin=%s" %
+                ConfigData.url_expiry_margin)
+        logger.display_message(
+                True, "Config", "url_refresh_attempts=%s" %
+                ConfigData.url_refresh_attempts)
+        logger.display_message(
+                True, "Config", "http_retries=%s" % ConfigData.http_retries)
+        logger.display_message(
+                True, "Config", "http_backoff=%s" % ConfigData.http_backoff)
+        logger.display_message(
+                True, "Config", "http_pool_size=%s" %
+                ConfigData.http_pool_size)
+        logger.display_message(
+                True, "Config", "download_pool_size=%s" %
+                ConfigData.download_pool_size)
+        logger.display_message(
+                True, "Config", "download_timeout=%s" %
+                ConfigData.download_timeout)
+        logger.display_message(
+                True, "Config", "preallocate=%s" % ConfigData.preallocate)
+        logger.display_message(
+                True, "Config", "keep_order_data=%s" %
+                ConfigData.keep_order_data)
+        logger.display_message(
+                True, "Config", "metrics_file=%s" % ConfigData.metrics_file)
+        logger.display_message(
+                True, "Config", "metrics_format=%s" %
+                ConfigData.metrics_format)
+        logger.display_message(
+                True, "Config", "max_rate=%s" % ConfigData.max_rate)
+        logger.display_message(
+                True, "Config", "transfer_rate=%s" % ConfigData.transfer_rate)
+        for window in ConfigData.rate_schedule:
+            logger.display_message(
+                    True, "Config", "rate_schedule %s-%s=%s" %
+                    (window.get("start"), window.get("end"),
+                     window.get("rate")))
+        logger.display_message(
+                True, "Config", "order_workers=%s" % ConfigData.order_workers)
+        logger.display_message(
+                True, "Config", "order_cache=%s" % ConfigData.order_cache)
+        logger.display_message(
+                True, "Config", "order_cache_ttl=%s" %
+                ConfigData.order_cache_ttl)
+        logger.display_message(
+                True, "Config", "refresh=%s" % ConfigData.refresh_orders)
+        logger.display_message(
+                True, "Config", "profile=%s (cpu=%s, memory=%s) to %s" %
+                (ConfigData.profile, ConfigData.profile_cpu,
+                 ConfigData.profile_memory, ConfigData.profile_report))
+        logger.display_message(
+                True, "Config", "verify_workers=%s" %
+                ConfigData.verify_workers)
+        logger.display_message(
+                True, "Config", "disk_readers=%s" % ConfigData.disk_readers)
+        logger.display_message(
+                True, "Config", "download_workers=%s" %
+                ConfigData.download_workers)
+        logger.display_message(
+                True, "Config", "host_connections=%s" %
+                ConfigData.host_connections)
+        logger.display_message(
+                True, "Config", "download_order=%s" %
+                ConfigData.download_order)
+        logger.display_message(
+                True, "Config", "pipeline=%s (queue=%s)" %
+                (ConfigData.pipeline, ConfigData.pipeline_queue))
+        logger.display_message(
+                True, "Config", "incremental_sync=%s" %
+                ConfigData.incremental_sync)
+        logger.display_message(
+                True, "Config", "dedup=%s" % ConfigData.dedup)
+        logger.display_message(
+                True, "Config", "run_journal=%s (rescan=%s)" %
+                (ConfigData.run_journal, ConfigData.rescan))
+        logger.display_message(
+                True, "Config", "segments=%s" % ConfigData.segments)
+        logger.display_message(
+                True, "Config", "segment_threshold=%s" %
+                ConfigData.segment_threshold)
 
         for platform in list(ConfigData.download_platforms.keys()):
             logger.display_message(
                     True, "Config", "Platform %s=%s" %
                     (platform, ConfigData.download_platforms[platform]))
 
+    @staticmethod
+    def retry_policy():
+        """
+            Builds the retry policy applied to every HTTP request.
+
+            :return:  A RetryPolicy.
+        """
+        return RetryPolicy(ConfigData.http_retries, ConfigData.http_backoff)
+
+    @staticmethod
+    def pool_size():
+        """
+            Returns the number of connections to keep alive per host, large
+            enough for every worker thread by default.
+
+            :return:  The pool size.
+        """
+        return ConfigData.http_pool_size or max(10, ConfigData.order_workers)
+
+    @staticmethod
+    def download_pool_size():
+        """
+            Returns the number of connections to keep alive per download host,
+            enough for every concurrent transfer and segment by default.
+
+            :return:  The pool size.
+        """
+        return ConfigData.download_pool_size or max(
+                10, ConfigData.download_workers * max(1, ConfigData.segments))
+
     @staticmethod
     def push_configuration():
         """
@@ -204,5 +635,25 @@ class Configuration(object):
         """
         HumbleHash.write_md5 = ConfigData.write_md5
         HumbleHash.read_md5 = ConfigData.read_md5
-        HumbleHash.force_md5 = ConfigData.force_md5
+        HumbleHash.force_md5 = (ConfigData.force_md5 or
+                                ConfigData.verify_mode == "checksum")
+        HumbleHash.reverify_interval = ConfigData.reverify_days * 86400
         HumbleHash.chunk_size = ConfigData.chunk_size
+        HumbleHash.engine = ConfigData.hash_engine
+        BaseModel.keep_data = ConfigData.keep_order_data
+        HumbleDownload.retry_policy = Configuration.retry_policy()
+        HumbleDownload.pool_size = Configuration.download_pool_size()
+        RateLimiter.max_rate = ConfigData.max_rate
+        RateLimiter.transfer_rate = ConfigData.transfer_rate
+        RateLimiter.schedule = ConfigData.rate_schedule
+        SyncIndex.incremental = ConfigData.incremental_sync
+        Dedup.mode = ConfigData.dedup
+        RunJournal.filename = None
+        if ConfigData.run_journal:
+            RunJournal.filename = os.path.join(ConfigData.download_location,
+                                               ConfigData.JOURNAL_FILENAME)
+        HumbleState.database_filename = None
+        if ConfigData.state_database:
+            HumbleState.database_filename = os.path.join(
+                    ConfigData.download_location,
+                    ConfigData.STATE_DATABASE_FILENAME)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import errno
+import os
+import shutil
+import threading
+from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
+from progress_tracker import ProgressTracker
+import logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__license__ = "MIT"
+
+
+class Dedup(object):
+    """
+        Avoids downloading the same content twice.  The same file often belongs
+        to several orders, a game bought in two bundles for instance.  Before a
+        file is downloaded, the state database is searched for a verified file
+        with the same MD5, and the new path is hard linked, reflinked or copied
+        from it.  Downloads of the same MD5 are never run at the same time: the
+        second one waits for the first, then links to it.
+
+        It also detects files of the library that share a path but not their
+        content, which would otherwise replace each other on every run, and
+        saves the later ones under a distinct filename.
+    """
+    MODE_OFF = "off"
+    MODE_HARDLINK = "hardlink"
+    MODE_REFLINK = "reflink"
+    MODE_COPY = "copy"
+    MODES = [MODE_OFF, MODE_HARDLINK, MODE_REFLINK, MODE_COPY]
+
+    # The ioctl cloning a file on Linux, missing from fcntl before Python 3.12.
+    FICLONE = 0x40049409
+
+    mode = MODE_HARDLINK
+
+    saved_files = 0
+    saved_bytes = 0
+
+    # MD5 -> lock held while a file with this MD5 is placed.
+    _locks = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        """
+            :return:  True if downloads are deduplicated, which requires the
+            state database.
+        """
+        return Dedup.mode != Dedup.MODE_OFF and HumbleState.enabled()
+
+    @staticmethod
+    def reset():
+        """ Forgets the files seen and saved by a previous run. """
+        with Dedup._lock:
+            Dedup.saved_files = 0
+            Dedup.saved_bytes = 0
+            Dedup._locks = {}
+        # The paths of a whole library are kept by the state database, so
+        # that memory does not grow with it.
+        if HumbleState.enabled():
+            HumbleState.clear_claims()
+
+    @staticmethod
+    def claim(hd):
+        """
+            Registers the path of a file of the library.  A file whose path is
+            already taken by a file with another MD5 is given a distinct
+            filename, suffixed with its MD5, and keeps it in later runs.
+
+            :param hd:  The HumbleDownload, whose filename may be changed.
+            :return:  None
+        """
+        if not Dedup.enabled():
+            return
+        separate_filename = Dedup.separate_filename(hd)
+        separated = HumbleState.get(os.path.join(
+                os.path.dirname(hd.full_filename), separate_filename))
+        if separated is not None and \
+                separated["expected_md5"] == hd.humble_md5:
+            # Separated from a colliding file by a previous run.
+            hd.filename = separate_filename
+
+        md5, key = HumbleState.claim(hd.full_filename, hd.humble_md5,
+                                     hd.order_number)
+        if md5 == hd.humble_md5:
+            return
+        full_filename = hd.full_filename
+        hd.filename = separate_filename
+        HumbleState.claim(hd.full_filename, hd.humble_md5, hd.order_number)
+        logger.display_message(
+                False, "Warning",
+                "%s of order %s has the same path as a different file of "
+                "order %s, it is saved as %s." %
+                (full_filename, hd.order_number, key, hd.full_filename))
+
+    @staticmethod
+    def separate_filename(hd):
+        """
+            :param hd:  The HumbleDownload.
+            :return:  The filename of hd suffixed with its MD5, used when
+            another file of the library has the same path.
+        """
+        root, extension = os.path.splitext(hd.filename)
+        return "%s-%s%s" % (root, hd.humble_md5[:8], extension)
+
+    @staticmethod
+    def lock(md5):
+        """
+            :param md5:  The MD5 of a file.
+            :return:  The lock to hold while the file is linked or downloaded.
+        """
+        with Dedup._lock:
+            return Dedup._locks.setdefault(md5, threading.Lock())
+
+    @staticmethod
+    def link(hd):
+        """
+            Places the file of a download from a verified local file with the
+            same MD5, if there is one.
+
+            :param hd:  The HumbleDownload.
+            :return:  True if the file is in place and needs no download.
+        """
+        if not Dedup.enabled():
+            return False
+
+        full_filename = hd.full_filename
+        for source in HumbleState.paths(hd.humble_md5):
+            if HumbleState.checksum(source) != hd.humble_md5:
+                continue
+            if source == full_filename:
+                # Downloaded for another order during this run.
+                logger.display_message(
+                        False, "Dedup", "%s was already downloaded." %
+                        full_filename)
+            else:
+                hd.remove()
+                Dedup.place(source, full_filename)
+                HumbleHash.store_checksum(full_filename, hd.humble_md5, None,
+                                          hd.humble_md5, hd.humble_sha1)
+                logger.display_message(
+                        False, "Dedup", "%s placed from %s." %
+                        (full_filename, source))
+            with Dedup._lock:
+                Dedup.saved_files += 1
+                Dedup.saved_bytes += hd.humble_file_size or 0
+            return True
+        return False
+
+    @staticmethod
+    def place(source, target, mode=None):
+        """
+            Creates target with the content of source.  Reflinks and hard
+            links fall back to a copy where the filesystem does not support
+            them, or when both files are on different devices.
+
+            :param source:  The full path of the existing file.
+            :param target:  The full path of the file to create.
+            :param mode:  (optional) One of Dedup.MODES, Dedup.mode by
+            default.
+            :return:  None
+        """
+        if mode is None:
+            mode = Dedup.mode
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = target + ".tmp"
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        try:
+            try:
+                if mode == Dedup.MODE_HARDLINK:
+                    os.link(source, temporary)
+                elif mode == Dedup.MODE_REFLINK:
+                    Dedup.__reflink(source, temporary)
+                else:
+                    shutil.copyfile(source, temporary)
+            except OSError:
+                if mode == Dedup.MODE_COPY:
+                    raise
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                shutil.copyfile(source, temporary)
+            os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    @staticmethod
+    def __reflink(source, target):
+        """ Clones a file, sharing its blocks on copy on write filesystems. """
+        if fcntl is None:
+            raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported.")
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), getattr(fcntl, "FICLONE", Dedup.FICLONE),
+                        src.fileno())
+
+    @staticmethod
+    def report():
+        """ Displays the number of files and bytes not downloaded. """
+        if Dedup.saved_files == 0:
+            return
+        message = "%d files deduplicated, %s not downloaded" % (
+                Dedup.saved_files,
+                ProgressTracker.format_filesize(Dedup.saved_bytes))
+        # Estimated from the rate of the transfers of this run.
+        rate = ProgressTracker.throughput()
+        if rate > 0:
+            message += " (about %.0f seconds of transfer)" % (
+                    Dedup.saved_bytes / rate)
+        logger.display_message(False, "Dedup", message + ".")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+from urllib.parse import urlparse
+
+__license__ = "MIT"
+
+
+class DownloadScheduler(object):
+    """
+        Runs several downloads at once.  The number of concurrent transfers is
+        limited globally and for each host serving the files, and the queue is
+        ordered by file size.
+
+        Downloads are either all given to run(), or streamed: start() starts
+        the workers, submit() queues downloads as they are found, and close()
+        then join() wait for the last ones.  Streamed downloads are only
+        ordered among those queued at the same time.
+    """
+    ORDER_NONE = "none"
+    ORDER_LARGEST = "largest"
+    ORDER_SMALLEST = "smallest"
+    ORDERS = [ORDER_NONE, ORDER_LARGEST, ORDER_SMALLEST]
+
+    def __init__(self, workers=1, host_connections=2, order=ORDER_NONE,
+                 max_queued=0):
+        """
+            Parameterized constructor for the DownloadScheduler.
+
+            :param workers:  The maximum number of concurrent transfers.
+            :param host_connections:  The maximum number of concurrent
+            transfers from a single host.
+            :param order:  One of DownloadScheduler.ORDERS.
+            :param max_queued:  The maximum number of downloads submit()
+            queues before blocking, 0 for no limit.
+        """
+        self.workers = max(1, workers)
+        self.host_connections = max(1, host_connections)
+        self.order = order
+        self.max_queued = max(0, max_queued)
+
+        self._condition = threading.Condition()
+        self._queue = []
+        self._active_hosts = {}
+        self._error = None
+        self._closed = True
+        self._threads = []
+
+    @staticmethod
+    def sort(humble_downloads, order):
+        """
+            Orders a list of downloads by file size.  The sort is stable, so
+            files of equal size keep their relative order.
+
+            :param humble_downloads:  The list of HumbleDownload to sort.
+            :param order:  One of DownloadScheduler.ORDERS.
+            :return:  A new, sorted, list.
+        """
+        if order == DownloadScheduler.ORDER_LARGEST:
+            return sorted(humble_downloads,
+                          key=lambda hd: hd.humble_file_size or 0,
+                          reverse=True)
+        if order == DownloadScheduler.ORDER_SMALLEST:
+            return sorted(humble_downloads,
+                          key=lambda hd: hd.humble_file_size or 0)
+        return list(humble_downloads)
+
+    @staticmethod
+    def host(hd):
+        """
+            Returns the host a download is served from.
+
+            :param hd:  The HumbleDownload.
+            :return:  The host name, or an empty string if the URL has none.
+        """
+        return urlparse(hd.download_url or "").hostname or ""
+
+    def run(self, humble_downloads, transfer):
+        """
+            Transfers every download and returns when all are finished.  If a
+            transfer raises, no new transfer is started and the exception is
+            raised again once the running ones are done.
+
+            :param humble_downloads:  The list of HumbleDownload to transfer.
+            :param transfer:  The function called with each HumbleDownload,
+            from a worker thread.
+            :return:  None
+        """
+        queue = DownloadScheduler.sort(humble_downloads, self.order)
+        self.start(transfer, min(self.workers, len(queue)), queue)
+        self.close()
+        self.join()
+
+    def start(self, transfer, workers=None, queue=None):
+        """
+            Starts the workers, which wait for downloads until close() is
+            called.
+
+            :param transfer:  The function called with each HumbleDownload,
+            from a worker thread.
+            :param workers:  (optional) The number of workers to start, by
+            default self.workers.
+            :param queue:  (optional) The downloads initially queued, already
+            sorted.
+            :return:  None
+        """
+        with self._condition:
+            self._queue = list(queue or [])
+            self._active_hosts = {}
+            self._error = None
+            self._closed = False
+
+        if workers is None:
+            workers = self.workers
+        self._threads = [threading.Thread(target=self.__worker,
+                                          args=(transfer,),
+                                          name="download-%d" % i, daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, hd):
+        """
+            Queues a download, waiting while max_queued downloads are already
+            queued.
+
+            :param hd:  The HumbleDownload to transfer.
+            :return:  False if a transfer failed and the download was not
+            queued, True otherwise.
+        """
+        with self._condition:
+            while (self.max_queued > 0 and
+                   len(self._queue) >= self.max_queued and
+                   self._error is None):
+                self._condition.wait()
+            if self._error is not None:
+                return False
+            self._queue.append(hd)
+            if self.order != DownloadScheduler.ORDER_NONE:
+                self._queue = DownloadScheduler.sort(self._queue, self.order)
+            self._condition.notify_all()
+            return True
+
+    def close(self):
+        """ Tells the workers no more downloads will be submitted. """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def join(self):
+        """
+            Waits for the workers to transfer every queued download, after
+            close() was called.  If a transfer raised, the exception is raised
+            again.
+
+            :return:  None
+        """
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self._error is not None:
+            raise self._error
+
+    def __next_download(self):
+        """
+            Waits for and pops the first queued download whose host has a
+            free connection.
+
+            :return:  A (HumbleDownload, host) tuple, or (None, None) if there
+            is nothing left to do.
+        """
+        with self._condition:
+            while ((len(self._queue) > 0 or not self._closed) and
+                   self._error is None):
+                for index, hd in enumerate(self._queue):
+                    host = DownloadScheduler.host(hd)
+                    active = self._active_hosts.get(host, 0)
+                    if active < self.host_connections:
+                        self._active_hosts[host] = active + 1
+                        # Wakes up submit() waiting for room in the queue.
+                        self._condition.notify_all()
+                        return self._queue.pop(index), host
+                self._condition.wait()
+            return None, None
+
+    def __release(self, host):
+        """
+            Frees a host connection.  The url of a download may be refreshed
+            during its transfer, so the host it was counted for is given.
+        """
+        with self._condition:
+            self._active_hosts[host] -= 1
+            self._condition.notify_all()
+
+    def __worker(self, transfer):
+        while True:
+            hd, host = self.__next_download()
+            if hd is None:
+                return
+            try:
+                transfer(hd)
+            except Exception as e:
+                with self._condition:
+                    if self._error is None:
+                        self._error = e
+                    self._condition.notify_all()
+            finally:
+                self.__release(host)
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import sys
+import threading
 import logger
 from humble_api.events import Events
+from progress_tracker import ProgressTracker
 
 __author__ = "Brian Schkerke"
 __copyright__ = "Copyright 2016 Brian Schkerke"
@@ -10,34 +12,67 @@ __license__ = "MIT"
 
 
 class EventHandler(object):
+    # When several downloads run at once, their percentages would interleave
+    # on the same line: each event is then printed on its own line and the
+    # percentages are left out.
+    parallel = False
+
+    lock = threading.RLock()
+
     @staticmethod
-    def initialize():
+    def initialize(parallel=False):
+        EventHandler.parallel = parallel
         Events.on(Events.EVENT_MD5_START, EventHandler.print_md5_start)
         Events.on(Events.EVENT_MD5_END, EventHandler.print_md5_end)
         Events.on(Events.EVENT_DOWNLOAD_START,
                   EventHandler.print_download_start)
         Events.on(Events.EVENT_DOWNLOAD_END, EventHandler.print_download_end)
         Events.on(Events.EVENT_PROGRESS, EventHandler.print_progress)
+        Events.on(Events.EVENT_DOWNLOAD_PROGRESS,
+                  ProgressTracker.add_transferred)
 
     @staticmethod
     def print_md5_start(filename):
-        logger.display_message(False, "Checksum", "%s: " % filename, False)
-        sys.stdout.flush()
+        with EventHandler.lock:
+            if EventHandler.parallel:
+                logger.display_message(False, "Checksum", "%s" % filename)
+                return
+            logger.display_message(False, "Checksum", "%s: " % filename,
+                                   False)
+            sys.stdout.flush()
 
     @staticmethod
     def print_md5_end(filename):
-        print("")
+        with EventHandler.lock:
+            if EventHandler.parallel:
+                logger.display_message(False, "Checksum",
+                                       "%s: done." % filename)
+                return
+            print("")
 
     @staticmethod
     def print_download_start(filename):
-        logger.display_message(False, "Download", "%s: " % filename, False)
-        sys.stdout.flush()
+        with EventHandler.lock:
+            if EventHandler.parallel:
+                logger.display_message(False, "Download", "%s" % filename)
+                return
+            logger.display_message(False, "Download", "%s: " % filename,
+                                   False)
+            sys.stdout.flush()
 
     @staticmethod
     def print_download_end(filename):
-        print("")
+        with EventHandler.lock:
+            if EventHandler.parallel:
+                logger.display_message(False, "Download",
+                                       "%s: done." % filename)
+                return
+            print("")
 
     @staticmethod
     def print_progress(percentage):
-        sys.stdout.write("{0:.0f}% ".format(percentage))
-        sys.stdout.flush()
+        with EventHandler.lock:
+            if EventHandler.parallel:
+                return
+            sys.stdout.write("{0:.0f}% ".format(percentage))
+            sys.stdout.flush()
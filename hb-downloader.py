@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
 import logger
 from config_data import ConfigData
 from configuration import Configuration
 from event_handler import EventHandler
 from humble_api.humble_api import HumbleApi
+from humble_api.order_cache import OrderCache
+from metrics import Metrics
+from profiler import Profiler
 from actions import Action
 
 __author__ = "Brian Schkerke"
@@ -30,24 +34,56 @@ if not validation_status:
     exit("Invalid configuration.  Please check your command line arguments and"
          "hb-downloader-settings.yaml.")
 
+if ConfigData.action == "state":
+    Action.manage_state()
+    exit()
+
+if ConfigData.profile:
+    Profiler.start(ConfigData.profile_report, ConfigData.profile_cpu,
+                   ConfigData.profile_memory)
+
 # Initialize the event handlers.
-EventHandler.initialize()
+EventHandler.initialize(ConfigData.download_workers > 1)
+Metrics.initialize()
 
-hapi = HumbleApi(ConfigData.auth_sess_cookie)
+order_cache = None
+if ConfigData.order_cache:
+    # --refresh revalidates every cached order.
+    order_cache = OrderCache(
+            os.path.join(ConfigData.download_location,
+                         ConfigData.CACHE_DIRECTORY, "orders"),
+            0 if ConfigData.refresh_orders else
+            ConfigData.order_cache_ttl * 3600)
+hapi = HumbleApi(ConfigData.auth_sess_cookie, order_cache,
+                 Configuration.retry_policy(), Configuration.pool_size(),
+                 ConfigData.api_base_url)
 
-if not hapi.check_login():
+with Profiler.phase("login check"):
+    logged_in = hapi.check_login()
+if not logged_in:
         exit("Login to humblebundle.com failed."
              "  Please verify your authentication cookie")
 
 logger.display_message(False, "Processing", "Downloading order list.")
-game_keys = hapi.get_gamekeys()
+with Profiler.phase("gamekey fetch"):
+    game_keys = hapi.get_gamekeys()
 logger.display_message(False, "Processing", "%s orders found." %
                        (len(game_keys)))
 
-if ConfigData.action == "download":
-    Action.batch_download(hapi, game_keys)
-else:
-    Action.list_downloads(hapi, game_keys)
+try:
+    if ConfigData.action == "download" and ConfigData.pipeline:
+        Action.pipeline_download(hapi, game_keys)
+    elif ConfigData.action == "download":
+        Action.batch_download(hapi, game_keys)
+    elif ConfigData.action == "verify":
+        Action.verify(hapi, game_keys)
+    else:
+        Action.list_downloads(hapi, game_keys)
+finally:
+    if ConfigData.metrics_file:
+        Metrics.write(ConfigData.metrics_file, ConfigData.metrics_format)
+        logger.display_message(False, "Processing", "Metrics written to %s." %
+                               ConfigData.metrics_file)
 
 
 exit()
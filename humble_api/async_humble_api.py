@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from .model.order import Order
+from .humble_api_base import HumbleApiBase
+from .exceptions.humble_authentication_exception import HumbleAuthenticationException
+from .exceptions.humble_response_exception import HumbleResponseException
+from .exceptions.humble_parse_exception import HumbleParseException
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    aiohttp = None
+
+__license__ = "MIT"
+
+__all__ = ["AsyncHumbleApi"]
+
+
+class AsyncHumbleApi(HumbleApiBase):
+    """
+        The asyncio counterpart of HumbleApi, built on a pooled aiohttp session.  Hundreds of
+        requests can be multiplexed on a single event loop, for instance with get_orders.
+
+        The session is opened by open(), or by using the client as an async context manager:
+
+            async with AsyncHumbleApi(cookie) as hapi:
+                orders = await hapi.get_orders(await hapi.get_gamekeys())
+
+        aiohttp is an optional dependency, only required by this client.
+    """
+
+    def __init__(self, auth_sess_cookie, order_cache=None, connections=100, connections_per_host=0,
+                 timeout=30, base_url=None):
+        """
+            Parameterized constructor.
+
+            :param auth_sess_cookie: The _simpleauth_sess cookie value.
+            :param order_cache: (optional) The OrderCache used by get_order.
+            :param int connections: (optional) The size of the connection pool.
+            :param int connections_per_host: (optional) The maximum number of connections to a single
+             host, 0 for no limit.
+            :param timeout: (optional) The total timeout of a request, in seconds.
+            :param str base_url: (optional) The root of the API URLs, humblebundle.com by default.
+            :raises ImportError: if aiohttp is not installed.
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncHumbleApi requires the aiohttp library.")
+
+        super(AsyncHumbleApi, self).__init__(auth_sess_cookie, order_cache, base_url)
+        self.connections = connections
+        self.connections_per_host = connections_per_host
+        self.timeout = timeout
+        self.session = None
+
+    async def open(self):
+        """ Opens the session and its connection pool. """
+        if self.session is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.connections, limit_per_host=self.connections_per_host)
+        self.session = aiohttp.ClientSession(
+                connector=connector, headers=self.default_headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                cookie_jar=aiohttp.CookieJar(unsafe=True))
+        self.session.cookie_jar.update_cookies(
+                {"_simpleauth_sess": self.auth_sess_cookie},
+                URL(self.BASE_URL + "/"))
+
+    async def close(self):
+        """ Closes the session and its connections. """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def check_login(self):
+        """
+            Checks to see if we have a valid session cookie by attempting to retrieve the orders page.
+
+            :return: True if the _simpleauth_sess cookie is valid, False if not.
+        """
+        try:
+            gamekeys = await self.get_gamekeys()
+            return len(gamekeys) > 0
+        except HumbleAuthenticationException:
+            return False
+
+    async def get_gamekeys(self, **kwargs):
+        """
+            Fetch all the gamekeys owned by an account.
+
+            :param dict kwargs: (optional) Extra keyword args to pass to the request
+            :return: A list of gamekeys
+            :rtype: list
+            :raises aiohttp.ClientError: if the connection failed
+            :raises HumbleAuthenticationException: if not logged in
+            :raises HumbleResponseException: if the response was invalid
+        """
+        start = time.perf_counter()
+        async with self._request("GET", self.ORDER_LIST_URL, **kwargs) as response:
+            self._record_request("order_list", start, response.status)
+            data = await self.__parse_data(response)
+            return self._gamekeys_from_data(response, data)
+
+    async def get_order(self, order_id, refresh=False, **kwargs):
+        """
+            Download an order by its ID, using the order cache like HumbleApi.get_order.
+
+            :param order_id: The identifier ("gamekey") that uniquely identifies the order
+            :param bool refresh: (optional) Ignore the cache, for instance to get fresh download URLs
+            :param dict kwargs: (optional) Extra keyword args to pass to the request
+            :return: The :py:class:`Order` requested
+            :rtype: Order
+            :raises aiohttp.ClientError: if the connection failed
+            :raises HumbleAuthenticationException: if not logged in
+            :raises HumbleResponseException: if the response was invalid
+        """
+        url = self.ORDER_URL.format(order_id=order_id)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        cached, fresh = self._cached_order(order_id, refresh, headers)
+        if fresh:
+            return Order(cached["data"])
+
+        start = time.perf_counter()
+        async with self._request("GET", url, headers=headers, **kwargs) as response:
+            self._record_request("order", start, response.status)
+            if cached is not None and response.status == 304:
+                self.order_cache.touch(cached, order_id)
+                return Order(cached["data"])
+
+            if response.status == 404:
+                raise HumbleResponseException("Order not found", response=response)
+
+            data = await self.__parse_data(response)
+
+            if self._authenticated_response_helper(response, data):
+                self._store_order(order_id, data, response.headers)
+                return Order(data)
+
+    async def get_orders(self, order_ids, concurrency=16, refresh=False):
+        """
+            Downloads several orders concurrently.
+
+            :param list order_ids: The identifiers ("gamekeys") of the orders.
+            :param int concurrency: (optional) The maximum number of requests in flight.
+            :param bool refresh: (optional) Ignore the cache.
+            :return: The list of orders, in the same order as order_ids.
+            :rtype: list
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get_order(order_id):
+            async with semaphore:
+                return await self.get_order(order_id, refresh=refresh)
+
+        return await asyncio.gather(*[get_order(order_id) for order_id in order_ids])
+
+    async def download(self, url, full_filename, offset=0, chunk_size=1048576):
+        """
+            Streams a file to disk, resuming at offset if it is not 0.  The file is opened and written on
+            the default executor, so that disk I/O never blocks the other coroutines of the loop.
+
+            :param str url: The download URL.
+            :param str full_filename: The full path and filename to write.
+            :param int offset: (optional) The number of bytes already on disk.
+            :param int chunk_size: (optional) The size of the chunks written.
+            :return: The number of bytes written.
+            :rtype: int
+        """
+        headers = {"Range": "bytes=%d-" % offset} if offset > 0 else {}
+        written = 0
+        loop = asyncio.get_event_loop()
+        # Downloads use neither the API parameters nor the authentication cookie.
+        async with self.session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as response:
+            response.raise_for_status()
+            mode = "ab" if offset > 0 and response.status == 206 else "wb"
+            f = await loop.run_in_executor(None, open, full_filename, mode)
+            try:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    await loop.run_in_executor(None, f.write, chunk)
+                    written += len(chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+        return written
+
+    def _request(self, method, url, **kwargs):
+        """
+            Adds the default parameters to a request.
+
+            :param str method: The HTTP method.
+            :param str url: The URL to request.
+            :param dict kwargs: (optional) Extra keyword args to pass to the request.
+            :return: The request context manager.
+        """
+        params = dict(self.default_params)
+        params.update(kwargs.pop("params", None) or {})
+        return self.session.request(method, url, params=params, **kwargs)
+
+    async def __parse_data(self, response):
+        """
+            Try and parse the response data as JSON.  If parsing fails, throw a HumbleParseException.
+
+            :param response:  The response received from humblebundle.com.
+            :return:  The response as a JSON object.
+            :raises HumbleParseException:  When the response cannot be parsed as a JSON object.
+        """
+        try:
+            return await response.json(content_type=None)
+        except ValueError as e:
+            raise HumbleParseException("Invalid JSON: %s" % str(e), response=response)
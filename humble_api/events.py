@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import threading
+
 __author__ = "Brian Schkerke"
 __copyright__ = "Copyright 2016 Brian Schkerke"
 __license__ = "MIT"
@@ -12,14 +14,21 @@ class Events(object):
         of callbacks to events as defined solely by string IDs.  The event handlers
         should have the function event_handler(object_type); the only argument passed
         to the callback is the object which instantiated the event.
+
+        Events may be triggered from several threads at once; the callbacks are
+        responsible for their own synchronization.
     """
     _callbacks = None
+    _lock = threading.Lock()
 
     EVENT_MD5_START = "MD5_Start"
     EVENT_MD5_END = "MD5_End"
     EVENT_DOWNLOAD_START = "Download_Start"
     EVENT_DOWNLOAD_END = "Download_End"
     EVENT_PROGRESS = "Progress"
+    EVENT_DOWNLOAD_PROGRESS = "Download_Progress"
+    EVENT_API_REQUEST = "API_Request"
+    EVENT_HTTP_RETRY = "HTTP_Retry"
 
     @staticmethod
     def on(event_name, callback):
@@ -35,13 +44,14 @@ class Events(object):
         if callback is None:
             return
 
-        if Events._callbacks is None:
-            Events._callbacks = {}
+        with Events._lock:
+            if Events._callbacks is None:
+                Events._callbacks = {}
 
-        if event_name not in Events._callbacks:
-            Events._callbacks[event_name] = [callback]
-        else:
-            Events._callbacks[event_name].append(callback)
+            if event_name not in Events._callbacks:
+                Events._callbacks[event_name] = [callback]
+            else:
+                Events._callbacks[event_name].append(callback)
 
     @staticmethod
     def trigger(event_name, callback_argument):
@@ -54,9 +64,13 @@ class Events(object):
         if event_name is None or len(event_name) == 0:
             return
 
-        if Events._callbacks is not None and event_name in Events._callbacks:
-            for callback in Events._callbacks[event_name]:
-                callback(callback_argument)
+        with Events._lock:
+            if Events._callbacks is None or event_name not in Events._callbacks:
+                return
+            callbacks = list(Events._callbacks[event_name])
+
+        for callback in callbacks:
+            callback(callback_argument)
 
     @staticmethod
     def check_percent(current, total, current_percentage):
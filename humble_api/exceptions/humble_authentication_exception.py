@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from .humble_response_exception import HumbleResponseException
+
+__author__ = "Joel Pedraza"
+__copyright__ = "Copyright 2014, Joel Pedraza"
+__license__ = "MIT"
+
+
+class HumbleAuthenticationException(HumbleResponseException):
+    """ An authenticated API call was made without a valid session. """
+    pass
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import http.cookiejar
-import itertools
+import time
 from .model.order import Order
 import requests
+from .humble_api_base import HumbleApiBase
+from .retry_policy import RetryPolicy
+from .exceptions.humble_authentication_exception import HumbleAuthenticationException
 from .exceptions.humble_response_exception import HumbleResponseException
 from .exceptions.humble_parse_exception import HumbleParseException
 
@@ -14,7 +17,7 @@ __license__ = "MIT"
 __all__ = ["HumbleApi"]
 
 
-class HumbleApi(object):
+class HumbleApi(HumbleApiBase):
     """
         This class represents common actions for the Humble API.
 
@@ -22,40 +25,31 @@ class HumbleApi(object):
 
         The Requests.Session handles storing the auth token. To load some persisted cookies simply set session.cookies
         after initialization.
+
+        See AsyncHumbleApi for a client sharing the same interface on top of asyncio.
     """
 
-    # URLs.
-    LOGIN_URL = "https://www.humblebundle.com/processlogin"
-    ORDER_LIST_URL = "https://www.humblebundle.com/api/v1/user/order"
-    ORDER_URL = "https://www.humblebundle.com/api/v1/order/{order_id}"
-
-    # default_headers specifies the default HTTP headers added to each request sent to the humblebundle.com servers.
-    default_headers = {
-        "Accept": "application/json",
-        "Accept-Charset": "utf-8",
-        "Keep-Alive": "true",
-        "X-Requested-By": "hb_android_app",
-        "User-Agent": "Apache-HttpClient/UNAVAILABLE (java 1.4)"
-    }
-
-    # default_params specifies the default querystring parameters added to each
-    # request sent to humblebundle.com.
-    default_params = {"ajax": "true"}
-
-    def __init__(self, auth_sess_cookie):
+    def __init__(self, auth_sess_cookie, order_cache=None, retry_policy=None, pool_size=10, base_url=None):
         """
             Base constructor.  Responsible for setting up the requests object
             and cookie jar. All configuration values should be set prior to
             constructing an object of this type; changes to configuration will
             not take effect on variables which already exist.
+
+            :param auth_sess_cookie: The _simpleauth_sess cookie value.
+            :param order_cache: (optional) The OrderCache used by get_order.
+            :param retry_policy: (optional) The RetryPolicy applied to every request.
+            :param int pool_size: (optional) The number of connections kept alive, which should be at
+             least the number of threads sharing this object.
+            :param str base_url: (optional) The root of the API URLs, humblebundle.com by default.
         """
-        self.session = requests.Session()
+        super(HumbleApi, self).__init__(auth_sess_cookie, order_cache, base_url)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.session = RetryPolicy.mount(requests.Session(), pool_size)
 
-        auth_sess_cookie = bytes(
-                auth_sess_cookie, "utf-8").decode("unicode_escape")
         cookie = http.cookiejar.Cookie(
-                0, "_simpleauth_sess", auth_sess_cookie, None, None,
-                "www.humblebundle.com", None, None, "/", None, True,
+                0, "_simpleauth_sess", self.auth_sess_cookie, None, None,
+                self.COOKIE_DOMAIN, None, None, "/", None, self.cookie_secure,
                 None, False, None, None, None)
         self.session.cookies.set_cookie(cookie)
 
@@ -96,26 +90,23 @@ class HumbleApi(object):
             :raises HumbleAuthenticationException: if not logged in
             :raises HumbleResponseException: if the response was invalid
         """
-        response = self._request("GET", HumbleApi.ORDER_LIST_URL, *args, **kwargs)
+        response = self._request("GET", self.ORDER_LIST_URL, *args, endpoint="order_list", **kwargs)
 
         """ get_gamekeys response always returns JSON """
         data = self.__parse_data(response)
 
-        if isinstance(data, list):
-            return [v["gamekey"] for v in data]
-
-        # Let the helper function raise any common exceptions
-        self.__authenticated_response_helper(response, data)
+        return self._gamekeys_from_data(response, data)
 
-        # We didn't get a list, or an error message
-        raise HumbleResponseException("Unexpected response body", request=response.request, response=response)
-
-    def get_order(self, order_id, *args, **kwargs):
+    def get_order(self, order_id, *args, refresh=False, **kwargs):
         """
             Download an order by its ID.
 
+            If an order cache is set, a cached order is returned without any request while it is
+            fresh, and revalidated with a conditional request once it is not.
+
             :param order_id: The identifier ("gamekey") that uniquely identifies the order
             :param list args: (optional) Extra positional args to pass to the request
+            :param bool refresh: (optional) Ignore the cache, for instance to get fresh download URLs
             :param dict kwargs: (optional) Extra keyword args to pass to the request
             :return: The :py:class:`Order` requested
             :rtype: Order
@@ -123,9 +114,20 @@ class HumbleApi(object):
             :raises HumbleAuthenticationException: if not logged in
             :raises HumbleResponseException: if the response was invalid
         """
-        url = HumbleApi.ORDER_URL.format(order_id=order_id)
+        url = self.ORDER_URL.format(order_id=order_id)
 
-        response = self._request("GET", url, *args, **kwargs)
+        headers = dict(kwargs.pop("headers", None) or {})
+        cached, fresh = self._cached_order(order_id, refresh, headers)
+        if fresh:
+            return Order(cached["data"])
+        if len(headers) > 0:
+            kwargs["headers"] = headers
+
+        response = self._request("GET", url, *args, endpoint="order", **kwargs)
+
+        if cached is not None and response.status_code == requests.codes.not_modified:
+            self.order_cache.touch(cached, order_id)
+            return Order(cached["data"])
 
         """ order response might be 404 with no body if not found """
 
@@ -135,49 +137,25 @@ class HumbleApi(object):
         data = self.__parse_data(response)
 
         # The helper function should be sufficient to catch any other errors
-        if self.__authenticated_response_helper(response, data):
+        if self._authenticated_response_helper(response, data):
+            self._store_order(order_id, data, response.headers)
             return Order(data)
 
     def _request(self, *args, **kwargs):
         """
-            Set sane defaults that aren't session wide. Otherwise maintains the API of Session.request.
+            Set sane defaults that aren't session wide, and retry transient errors. Otherwise maintains
+            the API of Session.request, with an extra endpoint keyword naming the endpoint in the
+            Events.EVENT_API_REQUEST event reporting the latency of the request.
 
             :param list args: (optional) Extra positional args to pass to the request.
             :param dict kwargs: (optional) Extra keyword args to pass to the request.
         """
+        endpoint = kwargs.pop("endpoint", None)
         kwargs.setdefault("timeout", 30)
-        return self.session.request(*args, **kwargs)
-
-    def __authenticated_response_helper(self, response, data):
-        """
-            Checks a response for the common authentication errors.  Sometimes a successful API call won't have a
-             success property.  We do a check for this property and return true if found, otherwise we parse for
-s             errors.
-
-            :param response:  The response received from humblebundle.com. A pass through variable used to initialize
-             the exceptions.
-            :param data:  The interpreted JSON data from the response.
-            :return:  True if the API call was successful.  Otherwise an exception is thrown.
-            :raises HumbleAuthenticationException: If not logged in.
-            :raises HumbleResponseException: If the response was invalid.
-        """
-        success = data.get("success", None)
-        if success:
-            return True
-
-        error_id = data.get("error_id", None)
-        errors, error_msg = self.__get_errors(data)
-
-        # API calls that require login and have a missing or invalid token.
-        if error_id == "login_required":
-            raise HumbleAuthenticationException(error_msg, request=response.request, response=response)
-
-        # Something happened, we're not sure what but we hope the error_msg is useful.
-        if success is False or errors is not None or error_id is not None:
-            raise HumbleResponseException(error_msg, request=response.request, response=response)
-
-        # Response had no success or errors fields, it's probably data
-        return True
+        start = time.perf_counter()
+        response = self.retry_policy.send(self.session.request, *args, **kwargs)
+        self._record_request(endpoint, start, response.status_code)
+        return response
 
     def __parse_data(self, response):
         """
@@ -192,15 +170,3 @@ s             errors.
             return response.json()
         except ValueError as e:
             raise HumbleParseException("Invalid JSON: %s", str(e), request=response.request, response=response)
-
-    def __get_errors(self, data):
-        """
-            Retrieves any errors defined within the JSON and returns them as a string.
-
-            :param data: The JSON data to be searched for errors.
-            :return:  A tuple containing the errors and error message.
-        """
-        errors = data.get("errors", None)
-        error_msg = ", ".join(itertools.chain.from_iterable(v for k, v in list(errors.items()))) \
-            if errors else "Unspecified error"
-        return errors, error_msg
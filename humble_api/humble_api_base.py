@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import itertools
+import time
+from .events import Events
+from urllib.parse import urlparse
+from .exceptions.humble_authentication_exception import HumbleAuthenticationException
+from .exceptions.humble_response_exception import HumbleResponseException
+
+__author__ = "Joel Pedraza"
+__copyright__ = "Copyright 2014, Joel Pedraza"
+__license__ = "MIT"
+
+__all__ = ["HumbleApiBase"]
+
+
+class HumbleApiBase(object):
+    """
+        The parts of the Humble API clients that don't depend on the HTTP library: URLs, default
+        headers, order caching and the interpretation of responses.
+    """
+
+    # URLs, all relative to BASE_URL unless another base URL is given to the constructor.
+    BASE_URL = "https://www.humblebundle.com"
+    LOGIN_URL = BASE_URL + "/processlogin"
+    ORDER_LIST_URL = BASE_URL + "/api/v1/user/order"
+    ORDER_URL = BASE_URL + "/api/v1/order/{order_id}"
+
+    # The domain of the authentication cookie.
+    COOKIE_DOMAIN = "www.humblebundle.com"
+
+    # default_headers specifies the default HTTP headers added to each request sent to the humblebundle.com servers.
+    default_headers = {
+        "Accept": "application/json",
+        "Accept-Charset": "utf-8",
+        "Keep-Alive": "true",
+        "X-Requested-By": "hb_android_app",
+        "User-Agent": "Apache-HttpClient/UNAVAILABLE (java 1.4)"
+    }
+
+    # default_params specifies the default querystring parameters added to each
+    # request sent to humblebundle.com.
+    default_params = {"ajax": "true"}
+
+    def __init__(self, auth_sess_cookie, order_cache=None, base_url=None):
+        """
+            Parameterized constructor.
+
+            :param auth_sess_cookie: The _simpleauth_sess cookie value, as copied from a browser.
+            :param order_cache: (optional) The OrderCache used by get_order.
+            :param str base_url: (optional) The root of the API URLs, to use a server other than
+             humblebundle.com, such as the mock server of the benchmarks.
+        """
+        self.order_cache = order_cache
+        self.auth_sess_cookie = bytes(auth_sess_cookie, "utf-8").decode("unicode_escape")
+
+        if base_url is not None:
+            base_url = base_url.rstrip("/")
+            self.BASE_URL = base_url
+            self.LOGIN_URL = base_url + "/processlogin"
+            self.ORDER_LIST_URL = base_url + "/api/v1/user/order"
+            self.ORDER_URL = base_url + "/api/v1/order/{order_id}"
+            self.COOKIE_DOMAIN = urlparse(base_url).hostname
+
+    @property
+    def cookie_secure(self):
+        """
+            :return: True if the authentication cookie may only be sent over HTTPS.
+            :rtype: bool
+        """
+        return urlparse(self.BASE_URL).scheme == "https"
+
+    def _record_request(self, endpoint, start, status):
+        """
+            Reports the latency of an API request with Events.EVENT_API_REQUEST.
+
+            :param str endpoint: The name of the endpoint, "order_list" or "order".
+            :param float start: The time.perf_counter() value when the request was sent.
+            :param int status: The HTTP status of the response.
+            :return: None
+        """
+        Events.trigger(Events.EVENT_API_REQUEST, {"endpoint": endpoint, "status": status,
+                                                  "seconds": time.perf_counter() - start})
+
+    def _cached_order(self, order_id, refresh, headers):
+        """
+            Looks an order up in the cache.
+
+            :param order_id: The identifier ("gamekey") of the order.
+            :param bool refresh: Whether the cache should be bypassed.
+            :param dict headers: The headers of the request, to which the conditional headers are added
+             when the cached order must be revalidated.
+            :return: A tuple of the cache entry (or None) and whether it can be used as is.
+        """
+        if self.order_cache is None or refresh:
+            return None, False
+
+        cached = self.order_cache.get(order_id)
+        if cached is None:
+            return None, False
+        if self.order_cache.is_fresh(cached):
+            return cached, True
+
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return cached, False
+
+    def _store_order(self, order_id, data, headers):
+        """
+            Saves a retrieved order to the cache, if any.
+
+            :param order_id: The identifier ("gamekey") of the order.
+            :param dict data: The JSON data of the order.
+            :param headers: The headers of the response.
+        """
+        if self.order_cache is not None:
+            self.order_cache.store(order_id, data, headers.get("ETag"), headers.get("Last-Modified"))
+
+    def _gamekeys_from_data(self, response, data):
+        """
+            Extracts the gamekeys from the order list.
+
+            :param response:  The response received from humblebundle.com.
+            :param data:  The interpreted JSON data from the response.
+            :return: A list of gamekeys
+            :rtype: list
+            :raises HumbleAuthenticationException: if not logged in
+            :raises HumbleResponseException: if the response was invalid
+        """
+        if isinstance(data, list):
+            return [v["gamekey"] for v in data]
+
+        # Let the helper function raise any common exceptions
+        self._authenticated_response_helper(response, data)
+
+        # We didn't get a list, or an error message
+        raise HumbleResponseException("Unexpected response body", request=getattr(response, "request", None),
+                                      response=response)
+
+    def _authenticated_response_helper(self, response, data):
+        """
+            Checks a response for the common authentication errors.  Sometimes a successful API call won't have a
+             success property.  We do a check for this property and return true if found, otherwise we parse for
+             errors.
+
+            :param response:  The response received from humblebundle.com. A pass through variable used to initialize
+             the exceptions.
+            :param data:  The interpreted JSON data from the response.
+            :return:  True if the API call was successful.  Otherwise an exception is thrown.
+            :raises HumbleAuthenticationException: If not logged in.
+            :raises HumbleResponseException: If the response was invalid.
+        """
+        success = data.get("success", None)
+        if success:
+            return True
+
+        error_id = data.get("error_id", None)
+        errors, error_msg = self._get_errors(data)
+        request = getattr(response, "request", None)
+
+        # API calls that require login and have a missing or invalid token.
+        if error_id == "login_required":
+            raise HumbleAuthenticationException(error_msg, request=request, response=response)
+
+        # Something happened, we're not sure what but we hope the error_msg is useful.
+        if success is False or errors is not None or error_id is not None:
+            raise HumbleResponseException(error_msg, request=request, response=response)
+
+        # Response had no success or errors fields, it's probably data
+        return True
+
+    def _get_errors(self, data):
+        """
+            Retrieves any errors defined within the JSON and returns them as a string.
+
+            :param data: The JSON data to be searched for errors.
+            :return:  A tuple containing the errors and error message.
+        """
+        errors = data.get("errors", None)
+        error_msg = ", ".join(itertools.chain.from_iterable(v for k, v in list(errors.items()))) \
+            if errors else "Unspecified error"
+        return errors, error_msg
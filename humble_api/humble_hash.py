@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import hashlib
+import mmap
 import os
 from .events import Events
+from .humble_state import HumbleState
 
 __author__ = "Brian Schkerke"
 __copyright__ = "Copyright 2016 Brian Schkerke"
@@ -20,13 +22,23 @@ class HumbleHash(object):
     force_md5 = False
     write_md5 = True
     read_md5 = True
+    reverify_interval = 0
+
+    # How files are read: "read" allocates a new bytes object per chunk, "readinto" reuses a single
+    # buffer and "mmap" hashes the page cache directly.  The last two hint the kernel that files are
+    # read sequentially and drop them from the page cache once hashed, so that verifying a large
+    # library doesn't evict everything else.
+    engines = ["read", "readinto", "mmap"]
+    engine = "readinto"
 
     @staticmethod
-    def calculate_checksum(full_filename):
+    def calculate_checksum(full_filename, notify=True):
         """
             Calculates the MD5 checksum for the given file and returns the hex representation.
 
             :param full_filename: The full path and filename of the file to calculate the MD5 for.
+            :param notify: Whether to trigger the MD5 and progress events, which only make sense when
+             a single file is hashed at a time.
             :return: The hex representation of the MD5 hash.
             :rtype: str
         """
@@ -39,44 +51,164 @@ class HumbleHash(object):
             total_length = os.path.getsize(full_filename)
             read_bytes = 0
 
-            Events.trigger(Events.EVENT_MD5_START, full_filename)
+            if notify:
+                Events.trigger(Events.EVENT_MD5_START, full_filename)
 
             md5_hash = hashlib.md5()
-            while True:
-                data = f.read(HumbleHash.chunk_size)
-                read_bytes += HumbleHash.chunk_size
-                read_bytes = min(total_length, read_bytes)
+            for data in HumbleHash.read_chunks(f):
+                read_bytes = min(total_length, read_bytes + len(data))
+
+                md5_hash.update(data)
+                if notify:
+                    current_percentage = Events.check_percent(read_bytes, total_length, current_percentage)
+
+            if notify:
+                Events.trigger(Events.EVENT_MD5_END, full_filename)
+            HumbleHash.store_checksum(full_filename, md5_hash.hexdigest())
+            return md5_hash.hexdigest()
+
+    @staticmethod
+    def update_hashes(full_filename, hashes, length=None):
+        """
+            Feeds the beginning of a file to a list of hash objects, for
+            instance to account for the part of a resumed download that is
+            already on disk.
+
+            :param full_filename: The full path and filename of the file to read.
+            :param hashes: The hashlib objects to update.
+            :param length: The number of bytes to read, or None to read the whole file.
+            :return: None
+        """
+        with open(full_filename, "rb") as f:
+            for data in HumbleHash.read_chunks(f, length):
+                for file_hash in hashes:
+                    file_hash.update(data)
+
+    @staticmethod
+    def read_chunks(f, length=None, engine=None):
+        """
+            Reads a file in chunks of chunk_size bytes with a hashing engine.
 
+            :param f: The file, opened in binary mode at its beginning.
+            :param length: (optional) The number of bytes to read, or None to read the whole file.
+            :param str engine: (optional) The engine to use, HumbleHash.engine by default.
+            :return: A generator of bytes-like chunks, each one only valid until the next one is read.
+        """
+        engine = engine or HumbleHash.engine
+        size = os.fstat(f.fileno()).st_size
+        if length is not None:
+            size = min(size, length)
+
+        if engine == "read":
+            remaining = size
+            while remaining > 0:
+                data = f.read(min(HumbleHash.chunk_size, remaining))
                 if not data:
                     break
+                remaining -= len(data)
+                yield data
+            return
 
-                md5_hash.update(data)
-                current_percentage = Events.check_percent(read_bytes, total_length, current_percentage)
+        HumbleHash.__advise(f, 0, size, "POSIX_FADV_SEQUENTIAL")
+        if engine == "mmap" and size > 0:
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(mapped) as view:
+                    for offset in range(0, size, HumbleHash.chunk_size):
+                        # Views must be released before the map is closed.
+                        with view[offset:offset + HumbleHash.chunk_size] as data:
+                            yield data
+                        HumbleHash.__advise(f, offset, HumbleHash.chunk_size, "POSIX_FADV_DONTNEED")
+            return
 
-            Events.trigger(Events.EVENT_MD5_END, full_filename)
-            HumbleHash.write_md5file(full_filename, md5_hash.hexdigest())
-            return md5_hash.hexdigest()
+        buffer = bytearray(HumbleHash.chunk_size)
+        with memoryview(buffer) as view:
+            offset = 0
+            while offset < size:
+                count = f.readinto(view[:min(len(buffer), size - offset)])
+                if not count:
+                    break
+                yield view[:count]
+                HumbleHash.__advise(f, offset, count, "POSIX_FADV_DONTNEED")
+                offset += count
 
     @staticmethod
-    def checksum(full_filename):
+    def __advise(f, offset, length, advice):
         """
-            Retrieves or calculates the checksum for the given filename.  First checks for the
-            existence of an MD5 file and reads the MD5 value from it, if possible.  Otherwise it
-            calculates the checksum of the given file and returns the value.
+            Gives the kernel a hint about how a part of a file is accessed, where supported.
+
+            :param f: The file.
+            :param int offset: The start of the part of the file.
+            :param int length: The length of the part of the file.
+            :param str advice: The name of the os.POSIX_FADV_* constant.
+            :return: None
+        """
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(f.fileno(), offset, length, getattr(os, advice))
+            except OSError:
+                pass
+
+    @staticmethod
+    def checksum(full_filename, stat=None, notify=True):
+        """
+            Retrieves or calculates the checksum for the given filename.  First checks the state
+            database, then for the existence of an MD5 file and reads the MD5 value from it, if
+            possible.  Otherwise it calculates the checksum of the given file and returns the value.
+
+            A checksum from the state database is trusted without reading the file as long as the
+            size and modification time of the file are unchanged and it was verified less than
+            reverify_interval seconds ago.  force_md5 always calculates the checksum.
 
             :param full_filename: The full path and filename of the file to calculate and compare the MD5 hash for.
+            :param stat: (optional) The os.stat result of the file, if already known.
+            :param bool notify: (optional) Whether to trigger the progress events of a calculation.
             :return: The MD5 checksum of the provided path and filename as a string.
             :rtype: string
         """
-        if full_filename is None or not os.path.exists(full_filename):
+        if full_filename is None:
             return ""
+        if stat is None:
+            try:
+                stat = os.stat(full_filename)
+            except OSError:
+                return ""
+
+        if HumbleHash.force_md5:
+            return HumbleHash.calculate_checksum(full_filename, notify)
+
+        if HumbleHash.read_md5 and HumbleState.enabled():
+            stored_checksum = HumbleState.checksum(full_filename, stat, HumbleHash.reverify_interval)
+            if len(stored_checksum) > 0:
+                return stored_checksum
 
         stored_checksum = HumbleHash.read_md5file(full_filename)
         if len(stored_checksum) == 0:
-            stored_checksum = HumbleHash.calculate_checksum(full_filename)
+            stored_checksum = HumbleHash.calculate_checksum(full_filename, notify)
+        elif HumbleState.enabled():
+            # Import the MD5 file so it doesn't have to be read again.
+            HumbleState.record(full_filename, stored_checksum, stat=stat)
 
         return stored_checksum
 
+    @staticmethod
+    def store_checksum(full_filename, checksum, sha1=None, expected_md5=None, expected_sha1=None):
+        """
+            Saves the checksums computed for a file in the state database, if enabled, and in an
+            MD5 file if write_md5 is set.
+
+            :param str full_filename: The full path and filename of the file.
+            :param str checksum: The MD5 hash value of the file.
+            :param str sha1: (optional) The SHA1 hash value of the file.
+            :param str expected_md5: (optional) The MD5 reported by humblebundle.com.
+            :param str expected_sha1: (optional) The SHA1 reported by humblebundle.com.
+            :return: None
+        """
+        if HumbleState.enabled():
+            HumbleState.record(full_filename, checksum, sha1, expected_md5, expected_sha1)
+        HumbleHash.write_md5file(full_filename, checksum)
+
     @staticmethod
     def verify_checksum(full_filename, checksum):
         """
@@ -95,11 +227,12 @@ class HumbleHash(object):
     @staticmethod
     def remove_md5file(full_filename):
         """
-            Removes an MD5 file from storage.
+            Removes an MD5 file from storage, and forgets the checksum kept in the state database,
+            whether or not the file still exists.
 
             :param full_filename: The full path and filename of the file to remove the MD5 checksum for.
         """
-        if full_filename is None or not os.path.exists(full_filename):
+        if full_filename is None:
             return
 
         md5full_filename = HumbleHash.md5filename(full_filename)
@@ -107,6 +240,9 @@ class HumbleHash(object):
         if os.path.exists(md5full_filename):
             os.remove(md5full_filename)
 
+        if HumbleState.enabled():
+            HumbleState.remove(full_filename)
+
     @staticmethod
     def read_md5file(full_filename):
         """
@@ -150,6 +286,17 @@ class HumbleHash(object):
         if not HumbleHash.write_md5:
             return
 
+        HumbleHash.__write_md5file(full_filename, checksum)
+
+    @staticmethod
+    def __write_md5file(full_filename, checksum):
+        """
+            Writes an MD5 file for a given filename, regardless of write_md5.
+
+            :param str full_filename: The full path and filename of the file to create an MD5 file for.
+            :param str checksum: The MD5 hash value of the given file, if known.
+            :return: None
+        """
         if full_filename is None:
             return
 
@@ -165,6 +312,44 @@ class HumbleHash(object):
         with open(md5full_filename, "wb") as f:
             f.write((checksum + " *%s" % local_filename).encode())
 
+    @staticmethod
+    def import_md5files(directory):
+        """
+            Imports every MD5 file found under a directory in the state database.
+
+            :param str directory: The directory to search, usually the download location.
+            :return: The number of checksums imported.
+            :rtype: int
+        """
+        imported = 0
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if not filename.endswith(".md5"):
+                    continue
+                full_filename = os.path.join(root, filename[:-len(".md5")])
+                if not os.path.exists(full_filename):
+                    continue
+                checksum = HumbleHash.read_md5file(full_filename)
+                if len(checksum) > 0:
+                    HumbleState.record(full_filename, checksum)
+                    imported += 1
+        return imported
+
+    @staticmethod
+    def export_md5files():
+        """
+            Writes an MD5 file for every file of the state database that still exists.
+
+            :return: The number of MD5 files written.
+            :rtype: int
+        """
+        exported = 0
+        for full_filename, checksum in HumbleState.entries():
+            if os.path.exists(full_filename):
+                HumbleHash.__write_md5file(full_filename, checksum)
+                exported += 1
+        return exported
+
     @staticmethod
     def md5filename(full_filename):
         """
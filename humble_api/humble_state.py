@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import threading
+import time
+
+__license__ = "MIT"
+
+__all__ = ["HumbleState"]
+
+
+class HumbleState(object):
+    """
+        HumbleState keeps the verification state of every download in a single SQLite database,
+        keyed by the full path of the file.  It replaces the per file MD5 sidecars: a stored
+        checksum is trusted as long as the size and modification time of the file are the ones
+        recorded along with it.
+
+        It also indexes the orders whose files were all downloaded and verified, along with a
+        fingerprint of their download set, so that unchanged orders can be skipped.
+
+        The database is opened on first use; set database_filename to None to disable it.
+    """
+    database_filename = None
+
+    _connection = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def enabled():
+        """
+            :return: True if a state database is configured.
+            :rtype: bool
+        """
+        return HumbleState.database_filename is not None
+
+    @staticmethod
+    def connection():
+        """
+            Returns the connection to the state database, creating the database if needed.
+
+            :return: The sqlite3 connection.
+        """
+        with HumbleState._lock:
+            if HumbleState._connection is None:
+                connection = sqlite3.connect(HumbleState.database_filename, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                        "CREATE TABLE IF NOT EXISTS files ("
+                        "path TEXT PRIMARY KEY, expected_md5 TEXT, expected_sha1 TEXT, "
+                        "md5 TEXT, sha1 TEXT, size INTEGER, mtime REAL, verified_at REAL)")
+                connection.execute("CREATE INDEX IF NOT EXISTS files_md5 ON files (md5)")
+                connection.execute(
+                        "CREATE TABLE IF NOT EXISTS orders ("
+                        "gamekey TEXT PRIMARY KEY, fingerprint TEXT, synced_at REAL)")
+                # The paths of the files seen during a run, kept out of memory and never synced.
+                connection.execute(
+                        "CREATE TEMP TABLE IF NOT EXISTS claims (path TEXT PRIMARY KEY, md5 TEXT, gamekey TEXT)")
+                connection.commit()
+                HumbleState._connection = connection
+            return HumbleState._connection
+
+    @staticmethod
+    def close():
+        """ Closes the state database. """
+        with HumbleState._lock:
+            if HumbleState._connection is not None:
+                HumbleState._connection.close()
+                HumbleState._connection = None
+
+    @staticmethod
+    def get(full_filename):
+        """
+            Retrieves the stored state of a file.
+
+            :param full_filename: The full path and filename of the file.
+            :return: A dictionary with the columns of the files table, or None if the file is unknown.
+            :rtype: dict
+        """
+        with HumbleState._lock:
+            cursor = HumbleState.connection().execute(
+                    "SELECT path, expected_md5, expected_sha1, md5, sha1, size, mtime, verified_at "
+                    "FROM files WHERE path = ?", (full_filename,))
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+        return dict(zip(["path", "expected_md5", "expected_sha1", "md5", "sha1", "size", "mtime",
+                         "verified_at"], row))
+
+    @staticmethod
+    def checksum(full_filename, stat=None, max_age=0):
+        """
+            Returns the stored MD5 of a file if the file has not changed since it was recorded.
+
+            :param full_filename: The full path and filename of the file.
+            :param stat: The os.stat result of the file, if already known.
+            :param max_age: The number of seconds after which a verification is considered outdated,
+             0 to trust it forever.
+            :return: The MD5 value, or an empty string if it is unknown or outdated.
+            :rtype: str
+        """
+        entry = HumbleState.get(full_filename)
+        if entry is None or not entry["md5"]:
+            return ""
+
+        if stat is None:
+            try:
+                stat = os.stat(full_filename)
+            except OSError:
+                return ""
+
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            return ""
+        if max_age > 0 and time.time() - (entry["verified_at"] or 0) > max_age:
+            return ""
+        return entry["md5"]
+
+    @staticmethod
+    def record(full_filename, md5, sha1=None, expected_md5=None, expected_sha1=None, stat=None):
+        """
+            Records the checksums computed for a file, along with its current size and modification time.
+
+            :param str full_filename: The full path and filename of the file.
+            :param str md5: The MD5 of the file.
+            :param str sha1: (optional) The SHA1 of the file.
+            :param str expected_md5: (optional) The MD5 reported by humblebundle.com.
+            :param str expected_sha1: (optional) The SHA1 reported by humblebundle.com.
+            :param stat: (optional) The os.stat result of the file, if already known.
+            :return: None
+        """
+        if stat is None:
+            stat = os.stat(full_filename)
+
+        with HumbleState._lock:
+            connection = HumbleState.connection()
+            # An UPDATE then an INSERT rather than an UPSERT, which requires SQLite 3.24.
+            values = (expected_md5, expected_sha1, md5, sha1, stat.st_size, stat.st_mtime, time.time())
+            cursor = connection.execute(
+                    "UPDATE files SET expected_md5 = COALESCE(?, expected_md5), "
+                    "expected_sha1 = COALESCE(?, expected_sha1), md5 = ?, sha1 = ?, size = ?, mtime = ?, "
+                    "verified_at = ? WHERE path = ?", values + (full_filename,))
+            if cursor.rowcount == 0:
+                connection.execute(
+                        "INSERT INTO files (expected_md5, expected_sha1, md5, sha1, size, mtime, verified_at, path) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values + (full_filename,))
+            connection.commit()
+
+    @staticmethod
+    def remove(full_filename):
+        """
+            Forgets the state of a file.
+
+            :param full_filename: The full path and filename of the file.
+            :return: None
+        """
+        with HumbleState._lock:
+            connection = HumbleState.connection()
+            connection.execute("DELETE FROM files WHERE path = ?", (full_filename,))
+            connection.commit()
+
+    @staticmethod
+    def entries():
+        """
+            :return: The list of (path, md5) tuples of every recorded file.
+            :rtype: list
+        """
+        with HumbleState._lock:
+            return HumbleState.connection().execute(
+                    "SELECT path, md5 FROM files WHERE md5 IS NOT NULL ORDER BY path").fetchall()
+
+    @staticmethod
+    def paths(md5):
+        """
+            Lists the files recorded with a given MD5, whether or not they changed since.
+
+            :param str md5: The MD5 of the content.
+            :return: The list of full paths.
+            :rtype: list
+        """
+        with HumbleState._lock:
+            return [row[0] for row in HumbleState.connection().execute(
+                    "SELECT path FROM files WHERE md5 = ? ORDER BY path", (md5,))]
+
+    @staticmethod
+    def order_fingerprint(gamekey):
+        """
+            Retrieves the fingerprint of the download set of an order recorded when all its files
+            were last downloaded and verified.
+
+            :param str gamekey: The identifier of the order.
+            :return: The fingerprint, or None if the order is not indexed.
+            :rtype: str
+        """
+        with HumbleState._lock:
+            row = HumbleState.connection().execute(
+                    "SELECT fingerprint FROM orders WHERE gamekey = ?", (gamekey,)).fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def record_order(gamekey, fingerprint):
+        """
+            Records that all the files of an order are downloaded and verified.
+
+            :param str gamekey: The identifier of the order.
+            :param str fingerprint: The fingerprint of the download set of the order.
+            :return: None
+        """
+        with HumbleState._lock:
+            connection = HumbleState.connection()
+            connection.execute(
+                    "INSERT OR REPLACE INTO orders (gamekey, fingerprint, synced_at) VALUES (?, ?, ?)",
+                    (gamekey, fingerprint, time.time()))
+            connection.commit()
+
+    @staticmethod
+    def remove_order(gamekey):
+        """
+            Removes an order from the index, so that its files are checked again.
+
+            :param str gamekey: The identifier of the order.
+            :return: None
+        """
+        with HumbleState._lock:
+            connection = HumbleState.connection()
+            connection.execute("DELETE FROM orders WHERE gamekey = ?", (gamekey,))
+            connection.commit()
+
+    @staticmethod
+    def claim(path, md5, gamekey):
+        """
+            Claims a path for a file during the current run, unless another file already did.
+
+            :param str path: The full path of the file.
+            :param str md5: The MD5 of the file.
+            :param str gamekey: The identifier of the order of the file.
+            :return: The (md5, gamekey) tuple of the file owning the path.
+            :rtype: tuple
+        """
+        with HumbleState._lock:
+            connection = HumbleState.connection()
+            connection.execute("INSERT OR IGNORE INTO claims (path, md5, gamekey) VALUES (?, ?, ?)",
+                               (path, md5, gamekey))
+            connection.commit()
+            return tuple(connection.execute("SELECT md5, gamekey FROM claims WHERE path = ?",
+                                            (path,)).fetchone())
+
+    @staticmethod
+    def clear_claims():
+        """ Forgets the paths claimed during a previous run. """
+        with HumbleState._lock:
+            connection = HumbleState.connection()
+            connection.execute("DELETE FROM claims")
+            connection.commit()
@@ -9,7 +9,16 @@ __license__ = "MIT"
 class BaseModel(object):
     """
         Represents the base object used by all of the Humble Bundle objects.
+
+        Models declare their fields with __slots__, and their lists of child models with LazyModels,
+        which only builds them when they are first accessed: thousands of orders can be held without
+        a dictionary per object, nor child objects that are never used.
     """
+    __slots__ = ("_data",)
+
+    # Whether each object keeps the JSON data it was built from in _data.  Without it, the JSON of
+    # an order is released once parsed, the fields of its objects being the only copy left.
+    keep_data = True
 
     def __init__(self, data):
         """
@@ -17,7 +26,23 @@ class BaseModel(object):
 
             :param data: The JSON data to define the object with.
         """
-        self._data = data
+        self._data = data if BaseModel.keep_data else None
+
+    def _fields(self):
+        """
+            Lists the public fields of the object, its lazy lists included.
+
+            :return: The list of the field names.
+            :rtype: list
+        """
+        fields = []
+        for cls in reversed(type(self).__mro__):
+            for name in cls.__dict__.get("__slots__", ()):
+                if not name.startswith("_"):
+                    fields.append(name)
+                elif isinstance(getattr(cls, name[1:], None), LazyModels):
+                    fields.append(name[1:])
+        return fields
 
     def __unicode__(self):
         """
@@ -31,7 +56,7 @@ class BaseModel(object):
             Called by the str() built-in function and by the print statement to compute the
             "informal" string representation of an object encoded as ASCII.
         """
-        return str({key: self.__dict__[key] for key in self.__dict__ if key != "_client"})
+        return str({key: getattr(self, key) for key in self._fields()})
 
     def __repr__(self):
         """
@@ -40,7 +65,7 @@ class BaseModel(object):
             should look like a valid Python expression that could be used to recreate an object
             with the same value (given an appropriate environment).
         """
-        return repr(self.__dict__)
+        return repr({key: getattr(self, key) for key in self._fields()})
 
     def __iter__(self):
         """
@@ -48,4 +73,48 @@ class BaseModel(object):
            automatically return an iterator object (technically, a generator object) supplying
            the  __iter__() and next() methods.
         """
-        return self.__dict__.__iter__()
+        return iter(self._fields())
+
+
+class UnparsedModels(object):
+    """
+        The JSON list of child models not built yet, held by a LazyModels attribute.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class LazyModels(object):
+    """
+        A descriptor for a list of child models, built from their JSON on first access.  The
+        constructor of a model stores UnparsedModels(json_list) in the attribute, whose slot is the
+        name of the attribute prefixed with an underscore.
+    """
+
+    def __init__(self, model, empty=None):
+        """
+            Parameterized constructor for the LazyModels descriptor.
+
+            :param model: The class of the child models.
+            :param empty: The value of the attribute when the JSON list is empty.
+        """
+        self.model = model
+        self.empty = empty
+        self.slot = None
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if type(value) is UnparsedModels:
+            value = [self.model(item) for item in value.data] or self.empty
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from .base_model import BaseModel
+from .base_model import BaseModel, LazyModels, UnparsedModels
 from .download_struct import DownloadStruct
 
 __author__ = "Joel Pedraza"
@@ -21,6 +21,11 @@ class Download(BaseModel):
         download_structs:  The definitions of the actual download locations.
     """
 
+    __slots__ = ("machine_name", "platform", "_download_structs", "options_dict", "download_identifier",
+                 "download_version_number", "android_app_only")
+
+    download_structs = LazyModels(DownloadStruct, [])
+
     def __init__(self, data):
         """
             Parameterized constructor for the Download object.
@@ -31,7 +36,7 @@ class Download(BaseModel):
 
         self.machine_name = data.get("machine_name", None)
         self.platform = data.get("platform", None)
-        self.download_structs = [DownloadStruct(struct) for struct in data["download_struct"]]
+        self.download_structs = UnparsedModels(data["download_struct"])
         self.options_dict = data["options_dict"]
         self.download_identifier = data.get("download_identifier", None)
         self.download_version_number = data.get("download_version_number", None)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from .base_model import BaseModel
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
 
 __author__ = "Joel Pedraza"
 __copyright__ = "Copyright 2014, Joel Pedraza"
@@ -16,11 +16,17 @@ class DownloadStruct(BaseModel):
         md5:  The MD5 checksum for the item.
         name:  The name of the item.  Sometimes very useless.
         url:  The URLs to use for downloading the item, either via BitTorrent or the web.
+        download_web_expiry:  The time at which the signed web URL expires, as a UNIX timestamp, or None
+         if it is unknown.
         human_size:  A human readable size for the item.
         file_size:  A machine readable size for the item.  This is used during MD5 calculations.
         small:  0 or 1.  Unknown purpose.
     """
 
+    __slots__ = ("sha1", "name", "human_size", "file_size", "md5", "small", "uses_kindle_sender",
+                 "kindle_friendly", "download_web", "download_bittorrent", "filename",
+                 "download_web_expiry")
+
     def __init__(self, data):
         """
             Parameterized constructor for the DownloadStruct object.
@@ -45,6 +51,32 @@ class DownloadStruct(BaseModel):
             self.download_web = url_dictionary.get("web", None)
             self.download_bittorrent = url_dictionary.get("bittorrent", None)
         self.filename = self.__determine_filename()
+        self.download_web_expiry = DownloadStruct.url_expiry(self.download_web)
+
+    @staticmethod
+    def url_expiry(url):
+        """
+            Determines when a signed download URL expires.  The expiry is a query parameter, named
+            ttl on dl.humble.com, Expires on CloudFront, and the first part of __gda__ on Akamai.
+
+            :param url:  The signed URL.
+            :return:  The expiry as a UNIX timestamp, or None if the URL carries none.
+            :rtype: int
+        """
+        if not url:
+            return None
+
+        query = parse_qs(urlparse(url).query)
+        for name in ["ttl", "Expires"]:
+            if name in query and query[name][0].isdigit():
+                return int(query[name][0])
+
+        if "__gda__" in query:
+            expiry = query["__gda__"][0].split("_")[0]
+            if expiry.isdigit():
+                return int(expiry)
+
+        return None
 
     def __determine_filename(self):
         """
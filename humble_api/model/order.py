@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from .base_model import BaseModel
+from .base_model import BaseModel, LazyModels, UnparsedModels
 from .subscription import Subscription
 from .subproduct import Subproduct
 from .product import Product
@@ -16,6 +16,11 @@ class Order(BaseModel):
         products which were a part of the order.
     """
 
+    __slots__ = ("product", "_subscriptions", "created", "amount_to_charge", "gamekey", "_subproducts")
+
+    subscriptions = LazyModels(Subscription)
+    subproducts = LazyModels(Subproduct)
+
     def __init__(self, data):
         """
             Parameterized constructor for the Order object.
@@ -25,15 +30,12 @@ class Order(BaseModel):
         super(Order, self).__init__(data)
 
         self.product = Product(data["product"])
-        subscriptions_json = data.get("subscriptions", [])
-        self.subscriptions = \
-            [Subscription(sub) for sub in subscriptions_json] \
-            if len(subscriptions_json) > 0 else None
+        self.subscriptions = UnparsedModels(data.get("subscriptions", []))
 
         self.created = data.get("created", None)
         self.amount_to_charge = data.get("amount_to_charge", None)
         self.gamekey = data.get("gamekey", None)
-        self.subproducts = ([Subproduct(prod) for prod in data.get("subproducts", [])]) or None
+        self.subproducts = UnparsedModels(data.get("subproducts", []))
 
         # Former fields that I couldn't locate in my output:
         #   thankname, claimed, country, giftee, leaderboard, owner_username
@@ -15,6 +15,8 @@ class Payee(BaseModel):
         machine_name:  The name of the payee usable on a PC.
     """
 
+    __slots__ = ("human_name", "machine_name")
+
     def __init__(self, data):
         """
             Parameterized constructor for the Payee object.
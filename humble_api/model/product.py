@@ -19,6 +19,9 @@ class Product(BaseModel):
         partial_gift_enabled:
     """
 
+    __slots__ = ("category", "machine_name", "post_purchase_text", "supports_canonical", "human_name",
+                 "partial_gift_enabled")
+
     def __init__(self, data):
         """
             Parameterized constructor for the Product object.
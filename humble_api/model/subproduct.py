@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from .base_model import BaseModel
+from .base_model import BaseModel, LazyModels, UnparsedModels
 from .payee import Payee
 from .download import Download
 
@@ -24,6 +24,11 @@ class Subproduct(BaseModel):
         icon:  The icon to be displayed for the subproduct.
     """
 
+    __slots__ = ("machine_name", "url", "payee", "_downloads", "human_name", "custom_download_page_box_html",
+                 "icon", "platform", "product_name")
+
+    downloads = LazyModels(Download, [])
+
     def __init__(self, data):
         """
             Parameterized constructor for the Subproduct object.
@@ -36,7 +41,7 @@ class Subproduct(BaseModel):
         self.machine_name = data.get("machine_name", None)
         self.url = data.get("url", None)
         self.payee = Payee(data["payee"])
-        self.downloads = [Download(download) for download in data["downloads"]]
+        self.downloads = UnparsedModels(data["downloads"])
         self.human_name = data.get("human_name", None)
         self.custom_download_page_box_html = data.get("custom_download_page_box_html", None)
         self.icon = data.get("icon", None)
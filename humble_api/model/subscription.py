@@ -18,6 +18,8 @@ class Subscription(BaseModel):
         subscribed:
     """
 
+    __slots__ = ("human_name", "list_name", "subscribed")
+
     def __init__(self, data):
         """
             Parameterized constructor for the Subscription object.
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+
+__license__ = "MIT"
+
+__all__ = ["OrderCache"]
+
+
+class OrderCache(object):
+    """
+        Stores the JSON of orders on disk, one file per order, along with the validators (ETag and
+        Last-Modified) the server sent with it.  Orders rarely change after purchase, so a cached
+        order is used as is for ttl seconds, then revalidated with a conditional request.
+
+        Signed download URLs expire much sooner than the orders themselves: callers needing usable
+        URLs must bypass the cache.
+    """
+
+    def __init__(self, directory, ttl):
+        """
+            Parameterized constructor for the OrderCache.
+
+            :param str directory: The directory holding the cached orders, created if needed.
+            :param ttl: The number of seconds during which a cached order is used without
+             revalidation.
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def filename(self, order_id):
+        """
+            :param order_id: The identifier ("gamekey") of the order.
+            :return: The full path and filename of the cached order.
+            :rtype: str
+        """
+        return os.path.join(self.directory, "%s.json" % order_id)
+
+    def get(self, order_id):
+        """
+            Retrieves a cached order.
+
+            :param order_id: The identifier ("gamekey") of the order.
+            :return: A dictionary with the fetched_at, etag, last_modified and data keys, or None if
+             the order is not cached.
+            :rtype: dict
+        """
+        try:
+            with open(self.filename(order_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        """
+            :param dict entry: A cache entry, as returned by get.
+            :return: True if the entry can be used without revalidation.
+            :rtype: bool
+        """
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def store(self, order_id, data, etag=None, last_modified=None):
+        """
+            Saves an order to the cache.
+
+            :param order_id: The identifier ("gamekey") of the order.
+            :param dict data: The JSON data of the order.
+            :param str etag: (optional) The ETag header of the response.
+            :param str last_modified: (optional) The Last-Modified header of the response.
+            :return: None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_filename = self.filename(order_id) + ".tmp"
+        with open(temporary_filename, "w") as f:
+            json.dump({"fetched_at": time.time(), "etag": etag, "last_modified": last_modified,
+                       "data": data}, f)
+        os.replace(temporary_filename, self.filename(order_id))
+
+    def touch(self, entry, order_id):
+        """
+            Marks a cached order as revalidated.
+
+            :param dict entry: The cache entry, as returned by get.
+            :param order_id: The identifier ("gamekey") of the order.
+            :return: None
+        """
+        self.store(order_id, entry["data"], entry.get("etag"), entry.get("last_modified"))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import email.utils
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .events import Events
+
+__license__ = "MIT"
+
+__all__ = ["RetryPolicy"]
+
+
+class RetryPolicy(object):
+    """
+        Retries requests failing with a transient error: connection errors, timeouts and the
+        statuses in retry_statuses.  Attempts are spaced by an exponential backoff with full
+        jitter, unless the server asks for a specific delay with a Retry-After header.
+
+        Every retry triggers Events.EVENT_HTTP_RETRY with a dictionary holding the url and the reason
+        of the failure.
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, retries=3, backoff=1.0, max_backoff=60.0):
+        """
+            Parameterized constructor for the RetryPolicy.
+
+            :param int retries: The number of retries after the first attempt, 0 to disable retries.
+            :param float backoff: The base delay between attempts, in seconds.
+            :param float max_backoff: The maximum delay between attempts, in seconds.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def send(self, request_function, *args, **kwargs):
+        """
+            Calls request_function until it returns a response which isn't a transient error or the
+            retries are exhausted.
+
+            :param request_function: The function sending the request, such as Session.request.
+            :param list args: (optional) Positional args to pass to request_function.
+            :param dict kwargs: (optional) Keyword args to pass to request_function.
+            :return: The last response.
+            :raises RequestException: if the last attempt failed to connect.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = request_function(*args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                Events.trigger(Events.EVENT_HTTP_RETRY, {"url": getattr(e.request, "url", None),
+                                                         "reason": type(e).__name__})
+                self.wait(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code not in self.retry_statuses or attempt >= self.retries:
+                return response
+
+            response.close()
+            Events.trigger(Events.EVENT_HTTP_RETRY, {"url": response.url, "reason": response.status_code})
+            self.wait(attempt, response)
+            attempt += 1
+
+    def wait(self, attempt, response=None):
+        """
+            Sleeps before a new attempt.
+
+            :param int attempt: The number of the failed attempt, starting at 0.
+            :param response: (optional) The failed response, whose Retry-After header is honored.
+            :return: None
+        """
+        time.sleep(self.delay(attempt, response))
+
+    def delay(self, attempt, response=None):
+        """
+            Computes the delay before a new attempt.
+
+            :param int attempt: The number of the failed attempt, starting at 0.
+            :param response: (optional) The failed response, whose Retry-After header is honored.
+            :return: The delay in seconds.
+            :rtype: float
+        """
+        retry_after = RetryPolicy.retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response):
+        """
+            Reads the Retry-After header of a response, given either in seconds or as an HTTP date.
+
+            :param response: The response, or None.
+            :return: The delay requested by the server in seconds, or None if there is none.
+            :rtype: float
+        """
+        if response is None:
+            return None
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+
+    @staticmethod
+    def mount(session, pool_size):
+        """
+            Sizes the connection pools of a session so that pool_size threads can share it without
+            discarding connections.
+
+            :param session: The requests.Session.
+            :param int pool_size: The number of connections kept alive per host.
+            :return: The session.
+        """
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
@@ -1,10 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 from config_data import ConfigData
+from dedup import Dedup
 from humble_api.events import Events
 from humble_api.humble_hash import HumbleHash
+from humble_api.retry_policy import RetryPolicy
+from metrics import Metrics
+from profiler import Profiler
+from rate_limiter import RateLimiter
+from sync_index import SyncIndex
+from humble_api.model.download_struct import DownloadStruct
+import logger
 
 __author__ = "Brian Schkerke"
 __copyright__ = "Copyright 2016 Brian Schkerke"
@@ -14,6 +28,8 @@ __license__ = "MIT"
 class HumbleDownload(object):
     order_number = ""
     humble_md5 = ""
+    humble_sha1 = ""
+    local_sha1 = ""
     filename = ""
     platform = ""
     product_name = ""
@@ -26,6 +42,36 @@ class HumbleDownload(object):
     status_message = ""
     requires_download = False
     partial_download = False
+    # The measurements of the last transfer, see Metrics.new_transfer.
+    transfer_metrics = None
+
+    # Applied to every download request, and to interrupted transfers.
+    retry_policy = RetryPolicy()
+
+    # The session shared by every download, kept apart from the authenticated
+    # API session. Its pool keeps connections to the CDN alive between files.
+    session = None
+    pool_size = 10
+    _session_lock = threading.Lock()
+
+    # The progress of a segmented download is saved, once the data it covers
+    # is synced to disk, after this many bytes or seconds.
+    segments_save_bytes = 16777216
+    segments_save_interval = 5.0
+
+    # The attributes saved by to_dict.
+    SAVED_ATTRIBUTES = ["order_number", "download_url", "filename",
+                        "humble_file_size", "humble_file_size_human",
+                        "platform", "product_name", "product_name_machine",
+                        "subproduct_name", "humble_md5", "humble_sha1",
+                        "machine_name"]
+
+    # Download urls refreshed on demand, by order number then md5.
+    _refreshed_urls = {}
+    # Order number -> lock held while the urls of the order are refreshed,
+    # so that different orders are refreshed at the same time.
+    _refresh_locks = {}
+    _refresh_lock = threading.Lock()
 
     def __init__(self, cd, cds, co, csp, cv):
         self.order_number = cv
@@ -38,8 +84,30 @@ class HumbleDownload(object):
         self.product_name_machine = co.product.machine_name
         self.subproduct_name = csp.product_name
         self.humble_md5 = cds.md5
+        self.humble_sha1 = cds.sha1
         self.machine_name = cd.machine_name
 
+    def to_dict(self):
+        """
+            :return:  A dictionary serializable as JSON, from which from_dict
+            builds the download again without its order.
+        """
+        return {name: getattr(self, name)
+                for name in HumbleDownload.SAVED_ATTRIBUTES}
+
+    @staticmethod
+    def from_dict(data):
+        """
+            Builds a download saved by to_dict.
+
+            :param data:  The dictionary returned by to_dict.
+            :return:  A HumbleDownload.
+        """
+        hd = HumbleDownload.__new__(HumbleDownload)
+        for name in HumbleDownload.SAVED_ATTRIBUTES:
+            setattr(hd, name, data.get(name))
+        return hd
+
     @property
     def local_file_size(self):
         """
@@ -90,13 +158,25 @@ class HumbleDownload(object):
         return os.path.join(ConfigData.download_location, self.subproduct_name,
                             self.platform, self.filename)
 
+    @property
+    def segments_filename(self):
+        """
+            Returns the file in which the progress of a segmented download is
+            saved.  It only exists while such a download is incomplete.
+
+            :return:  The full path and filename of the segments file.
+        """
+        return self.full_filename + ".segments"
+
     def remove(self):
         """
             Removes the file associated with the Humble Bundle download and any
-            accompanying MD5 file.
+            accompanying MD5 and segments file.
 
             :return:  None
         """
+        if os.path.exists(self.segments_filename):
+            os.remove(self.segments_filename)
         if os.path.exists(self.full_filename):
             os.remove(self.full_filename)
             HumbleHash.remove_md5file(self.full_filename)
@@ -109,82 +189,570 @@ class HumbleDownload(object):
             :return:  True if the existing file matches size and checksum
             verification.
         """
-        if not os.path.exists(self.full_filename):
+        # A single stat is reused for every check, and handed down to the
+        # state database to validate any stored checksum.
+        try:
+            stat = os.stat(self.full_filename)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is None:
             self.status_message = "Target %s doesn't exist." % self.filename
             self.requires_download = True
-        elif not self.humble_file_size == self.local_file_size:
+        elif not self.humble_file_size == stat.st_size:
             self.status_message = (
                     "%s file sizes don't match (expected %d actual %d)." %
                     (self.filename,
                      self.humble_file_size or 0,
-                     self.local_file_size or 0))
+                     stat.st_size))
+            self.partial_download = True
+            self.requires_download = True
+        elif os.path.exists(self.segments_filename):
+            # The file is preallocated, its size is meaningless.
+            self.status_message = (
+                    "Segmented download of %s is incomplete." %
+                    self.filename)
             self.partial_download = True
             self.requires_download = True
         elif not ConfigData.ignore_md5:
-            if not self.md5_matches:
+            # Orders checked on several threads would interleave their
+            # progress on the console.
+            with Profiler.phase("hashing"):
+                local_md5 = HumbleHash.checksum(
+                        self.full_filename, stat,
+                        notify=ConfigData.order_workers <= 1)
+            if not self.humble_md5 == local_md5:
                 self.status_message = (
                         "MD5 of %s doesn't match (expected %s actual %s)." %
                         (self.filename,
                          self.humble_md5,
-                         self.local_md5))
+                         local_md5))
                 self.requires_download = True
         else:
             self.requires_download = False
 
         return not self.requires_download
 
-    def download_file(self):
+    def download_file(self, hapi=None):
         """ Downloads a file from the location specified in the provided
             DownloadStruct.
+
+            :param hapi:  (optional) The HumbleApi used to get a new download
+            url if the current one has expired, in which case the transfer is
+            retried once.
         """
         self.__create_directory()
 
-        if not ConfigData.resume_downloads:
+        # A deduplicated file may be hard linked, its other links must not be
+        # written to.
+        if not ConfigData.resume_downloads or self.__hard_linked():
             self.remove()
+        # The file is about to change, the checksum of any previous content is
+        # no longer relevant.
+        HumbleHash.remove_md5file(self.full_filename)
+        # Set again if the downloaded file does not match its checksums.
+        self.status_message = ""
 
         Events.trigger(Events.EVENT_DOWNLOAD_START, self.filename)
+        self.transfer_metrics = Metrics.new_transfer(self)
+
+        try:
+            if hapi is not None and self.url_expires_within(
+                    ConfigData.url_expiry_margin):
+                HumbleDownload.refresh_download_url(hapi, self)
+                self.transfer_metrics["url_refreshes"] += 1
+
+            attempt = 0
+            interruptions = 0
+            while True:
+                try:
+                    self.__transfer()
+                    break
+                except requests.HTTPError as e:
+                    # Long transfers, segmented ones in particular, can
+                    # outlive several urls.
+                    attempt += 1
+                    if (hapi is None or
+                            attempt > ConfigData.url_refresh_attempts or
+                            not HumbleDownload.url_rejected(e.response)):
+                        raise
+                    HumbleDownload.refresh_download_url(hapi, self)
+                    self.transfer_metrics["url_refreshes"] += 1
+                except requests.exceptions.ChunkedEncodingError:
+                    # The transfer was cut mid-stream, the next attempt
+                    # resumes it.  Requests that failed to get a response
+                    # were already retried by the retry policy.
+                    if interruptions >= HumbleDownload.retry_policy.retries:
+                        raise
+                    HumbleDownload.retry_policy.wait(interruptions)
+                    interruptions += 1
+                    self.transfer_metrics["retries"] += 1
+            self.transfer_metrics["success"] = not self.status_message
+        finally:
+            Metrics.finish_transfer(self.transfer_metrics)
+            Profiler.add("hashing", self.transfer_metrics["hash_seconds"])
 
-        if ConfigData.resume_downloads and self.local_file_size > 0:
+        Events.trigger(Events.EVENT_DOWNLOAD_END, self.filename)
+
+    @property
+    def download_url_expiry(self):
+        """
+            Returns when the current download url expires.
+
+            :return:  A UNIX timestamp, or None if the url carries no expiry.
+        """
+        return DownloadStruct.url_expiry(self.download_url)
+
+    def url_expires_within(self, seconds):
+        """
+            Determines whether the download url expires in the given time.
+
+            :param seconds:  The time span to check, in seconds.
+            :return:  True if the url is known to expire within seconds.
+        """
+        return HumbleDownload.expires_within(self.download_url, seconds)
+
+    @staticmethod
+    def expires_within(url, seconds):
+        """
+            Determines whether a signed url expires in the given time.
+
+            :param url:  The signed url.
+            :param seconds:  The time span to check, in seconds.
+            :return:  True if the url is known to expire within seconds.
+        """
+        expiry = DownloadStruct.url_expiry(url)
+        return expiry is not None and expiry - time.time() < seconds
+
+    @staticmethod
+    def download_session():
+        """
+            Returns the session shared by the downloads, creating it with a
+            pool of HumbleDownload.pool_size connections per host if needed.
+
+            :return:  The requests.Session.
+        """
+        with HumbleDownload._session_lock:
+            if HumbleDownload.session is None:
+                HumbleDownload.session = RetryPolicy.mount(
+                        requests.Session(), HumbleDownload.pool_size)
+            return HumbleDownload.session
+
+    @staticmethod
+    def url_rejected(response):
+        """
+            Determines whether a response means the signed download url is no
+            longer valid.
+
+            :param response:  The response to the download request.
+            :return:  True if the url must be refreshed.
+        """
+        return response is not None and response.status_code in (
+                requests.codes.forbidden, requests.codes.gone)
+
+    def __transfer(self):
+        """ Picks the appropriate way to transfer the file. """
+        if self.__use_segments():
+            self.__segmented_download()
+        elif ConfigData.resume_downloads and self.local_file_size > 0:
             self.__resume_download()
         else:
             self.__start_download()
 
-        Events.trigger(Events.EVENT_DOWNLOAD_END, self.filename)
+    def __get(self, headers=None):
+        """
+            Requests the download url, retrying transient errors.
+
+            :param headers:  (optional) Extra headers, such as Range.
+            :return:  The streamed response.
+        """
+        web_request = HumbleDownload.retry_policy.send(
+                HumbleDownload.download_session().get, self.download_url,
+                headers=headers, stream=True,
+                timeout=ConfigData.download_timeout)
+        if self.transfer_metrics is not None and \
+                self.transfer_metrics["ttfb"] is None:
+            # The time until the response headers were parsed.
+            self.transfer_metrics["ttfb"] = \
+                web_request.elapsed.total_seconds()
+        return web_request
 
     def __resume_download(self):
         """ Resumes a download if the server supports it. """
         resume_header = {'Range': 'bytes=%d-' % self.local_file_size}
-        web_request = requests.get(
-                self.download_url, headers=resume_header, stream=True)
+        web_request = self.__get(headers=resume_header)
+        if (web_request.status_code ==
+                requests.codes.requested_range_not_satisfiable):
+            # The local file is at least as large as the remote one.
+            web_request.close()
+            self.__start_download()
+            return
+        web_request.raise_for_status()
         mode = "ab"
         self.__download_file(web_request, mode, self.local_file_size)
 
     def __start_download(self):
         """ Starts a download afresh. """
-        web_request = requests.get(self.download_url, stream=True)
+        web_request = self.__get()
+        web_request.raise_for_status()
         mode = "wb"
         self.__download_file(web_request, mode, 0)
 
+    def __use_segments(self):
+        """
+            Determines whether the file should be downloaded in segments.  An
+            incomplete segmented download is always continued as such.
+
+            :return:  True if the download should be segmented.
+        """
+        if os.path.exists(self.segments_filename):
+            return True
+        return (ConfigData.segments > 1 and
+                (self.humble_file_size or 0) >= ConfigData.segment_threshold
+                and self.local_file_size == 0)
+
+    def __supports_ranges(self):
+        """ Checks whether the server honors the Range header. """
+        web_request = self.__get(headers={'Range': 'bytes=0-0'})
+        web_request.close()
+        web_request.raise_for_status()
+        return web_request.status_code == requests.codes.partial_content
+
+    def __plan_segments(self):
+        """
+            Splits the file in ConfigData.segments byte ranges.
+
+            :return:  A list of [start, end, downloaded bytes] lists, the end
+            being inclusive as in the Range header.
+        """
+        count = min(ConfigData.segments, self.humble_file_size)
+        segment_size = -(-self.humble_file_size // count)
+        return [[start, min(start + segment_size, self.humble_file_size) - 1,
+                 0]
+                for start in range(0, self.humble_file_size, segment_size)]
+
+    def __load_segments(self):
+        """
+            Loads the progress of an incomplete segmented download.
+
+            :return:  The segments list, or None if there is no usable saved
+            progress.
+        """
+        if not os.path.exists(self.segments_filename):
+            return None
+        try:
+            with open(self.segments_filename, "r") as f:
+                saved = json.load(f)
+        except ValueError:
+            return None
+        if (saved.get("md5") != self.humble_md5 or
+                saved.get("size") != self.humble_file_size or
+                self.local_file_size != self.humble_file_size):
+            return None
+        return saved.get("segments")
+
+    def __save_segments(self, segments):
+        """ Atomically saves the progress of a segmented download. """
+        temporary_filename = self.segments_filename + ".tmp"
+        with open(temporary_filename, "w") as f:
+            json.dump({"md5": self.humble_md5,
+                       "size": self.humble_file_size,
+                       "segments": segments}, f)
+        os.replace(temporary_filename, self.segments_filename)
+
+    def __segmented_download(self):
+        """
+            Downloads the file as several byte ranges written concurrently at
+            their offset in a preallocated file.  The progress of each segment
+            is saved regularly, and when the transfer is cut, so an interrupted
+            download only fetches the missing parts of each segment again.
+        """
+        segments = self.__load_segments()
+        if segments is None:
+            if os.path.exists(self.segments_filename):
+                os.remove(self.segments_filename)
+            if not self.__supports_ranges():
+                self.__start_download()
+                return
+            segments = self.__plan_segments()
+            with open(self.full_filename, "wb") as f:
+                if not HumbleDownload.preallocate(f, self.humble_file_size):
+                    f.truncate(self.humble_file_size)
+            self.__save_segments(segments)
+
+        lock = threading.Lock()
+        save_lock = threading.Lock()
+        transfer_bucket = RateLimiter.transfer_bucket()
+        progress = {"read_bytes": sum(segment[2] for segment in segments),
+                    "percentage": 0}
+        progress["saved_bytes"] = progress["read_bytes"]
+        progress["saved_time"] = time.monotonic()
+        self.transfer_metrics["resumed_bytes"] += progress["read_bytes"]
+
+        def save_progress():
+            with save_lock:
+                with lock:
+                    saved_segments = [list(segment) for segment in segments]
+                # The saved progress must never claim data that a power loss
+                # could still lose.
+                with open(self.full_filename, "r+b", buffering=0) as f:
+                    os.fsync(f.fileno())
+                self.__save_segments(saved_segments)
+
+        def download_segment(segment):
+            start, end, done = segment
+            if start + done > end:
+                return
+            web_request = self.__get(
+                    headers={'Range': 'bytes=%d-%d' % (start + done, end)})
+            if web_request.status_code != requests.codes.partial_content:
+                web_request.close()
+                raise requests.HTTPError(
+                        "Range request for %s failed with status %d." %
+                        (self.filename, web_request.status_code),
+                        response=web_request)
+
+            with open(self.full_filename, "r+b", buffering=0) as f:
+                f.seek(start + done)
+                for chunk in HumbleDownload.read_chunks(
+                        web_request, bytearray(ConfigData.chunk_size)):
+                    HumbleDownload.write_all(f, chunk)
+                    Events.trigger(Events.EVENT_DOWNLOAD_PROGRESS, len(chunk))
+                    # Segments share the rate of their transfer.
+                    RateLimiter.throttle(len(chunk), transfer_bucket)
+                    with lock:
+                        self.transfer_metrics["bytes"] += len(chunk)
+                        segment[2] += len(chunk)
+                        progress["read_bytes"] += len(chunk)
+                        progress["percentage"] = Events.check_percent(
+                                progress["read_bytes"],
+                                self.humble_file_size,
+                                progress["percentage"])
+                        save = (progress["read_bytes"] -
+                                progress["saved_bytes"] >=
+                                HumbleDownload.segments_save_bytes or
+                                time.monotonic() - progress["saved_time"] >=
+                                HumbleDownload.segments_save_interval)
+                        if save:
+                            progress["saved_bytes"] = progress["read_bytes"]
+                            progress["saved_time"] = time.monotonic()
+                    if save:
+                        save_progress()
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+                futures = [executor.submit(download_segment, segment)
+                           for segment in segments]
+                for future in futures:
+                    future.result()
+        except BaseException:
+            # The next attempt resumes from the bytes received so far.
+            save_progress()
+            raise
+
+        with open(self.full_filename, "rb") as f:
+            os.fsync(f.fileno())
+        os.remove(self.segments_filename)
+
+        # Segments arrive out of order and cannot be hashed as they stream.
+        self.__verify_hashes([hashlib.md5()] + (
+                [hashlib.sha1()] if ConfigData.compute_sha1 else []),
+                full_read=True)
+
     def __download_file(self, web_request, mode, read_bytes=0):
+        """
+            Writes a download to disk, computing its checksums on the fly so
+            the file never has to be read again to verify it.
+
+            :param web_request:  The streamed response.
+            :param mode:  "ab" to append to a partial file, "wb" otherwise.
+            :param read_bytes:  The number of bytes already on disk.
+        """
         current_percentage = 0
 
-        with open(self.full_filename, mode) as f:
+        if mode == "ab" and (web_request.status_code !=
+                             requests.codes.partial_content):
+            # The server ignored the Range header and sends the whole file.
+            mode = "wb"
+            read_bytes = 0
+
+        hashes = [hashlib.md5()]
+        if ConfigData.compute_sha1:
+            hashes.append(hashlib.sha1())
+        hash_seconds = 0.0
+        if read_bytes > 0:
+            self.transfer_metrics["resumed_bytes"] += read_bytes
+            hash_start = time.perf_counter()
+            HumbleHash.update_hashes(self.full_filename, hashes, read_bytes)
+            hash_seconds += time.perf_counter() - hash_start
+        resumed_bytes = written_bytes = read_bytes
+        transfer_bucket = RateLimiter.transfer_bucket()
+
+        # Unbuffered: chunks are large and every byte written is on disk for
+        # a later resume, without flushing after each of them.
+        with open(self.full_filename, mode, buffering=0) as f:
             # For a download that's resumed the content-length will be the
             # remaining bytes, not the total.
             # total_length = int(web_request.headers.get("content-length"))
             total_length = self.humble_file_size
-            chunk_size = ConfigData.chunk_size
+            # A resumed download starts from the size of the partial file,
+            # which a crash would leave preallocated to the full size.
+            preallocated = (mode == "wb" and not ConfigData.resume_downloads
+                            and HumbleDownload.preallocate(f, total_length))
+
+            try:
+                for chunk in HumbleDownload.read_chunks(
+                        web_request, bytearray(ConfigData.chunk_size)):
+                    read_bytes = min(total_length, read_bytes + len(chunk))
+                    current_percentage = Events.check_percent(
+                            read_bytes, total_length, current_percentage)
+
+                    HumbleDownload.write_all(f, chunk)
+                    hash_start = time.perf_counter()
+                    for file_hash in hashes:
+                        file_hash.update(chunk)
+                    hash_seconds += time.perf_counter() - hash_start
+                    written_bytes += len(chunk)
+                    Events.trigger(Events.EVENT_DOWNLOAD_PROGRESS, len(chunk))
+                    RateLimiter.throttle(len(chunk), transfer_bucket)
+            finally:
+                if preallocated and written_bytes != total_length:
+                    # Reported by its size rather than hashed by the next run.
+                    f.truncate(written_bytes)
+                self.transfer_metrics["bytes"] += written_bytes - resumed_bytes
+                self.transfer_metrics["hash_seconds"] += hash_seconds
+
+            if written_bytes == self.humble_file_size:
+                os.fsync(f.fileno())
+
+        if written_bytes == self.humble_file_size:
+            self.__verify_hashes(hashes)
+        else:
+            # The response ended early, the partial file is kept for a
+            # later resume.
+            self.status_message = (
+                    "%s is incomplete (expected %d bytes, received %d)." %
+                    (self.filename, self.humble_file_size or 0,
+                     written_bytes))
 
-            for chunk in web_request.iter_content(chunk_size=chunk_size):
-                read_bytes += chunk_size
-                read_bytes = min(total_length, read_bytes)
+    @staticmethod
+    def read_chunks(web_request, buffer):
+        """
+            Reads a streamed response into a reusable buffer rather than
+            allocating a new bytes object for every chunk.
+
+            :param web_request:  The streamed response.
+            :param buffer:  The bytearray receiving the data, its size being
+            the chunk size.
+            :return:  A generator of the chunks read, each one only valid until
+            the next one is read.
+            :raises ChunkedEncodingError:  if the transfer is cut, whatever
+            the cause, so that download_file resumes it.
+        """
+        if web_request.headers.get("Content-Encoding", "identity") != \
+                "identity":
+            # Compressed content has to be decoded by requests.
+            try:
+                for chunk in web_request.iter_content(
+                        chunk_size=len(buffer)):
+                    if chunk:
+                        yield chunk
+            except requests.ConnectionError as e:
+                raise requests.exceptions.ChunkedEncodingError(e)
+            return
+
+        view = memoryview(buffer)
+        while True:
+            try:
+                count = web_request.raw.readinto(buffer)
+            except (ProtocolError, ReadTimeoutError) as e:
+                raise requests.exceptions.ChunkedEncodingError(e)
+            if not count:
+                return
+            yield view[:count]
 
-                current_percentage = Events.check_percent(
-                        read_bytes, total_length, current_percentage)
+    @staticmethod
+    def write_all(f, chunk):
+        """
+            Writes a whole chunk to an unbuffered file, which may accept only
+            part of it at once.
+
+            :param f:  The file opened with buffering=0.
+            :param chunk:  The bytes or memoryview to write.
+            :return:  None
+        """
+        chunk = memoryview(chunk)
+        while chunk:
+            chunk = chunk[f.write(chunk):]
+
+    @staticmethod
+    def preallocate(f, size):
+        """
+            Reserves the disk space of a file before writing it, which avoids
+            fragmenting it on filesystems such as XFS and fails early when the
+            disk is full.  Only used for files whose progress is not inferred
+            from their size: segmented downloads, and any download when
+            resume_downloads is off.
+
+            :param f:  The file, opened for writing.
+            :param size:  The final size of the file.
+            :return:  True if the space was reserved, extending the file to
+            size.
+        """
+        if size > 0 and ConfigData.preallocate and hasattr(
+                os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return True
+            except OSError:
+                # Not supported by the filesystem.
+                pass
+        return False
+
+    def __verify_hashes(self, hashes, full_read=False):
+        """
+            Records the checksums of a completed download and compares them to
+            the ones reported by Humble Bundle.
+
+            :param hashes:  The md5 hash object, optionally followed by the
+            sha1 one.
+            :param full_read:  Whether the hashes still have to be fed the
+            whole file.
+            :return:  True if the checksums match.
+        """
+        if full_read:
+            hash_start = time.perf_counter()
+            HumbleHash.update_hashes(self.full_filename, hashes)
+            self.transfer_metrics["hash_seconds"] += (time.perf_counter() -
+                                                      hash_start)
+
+        local_md5 = hashes[0].hexdigest()
+        if len(hashes) > 1:
+            self.local_sha1 = hashes[1].hexdigest()
+        HumbleHash.store_checksum(self.full_filename, local_md5,
+                                  self.local_sha1 or None, self.humble_md5,
+                                  self.humble_sha1)
+        matches = local_md5 == self.humble_md5
+        if not matches:
+            self.status_message = (
+                    "MD5 of %s doesn't match (expected %s actual %s)." %
+                    (self.filename, self.humble_md5, local_md5))
+
+        if len(hashes) > 1:
+            if self.humble_sha1 and self.local_sha1 != self.humble_sha1:
+                self.status_message = (
+                        "SHA1 of %s doesn't match (expected %s actual %s)." %
+                        (self.filename, self.humble_sha1, self.local_sha1))
+                matches = False
 
-                if chunk:
-                    f.write(chunk)
-                    f.flush()
+        return matches
+
+    def __hard_linked(self):
+        """ :return:  True if the file has other hard links. """
+        try:
+            return os.stat(self.full_filename).st_nlink > 1
+        except FileNotFoundError:
+            return False
 
     def __create_directory(self):
         """ Creates the directory for storing the current file if it doesn't
@@ -244,43 +812,90 @@ class HumbleDownload(object):
         return object_dump.encode("utf-8")
 
     @staticmethod
-    def update_download_list_url(hapi, hd_list):
-        """Updates the download urls from a list"""
-        keys = set(hd.order_number for hd in hd_list)
-        for key in keys:  # Group by key to limit the number of requests
-            updated_hd_list = HumbleDownload.downloads_from_key(hapi, key)
-            # Iterate over HumbleDownload objects that have the same key
-            for hd in [hd_k for hd_k in hd_list if hd_k.order_number == key]:
-                # Update the urls of products based on their md5
-                hd.download_url = [nhd.download_url for nhd in updated_hd_list
-                                   if nhd.humble_md5 == hd.humble_md5][0]
+    def refresh_download_url(hapi, hd):
+        """Updates the download url of a single download on demand. The new
+        urls of the whole order are kept, so the other downloads of the order
+        needing a refresh don't retrieve it again"""
+        with HumbleDownload._refresh_lock:
+            order_lock = HumbleDownload._refresh_locks.setdefault(
+                    hd.order_number, threading.Lock())
+        with order_lock, Profiler.phase("url refresh"):
+            with HumbleDownload._refresh_lock:
+                urls = HumbleDownload._refreshed_urls.get(
+                        hd.order_number) or {}
+            url = urls.get(hd.humble_md5)
+            # Retrieve the order unless a newer, still valid, url is known
+            if url in (None, hd.download_url) or HumbleDownload.expires_within(
+                    url, ConfigData.url_expiry_margin):
+                urls = HumbleDownload.download_urls_from_key(
+                        hapi, hd.order_number)
+                with HumbleDownload._refresh_lock:
+                    HumbleDownload._refreshed_urls[hd.order_number] = urls
+        hd.download_url = urls.get(hd.humble_md5, hd.download_url)
 
     @staticmethod
-    def downloads_from_key(hapi, key):
-        """Returns a list of HumbleDownload objetcts from a key string"""
+    def download_urls_from_key(hapi, key):
+        """Returns a dictionary of fresh download urls indexed by md5 from a
+        key string"""
+        return {hd.humble_md5: hd.download_url for hd in
+                HumbleDownload.downloads_from_key(hapi, key, refresh=True)}
+
+    @staticmethod
+    def downloads_from_key(hapi, key, refresh=False):
+        """Returns a list of HumbleDownload objetcts from a key string.
+        refresh bypasses the order cache to get usable download urls."""
         humble_downloads = []
-        current_order = hapi.get_order(key)
-        for current_subproduct in current_order.subproducts or []:
-            for current_download in current_subproduct.downloads or []:
-                if not ConfigData.download_platforms.get(
-                        current_download.platform, False):
-                    continue
-                for current_dl_struct in current_download.download_structs:
-                    hd = HumbleDownload(current_download,
-                                        current_dl_struct,
-                                        current_order,
-                                        current_subproduct,
-                                        key)
-                    if hd.is_valid():
-                        humble_downloads.append(hd)
+        with Profiler.phase("order fetch"):
+            current_order = hapi.get_order(key, refresh=refresh)
+            for current_subproduct in current_order.subproducts or []:
+                for current_download in current_subproduct.downloads or []:
+                    if not ConfigData.download_platforms.get(
+                            current_download.platform, False):
+                        continue
+                    for current_dl_struct in \
+                            current_download.download_structs:
+                        hd = HumbleDownload(current_download,
+                                            current_dl_struct,
+                                            current_order,
+                                            current_subproduct,
+                                            key)
+                        if hd.is_valid():
+                            humble_downloads.append(hd)
         return humble_downloads
 
     @staticmethod
     def needed_downloads_from_key(hapi, key):
         """Returns a list of HumbleDownload objetcts corresponding to items
         that have not been already downloaded, from a key string"""
-        humble_downloads = []
-        for download in HumbleDownload.downloads_from_key(hapi, key):
-            if not download.check_status():  # If not already downloaded
-                humble_downloads.append(download)
-        return humble_downloads
+        return HumbleDownload.needed_downloads(
+                HumbleDownload.downloads_from_key(hapi, key), key)
+
+    @staticmethod
+    def needed_downloads(humble_downloads, key=None):
+        """Returns the HumbleDownload objects of a list that have not been
+        already downloaded.  When the key of their order is given and the
+        SyncIndex is enabled, the files of an order unchanged since it was
+        last synchronized are not checked.  Files sharing their path with a
+        different file of the library are given a distinct one by Dedup."""
+        for download in humble_downloads:
+            Dedup.claim(download)
+
+        fingerprint = None
+        if key is not None and SyncIndex.enabled():
+            fingerprint = SyncIndex.fingerprint(humble_downloads)
+            if SyncIndex.is_synced(key, fingerprint):
+                logger.display_message(
+                        False, "Processing",
+                        "Order %s is unchanged since its last sync." % key)
+                return []
+
+        needed_downloads = []
+        for download in humble_downloads:
+            with Profiler.phase("status check"):
+                needed = not download.check_status()
+            if needed:  # If not already downloaded
+                needed_downloads.append(download)
+
+        if fingerprint is not None:
+            SyncIndex.expect(key, fingerprint, needed_downloads)
+        return needed_downloads
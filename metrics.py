@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import math
+import threading
+import time
+from urllib.parse import urlparse
+from humble_api.events import Events
+
+__license__ = "MIT"
+
+
+class Metrics(object):
+    """
+        Collects measurements of a run: for each transfer its time to first
+        byte, rate, retries, resumed bytes and hashing time, and for the API
+        the latency of each endpoint.  They tell whether a slow run was slowed down
+        by the API, the CDN or the disks, and can be written as JSON or in the
+        Prometheus text format.
+    """
+    FORMATS = ["json", "prometheus"]
+
+    transfers = []
+    api_requests = {}
+    http_retries = {}
+    run_start = time.time()
+
+    lock = threading.Lock()
+
+    @staticmethod
+    def initialize():
+        """ Subscribes to the events reporting API requests and retries. """
+        Events.on(Events.EVENT_API_REQUEST, Metrics.record_api_request)
+        Events.on(Events.EVENT_HTTP_RETRY, Metrics.record_retry)
+
+    @staticmethod
+    def new_transfer(hd):
+        """
+            Starts the measurements of a transfer.  The downloader updates the
+            dictionary returned as the transfer progresses.
+
+            :param hd:  The HumbleDownload being transferred.
+            :return:  A dictionary of the measurements.
+        """
+        return {"filename": hd.filename,
+                "host": urlparse(hd.download_url or "").hostname,
+                "size": hd.humble_file_size, "start": time.monotonic(),
+                "seconds": None, "ttfb": None, "bytes": 0,
+                "resumed_bytes": 0, "retries": 0, "url_refreshes": 0,
+                "hash_seconds": 0.0, "success": False}
+
+    @staticmethod
+    def finish_transfer(transfer):
+        """
+            Records a finished transfer, successful or not.
+
+            :param transfer:  The dictionary returned by new_transfer.
+            :return:  None
+        """
+        transfer["seconds"] = time.monotonic() - transfer.pop("start")
+        transfer["rate"] = (transfer["bytes"] / transfer["seconds"]
+                            if transfer["seconds"] > 0 else None)
+        with Metrics.lock:
+            Metrics.transfers.append(transfer)
+
+    @staticmethod
+    def record_api_request(request):
+        """
+            Records the latency of an API request.
+
+            :param request:  The dictionary of Events.EVENT_API_REQUEST.
+            :return:  None
+        """
+        with Metrics.lock:
+            Metrics.api_requests.setdefault(
+                    request["endpoint"] or "other", []).append(
+                    request["seconds"])
+
+    @staticmethod
+    def record_retry(retry):
+        """
+            Counts a retried HTTP request, per host.
+
+            :param retry:  The dictionary of Events.EVENT_HTTP_RETRY.
+            :return:  None
+        """
+        host = urlparse(retry["url"] or "").hostname or "unknown"
+        with Metrics.lock:
+            Metrics.http_retries[host] = Metrics.http_retries.get(host, 0) + 1
+
+    @staticmethod
+    def percentile(values, fraction):
+        """
+            Computes a percentile with the nearest rank method.
+
+            :param values:  The values, in any order.
+            :param fraction:  The percentile as a fraction, 0.95 for p95.
+            :return:  The percentile, or None if there are no values.
+        """
+        values = sorted(value for value in values if value is not None)
+        if len(values) == 0:
+            return None
+        return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+    @staticmethod
+    def distribution(values):
+        """
+            :param values:  The values of a measurement.
+            :return:  A dictionary of their count, sum, p50, p95 and maximum.
+        """
+        values = [value for value in values if value is not None]
+        return {"count": len(values), "sum": sum(values),
+                "p50": Metrics.percentile(values, 0.5),
+                "p95": Metrics.percentile(values, 0.95),
+                "max": max(values) if values else None}
+
+    @staticmethod
+    def summary():
+        """
+            Aggregates the measurements of the run.
+
+            :return:  A dictionary serializable as JSON.
+        """
+        with Metrics.lock:
+            transfers = list(Metrics.transfers)
+            api_requests = {endpoint: list(latencies) for endpoint, latencies
+                            in Metrics.api_requests.items()}
+            http_retries = dict(Metrics.http_retries)
+
+        return {
+            "duration": time.time() - Metrics.run_start,
+            "transfers": {
+                "count": len(transfers),
+                "failed": len([t for t in transfers if not t["success"]]),
+                "bytes": sum(t["bytes"] for t in transfers),
+                "resumed_bytes": sum(t["resumed_bytes"] for t in transfers),
+                "retries": sum(t["retries"] for t in transfers),
+                "url_refreshes": sum(t["url_refreshes"] for t in transfers),
+                "rate": Metrics.distribution(t["rate"] for t in transfers),
+                "ttfb": Metrics.distribution(t["ttfb"] for t in transfers),
+                "hash_seconds": Metrics.distribution(
+                        t["hash_seconds"] for t in transfers)},
+            "api": {endpoint: Metrics.distribution(latencies)
+                    for endpoint, latencies in api_requests.items()},
+            "http_retries": http_retries,
+            "files": transfers}
+
+    @staticmethod
+    def prometheus(summary):
+        """
+            Formats a summary in the Prometheus text exposition format.
+
+            :param summary:  The dictionary returned by summary().
+            :return:  The text of the metrics.
+        """
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append("# HELP hb_downloader_%s %s" % (name, help_text))
+            lines.append("# TYPE hb_downloader_%s %s" % (name, metric_type))
+            for suffix, labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join('%s="%s"' % (key, labels[key])
+                                      for key in sorted(labels))
+                lines.append("hb_downloader_%s%s%s %s" % (
+                        name, suffix, "{%s}" % label_text if labels else "",
+                        repr(float(value))))
+
+        def quantiles(distribution, labels=None):
+            labels = labels or {}
+            return ([("", dict(labels, quantile=quantile),
+                      distribution[key])
+                     for quantile, key in [("0.5", "p50"), ("0.95", "p95")]] +
+                    [("_sum", labels, distribution["sum"]),
+                     ("_count", labels, distribution["count"])])
+
+        transfers = summary["transfers"]
+        metric("transfers_total", "counter", "Number of transfers.",
+               [("", {}, transfers["count"])])
+        metric("transfers_failed_total", "counter",
+               "Number of failed transfers.", [("", {}, transfers["failed"])])
+        metric("transfer_bytes_total", "counter",
+               "Bytes received by transfers.", [("", {}, transfers["bytes"])])
+        metric("resumed_bytes_total", "counter",
+               "Bytes already on disk when transfers resumed.",
+               [("", {}, transfers["resumed_bytes"])])
+        metric("transfer_retries_total", "counter",
+               "Interrupted transfers resumed.",
+               [("", {}, transfers["retries"])])
+        metric("url_refreshes_total", "counter",
+               "Download urls refreshed.",
+               [("", {}, transfers["url_refreshes"])])
+        metric("transfer_rate_bytes_per_second", "summary",
+               "Average rate of each transfer.", quantiles(transfers["rate"]))
+        metric("transfer_ttfb_seconds", "summary",
+               "Time to the first byte of each transfer.",
+               quantiles(transfers["ttfb"]))
+        metric("hash_seconds", "summary",
+               "Time spent hashing each transfer.",
+               quantiles(transfers["hash_seconds"]))
+        metric("api_request_seconds", "summary",
+               "Latency of the API requests.",
+               [sample for endpoint, distribution in
+                sorted(summary["api"].items())
+                for sample in quantiles(distribution, {"endpoint": endpoint})])
+        metric("http_retries_total", "counter",
+               "HTTP requests retried after a transient error.",
+               [("", {"host": host}, count) for host, count in
+                sorted(summary["http_retries"].items())])
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write(filename, metrics_format="json"):
+        """
+            Writes the metrics of the run to a file.
+
+            :param filename:  The file to write.
+            :param metrics_format:  "json" or "prometheus".
+            :return:  None
+        """
+        summary = Metrics.summary()
+        with open(filename, "w") as f:
+            if metrics_format == "prometheus":
+                f.write(Metrics.prometheus(summary))
+            else:
+                json.dump(summary, f, indent=2)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import atexit
+import contextlib
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from humble_api.events import Events
+import logger
+
+__license__ = "MIT"
+
+
+class Profiler(object):
+    """
+        Times the phases of a run (login check, gamekey fetch, order fetch and
+        parse, status checks, url refresh, transfer and hashing), and
+        optionally profiles the CPU with cProfile and the memory with
+        tracemalloc.  The report is written when the program exits.
+
+        Phases run in several threads at once and may nest (hashing happens
+        during status checks and transfers), so the time of a phase is the sum
+        of the time spent in it by every thread, shown next to the wall clock
+        time between its first start and its last end.
+    """
+    enabled = False
+    cpu = False
+    memory = False
+    report_filename = None
+
+    # Phase name -> [total seconds, count, first start, last end].
+    phases = {}
+    lock = threading.Lock()
+
+    _profiles = []
+    _start = None
+
+    @staticmethod
+    def start(report_filename, cpu=False, memory=False):
+        """
+            Starts profiling the run.
+
+            :param report_filename:  The file receiving the report at exit.
+            :param cpu:  Whether to profile the CPU with cProfile, in every
+            thread.
+            :param memory:  Whether to trace memory allocations.
+            :return:  None
+        """
+        Profiler.enabled = True
+        Profiler.cpu = cpu
+        Profiler.memory = memory
+        Profiler.report_filename = report_filename
+        Profiler._start = time.monotonic()
+        Events.on(Events.EVENT_API_REQUEST, Profiler.record_api_request)
+
+        if memory:
+            tracemalloc.start()
+        if cpu:
+            main_profile = cProfile.Profile()
+            Profiler._profiles.append(main_profile)
+            threading.setprofile(Profiler.__profile_thread)
+            main_profile.enable()
+        atexit.register(Profiler.write_report)
+
+    @staticmethod
+    def __profile_thread(frame, event, arg):
+        """ Replaces itself with a cProfile.Profile in a new thread. """
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # From Python 3.12 the profile of the main thread already covers
+            # every thread.
+            return
+        with Profiler.lock:
+            Profiler._profiles.append(profile)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def phase(name):
+        """
+            Times a phase, used as a context manager:
+
+                with Profiler.phase("transfer"):
+                    hd.download_file(hapi)
+
+            :param name:  The name of the phase.
+        """
+        if not Profiler.enabled:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            Profiler.add(name, time.monotonic() - start, start)
+
+    @staticmethod
+    def add(name, seconds, start=None):
+        """
+            Accounts for time spent in a phase.
+
+            :param name:  The name of the phase.
+            :param seconds:  The time spent.
+            :param start:  (optional) When the phase started, as a
+            time.monotonic() value, by default seconds ago.
+            :return:  None
+        """
+        if not Profiler.enabled:
+            return
+        end = time.monotonic()
+        if start is None:
+            start = end - seconds
+        with Profiler.lock:
+            phase = Profiler.phases.setdefault(name, [0.0, 0, start, end])
+            phase[0] += seconds
+            phase[1] += 1
+            phase[2] = min(phase[2], start)
+            phase[3] = max(phase[3], end)
+
+    @staticmethod
+    def record_api_request(request):
+        """ Times API requests, separately from the parsing of orders. """
+        Profiler.add("api request", request["seconds"])
+
+    @staticmethod
+    def report():
+        """
+            Builds the report of the run.
+
+            :return:  The text of the report.
+        """
+        lines = ["Run time: %.1f s" % (time.monotonic() - Profiler._start), "",
+                 "%-20s %12s %12s %8s" % ("Phase", "Total (s)", "Wall (s)",
+                                           "Count")]
+        with Profiler.lock:
+            phases = sorted(Profiler.phases.items(),
+                            key=lambda item: -item[1][0])
+        for name, (seconds, count, start, end) in phases:
+            lines.append("%-20s %12.2f %12.2f %8d" % (name, seconds,
+                                                      end - start, count))
+
+        # The snapshot is taken before cProfile's statistics are built.
+        if Profiler.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            lines += ["", "Memory: %.1f MB allocated, %.1f MB at peak" %
+                      (current / 1048576, peak / 1048576),
+                      "Largest allocations:"]
+            lines += [str(statistic) for statistic in
+                      snapshot.statistics("lineno")[:20]]
+
+        if Profiler.cpu:
+            threading.setprofile(None)
+            with Profiler.lock:
+                profiles = list(Profiler._profiles)
+            for profile in profiles:
+                profile.disable()
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(Profiler.report_filename + ".pstats")
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats("cumulative").print_stats(30)
+            lines += ["", "CPU profile of every thread (full statistics in "
+                      "%s.pstats):" % Profiler.report_filename,
+                      stream.getvalue()]
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write_report():
+        """ Writes the report to report_filename. """
+        if not Profiler.enabled:
+            return
+        with open(Profiler.report_filename, "w") as f:
+            f.write(Profiler.report())
+        Profiler.enabled = False
+        logger.display_message(False, "Profile", "Profile written to %s." %
+                               Profiler.report_filename)
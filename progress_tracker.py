@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import threading
+import time
 import logger
 
 __author__ = "Brian Schkerke"
@@ -18,41 +20,111 @@ class ProgressTracker(object):
     current_subproduct = ""
     current_download = ""
 
+    # Transfer statistics, shared by every download worker.
+    active_downloads = 0
+    transferred_bytes = 0
+    transfer_start = None
+
+    lock = threading.RLock()
+
     @staticmethod
     def assign_download(hd):
-        ProgressTracker.current_product = hd.product_name
-        ProgressTracker.current_subproduct = hd.subproduct_name
-        ProgressTracker.current_download = hd.machine_name
+        with ProgressTracker.lock:
+            ProgressTracker.current_product = hd.product_name
+            ProgressTracker.current_subproduct = hd.subproduct_name
+            ProgressTracker.current_download = hd.machine_name
+
+    @staticmethod
+    def start_download(hd):
+        """
+            Records the start of a transfer.
+
+            :param hd:  The HumbleDownload being transferred.
+            :return:  None
+        """
+        with ProgressTracker.lock:
+            ProgressTracker.assign_download(hd)
+            ProgressTracker.active_downloads += 1
+            if ProgressTracker.transfer_start is None:
+                ProgressTracker.transfer_start = time.monotonic()
+
+    @staticmethod
+    def finish_download(hd):
+        """
+            Records the end of a transfer.
+
+            :param hd:  The HumbleDownload that was transferred.
+            :return:  None
+        """
+        with ProgressTracker.lock:
+            ProgressTracker.active_downloads -= 1
+            if hd.humble_file_size is not None:
+                ProgressTracker.download_size_current += hd.humble_file_size
+            ProgressTracker.item_count_current += 1
+
+    @staticmethod
+    def add_transferred(byte_count):
+        """
+            Accounts for bytes received by any of the active transfers.
+
+            :param byte_count:  The number of bytes received.
+            :return:  None
+        """
+        with ProgressTracker.lock:
+            ProgressTracker.transferred_bytes += byte_count
+
+    @staticmethod
+    def throughput():
+        """
+            Returns the aggregate transfer rate since the first transfer
+            started, in bytes per second.
+        """
+        with ProgressTracker.lock:
+            if ProgressTracker.transfer_start is None:
+                return 0
+            elapsed = time.monotonic() - ProgressTracker.transfer_start
+            if elapsed <= 0:
+                return 0
+            return ProgressTracker.transferred_bytes / elapsed
 
     @staticmethod
     def display_summary():
-        progress_message = "%d/%d DL: %s/%s (%s)" % (
-                ProgressTracker.item_count_current,
-                ProgressTracker.item_count_total,
-                ProgressTracker.format_filesize(
-                        ProgressTracker.download_size_current),
-                ProgressTracker.format_filesize(
-                        ProgressTracker.download_size_total),
-                ProgressTracker.format_percentage(
-                        ProgressTracker.download_size_current,
-                        ProgressTracker.download_size_total))
-
-        logger.display_message(False, "Progress", progress_message)
-        logger.display_message(
-                True, "Progress", "%s: %s: %s" %
-                (ProgressTracker.current_product,
-                 ProgressTracker.current_subproduct,
-                 ProgressTracker.current_download))
+        with ProgressTracker.lock:
+            progress_message = "%d/%d DL: %s/%s (%s)" % (
+                    ProgressTracker.item_count_current,
+                    ProgressTracker.item_count_total,
+                    ProgressTracker.format_filesize(
+                            ProgressTracker.download_size_current),
+                    ProgressTracker.format_filesize(
+                            ProgressTracker.download_size_total),
+                    ProgressTracker.format_percentage(
+                            ProgressTracker.download_size_current,
+                            ProgressTracker.download_size_total))
+            if ProgressTracker.transfer_start is not None:
+                progress_message += " %d active, %s/s" % (
+                        ProgressTracker.active_downloads,
+                        ProgressTracker.format_filesize(
+                                ProgressTracker.throughput()))
+            current = "%s: %s: %s" % (ProgressTracker.current_product,
+                                      ProgressTracker.current_subproduct,
+                                      ProgressTracker.current_download)
+
+            logger.display_message(False, "Progress", progress_message)
+            logger.display_message(True, "Progress", current)
 
     @staticmethod
     def reset():
-        ProgressTracker.item_count_total = 0
-        ProgressTracker.item_count_current = 0
-        ProgressTracker.download_size_current = 0
-        ProgressTracker.download_size_total = 0
-        ProgressTracker.current_product = ""
-        ProgressTracker.current_subproduct = ""
-        ProgressTracker.current_download = ""
+        with ProgressTracker.lock:
+            ProgressTracker.item_count_total = 0
+            ProgressTracker.item_count_current = 0
+            ProgressTracker.download_size_current = 0
+            ProgressTracker.download_size_total = 0
+            ProgressTracker.current_product = ""
+            ProgressTracker.current_subproduct = ""
+            ProgressTracker.current_download = ""
+            ProgressTracker.active_downloads = 0
+            ProgressTracker.transferred_bytes = 0
+            ProgressTracker.transfer_start = None
 
     @staticmethod
     def format_filesize(filesize):
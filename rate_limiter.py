@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import threading
+import time
+
+__license__ = "MIT"
+
+
+class TokenBucket(object):
+    """
+        A thread safe token bucket.  Tokens are bytes: they accumulate at rate
+        bytes per second, up to one second worth of them, and every transfer
+        takes the tokens for the bytes it received.  A transfer taking more
+        tokens than available sleeps until the bucket is back to zero, so large
+        chunks are simply spread over time.
+    """
+
+    def __init__(self, rate=0):
+        """
+            Parameterized constructor for the TokenBucket.
+
+            :param rate:  The rate in bytes per second, 0 for no limit.
+        """
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """
+            Changes the rate of the bucket, keeping the tokens accumulated.
+
+            :param rate:  The rate in bytes per second, 0 for no limit.
+            :return:  None
+        """
+        with self._lock:
+            if rate != self.rate:
+                self._refill()
+                self.rate = rate
+                self._tokens = min(self._tokens, rate)
+
+    def consume(self, byte_count):
+        """
+            Takes the tokens for byte_count bytes, sleeping if the rate is
+            exceeded.
+
+            :param byte_count:  The number of bytes transferred.
+            :return:  None
+        """
+        with self._lock:
+            if self.rate <= 0:
+                return
+            self._refill()
+            self._tokens -= byte_count
+            delay = -self._tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.rate,
+                               self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class RateLimiter(object):
+    """
+        Limits the bandwidth used by downloads, both globally, across every
+        concurrent transfer, and for each transfer.  The global rate can follow
+        a schedule of time of day windows, for instance to only download at
+        full speed at night.
+    """
+    max_rate = 0
+    transfer_rate = 0
+    # A list of {"start": "HH:MM", "end": "HH:MM", "rate": rate} dictionaries.
+    # The first window containing the current time gives the global rate,
+    # max_rate applies outside of every window.
+    schedule = []
+
+    _bucket = TokenBucket()
+
+    @staticmethod
+    def parse_rate(rate):
+        """
+            Parses a rate given as a number of bytes per second, optionally
+            followed by a K, M or G multiplier, such as "5M".
+
+            :param rate:  The rate, as a string or a number.
+            :return:  The rate in bytes per second.
+            :raise ValueError:  If the rate cannot be parsed.
+        """
+        if isinstance(rate, (int, float)):
+            return int(rate)
+        match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?(?:/s)?\s*$",
+                         str(rate), re.IGNORECASE)
+        if match is None:
+            raise ValueError("Invalid rate %s." % rate)
+        multiplier = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+        return int(float(match.group(1)) *
+                   multiplier[match.group(2).upper()])
+
+    @staticmethod
+    def parse_time(value):
+        """
+            Parses a time of day given as "HH:MM".
+
+            :param value:  The time of day.
+            :return:  The number of minutes since midnight.
+        """
+        hours, minutes = str(value).split(":")
+        return int(hours) * 60 + int(minutes)
+
+    @staticmethod
+    def current_rate(now=None):
+        """
+            Returns the global rate applying at a given time.
+
+            :param now:  (optional) A time.struct_time, the local time by
+            default.
+            :return:  The rate in bytes per second, 0 for no limit.
+        """
+        if now is None:
+            now = time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for window in RateLimiter.schedule:
+            start = RateLimiter.parse_time(window["start"])
+            end = RateLimiter.parse_time(window["end"])
+            # Windows may span midnight, such as 22:00 to 06:00.
+            if (start <= minute < end if start <= end else
+                    minute >= start or minute < end):
+                return RateLimiter.parse_rate(window["rate"])
+        return RateLimiter.parse_rate(RateLimiter.max_rate)
+
+    @staticmethod
+    def transfer_bucket():
+        """
+            Creates the bucket limiting a single transfer.
+
+            :return:  A TokenBucket.
+        """
+        return TokenBucket(RateLimiter.parse_rate(RateLimiter.transfer_rate))
+
+    @staticmethod
+    def throttle(byte_count, transfer_bucket=None):
+        """
+            Accounts for bytes received by a transfer, sleeping as long as
+            needed to respect the global and per transfer rates.
+
+            :param byte_count:  The number of bytes received.
+            :param transfer_bucket:  (optional) The bucket of the transfer.
+            :return:  None
+        """
+        RateLimiter._bucket.set_rate(RateLimiter.current_rate())
+        RateLimiter._bucket.consume(byte_count)
+        if transfer_bucket is not None:
+            transfer_bucket.consume(byte_count)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+import time
+
+__license__ = "MIT"
+
+
+class RunJournal(object):
+    """
+        An append only journal of a download run, kept in the download
+        location while the run goes on.  It holds the files planned once the
+        orders are scanned, then a line for every transfer started, done or
+        failed.  Each line is synced to disk before the work it describes
+        goes on, so the journal survives a crash or a power loss.
+
+        A run started while the journal of an interrupted one is complete
+        skips the scan and transfers the files left, resuming partial ones.
+        The journal is removed once a run finishes.
+    """
+    EVENT_PLAN = "plan"
+    EVENT_SCANNED = "scanned"
+    EVENT_START = "start"
+    EVENT_DONE = "done"
+    EVENT_FAILED = "failed"
+
+    filename = None
+
+    _file = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        """ :return:  True if a journal is configured. """
+        return RunJournal.filename is not None
+
+    @staticmethod
+    def load():
+        """
+            Reads the journal of an interrupted run.
+
+            :return:  None if there is no complete journal to resume, else a
+            dictionary with the "remaining" planned entries not done, in the
+            planned order, and the "in_flight" and "failed" sets of the
+            filenames of the ones started or failed.
+        """
+        if not RunJournal.enabled() or not os.path.exists(
+                RunJournal.filename):
+            return None
+
+        planned = {}
+        done = set()
+        started = set()
+        failed = set()
+        scanned = False
+        with open(RunJournal.filename, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line of a journal cut by a crash.
+                    continue
+                event = entry.get("event")
+                if event == RunJournal.EVENT_PLAN:
+                    planned[entry["file"]] = entry["download"]
+                elif event == RunJournal.EVENT_SCANNED:
+                    scanned = True
+                elif event == RunJournal.EVENT_START:
+                    started.add(entry["file"])
+                elif event == RunJournal.EVENT_DONE:
+                    done.add(entry["file"])
+                elif event == RunJournal.EVENT_FAILED:
+                    failed.add(entry["file"])
+
+        # An interrupted scan is no plan: the run starts over.
+        if not scanned:
+            return None
+        return {"remaining": [download for name, download in planned.items()
+                              if name not in done],
+                "in_flight": started - done - failed,
+                "failed": failed - done}
+
+    @staticmethod
+    def begin():
+        """
+            Starts a new journal, replacing any previous one.
+
+            :return:  None
+        """
+        if not RunJournal.enabled():
+            return
+        with RunJournal._lock:
+            RunJournal.__close()
+            RunJournal._file = open(RunJournal.filename, "w",
+                                    encoding="utf-8")
+
+    @staticmethod
+    def reopen():
+        """
+            Reopens the journal of an interrupted run to append to it.
+
+            :return:  None
+        """
+        if not RunJournal.enabled():
+            return
+        with RunJournal._lock:
+            RunJournal.__close()
+            RunJournal._file = open(RunJournal.filename, "a",
+                                    encoding="utf-8")
+
+    @staticmethod
+    def plan(humble_downloads):
+        """
+            Records files to download.
+
+            :param humble_downloads:  The list of HumbleDownload.
+            :return:  None
+        """
+        if RunJournal._file is None:
+            return
+        RunJournal.__write([{"event": RunJournal.EVENT_PLAN,
+                             "file": hd.full_filename,
+                             "download": hd.to_dict()}
+                            for hd in humble_downloads])
+
+    @staticmethod
+    def scanned():
+        """ Records that every file to download is planned. """
+        RunJournal.__write([{"event": RunJournal.EVENT_SCANNED}])
+
+    @staticmethod
+    def started(hd):
+        """
+            Records the start of a transfer.
+
+            :param hd:  The HumbleDownload.
+            :return:  None
+        """
+        RunJournal.__write([{"event": RunJournal.EVENT_START,
+                             "file": hd.full_filename}])
+
+    @staticmethod
+    def finished(hd, success):
+        """
+            Records the end of a transfer.
+
+            :param hd:  The HumbleDownload.
+            :param success:  Whether the file was downloaded and verified.
+            :return:  None
+        """
+        RunJournal.__write([{"event": (RunJournal.EVENT_DONE if success
+                                       else RunJournal.EVENT_FAILED),
+                             "file": hd.full_filename}])
+
+    @staticmethod
+    def end():
+        """ Removes the journal of a finished run. """
+        if not RunJournal.enabled():
+            return
+        with RunJournal._lock:
+            RunJournal.__close()
+            if os.path.exists(RunJournal.filename):
+                os.remove(RunJournal.filename)
+
+    @staticmethod
+    def __write(entries):
+        """ Appends entries to the journal and syncs it to disk. """
+        with RunJournal._lock:
+            if RunJournal._file is None or len(entries) == 0:
+                return
+            now = time.time()
+            for entry in entries:
+                entry["time"] = now
+                RunJournal._file.write(json.dumps(entry) + "\n")
+            RunJournal._file.flush()
+            os.fsync(RunJournal._file.fileno())
+
+    @staticmethod
+    def __close():
+        if RunJournal._file is not None:
+            RunJournal._file.close()
+            RunJournal._file = None
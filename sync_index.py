@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import threading
+from humble_api.humble_state import HumbleState
+
+__license__ = "MIT"
+
+
+class SyncIndex(object):
+    """
+        Skips the orders already synchronized.  Once every file of an order is
+        downloaded and verified, the order is recorded in the state database
+        with a fingerprint of its download set.  Later runs only check the
+        files of new orders and of orders whose fingerprint changed, because
+        files were added, replaced or enabled by the platform settings.
+
+        Files removed from the disk after an order was recorded are not
+        noticed; a full sync or the verify action checks every file again.
+    """
+    incremental = True
+
+    # Gamekey -> [fingerprint, downloads left, failed], for the orders whose
+    # files are being downloaded.
+    _pending = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        """
+            :return:  True if unchanged orders are skipped, which requires the
+            state database.
+        """
+        return SyncIndex.incremental and HumbleState.enabled()
+
+    @staticmethod
+    def fingerprint(humble_downloads):
+        """
+            Computes the fingerprint of the download set of an order.
+
+            :param humble_downloads:  Every HumbleDownload of the order.
+            :return:  The fingerprint, as a hexadecimal string.
+        """
+        fingerprint = hashlib.sha1()
+        for line in sorted("%s\t%s\t%s" % (hd.full_filename, hd.humble_md5,
+                                           hd.humble_file_size)
+                           for hd in humble_downloads):
+            fingerprint.update(line.encode("utf-8") + b"\n")
+        return fingerprint.hexdigest()
+
+    @staticmethod
+    def is_synced(key, fingerprint):
+        """
+            :param key:  The gamekey of the order.
+            :param fingerprint:  The current fingerprint of the order.
+            :return:  True if the order was synchronized with this download
+            set.
+        """
+        return HumbleState.order_fingerprint(key) == fingerprint
+
+    @staticmethod
+    def expect(key, fingerprint, needed_downloads):
+        """
+            Records an order once its needed downloads are all finished, or
+            right away if it has none.
+
+            :param key:  The gamekey of the order.
+            :param fingerprint:  The current fingerprint of the order.
+            :param needed_downloads:  The HumbleDownload of the order that
+            still have to be downloaded.
+            :return:  None
+        """
+        if len(needed_downloads) == 0:
+            HumbleState.record_order(key, fingerprint)
+            return
+        with SyncIndex._lock:
+            SyncIndex._pending[key] = [fingerprint, len(needed_downloads),
+                                       False]
+
+    @staticmethod
+    def finish(hd, success):
+        """
+            Accounts for a finished download, recording its order when it was
+            the last one.
+
+            :param hd:  The HumbleDownload transferred.
+            :param success:  Whether the file was downloaded and verified.
+            :return:  None
+        """
+        with SyncIndex._lock:
+            pending = SyncIndex._pending.get(hd.order_number)
+            if pending is None:
+                return
+            pending[1] -= 1
+            pending[2] = pending[2] or not success
+            if pending[1] > 0:
+                return
+            del SyncIndex._pending[hd.order_number]
+        if not pending[2]:
+            HumbleState.record_order(hd.order_number, pending[0])
+
+    @staticmethod
+    def forget(key):
+        """
+            Removes an order from the index, so that its files are checked by
+            the next run.
+
+            :param key:  The gamekey of the order.
+            :return:  None
+        """
+        if HumbleState.enabled():
+            HumbleState.remove_order(key)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+import pytest
+from humble_download import HumbleDownload
+
+
+@pytest.fixture
+def make_download():
+    """
+        Returns a function building a HumbleDownload of the product "game"
+        from the attributes of its file, without the JSON of an order.
+    """
+    def make(filename, url, file_size, md5, sha1="", key="key"):
+        cds = SimpleNamespace(download_web=url, filename=filename,
+                              file_size=file_size,
+                              human_size="%dB" % file_size, md5=md5,
+                              sha1=sha1)
+        cd = SimpleNamespace(platform="linux", machine_name="game_linux")
+        co = SimpleNamespace(product=SimpleNamespace(human_name="Game",
+                                                     machine_name="game"))
+        csp = SimpleNamespace(product_name="game")
+        return HumbleDownload(cd, cds, co, csp, key)
+    return make
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import random
+import time
+from types import SimpleNamespace
+from actions import Action
+from config_data import ConfigData
+from dedup import Dedup
+from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
+from humble_download import HumbleDownload
+
+
+def test_needed_downloads_order(monkeypatch):
+    """
+        Checks that orders retrieved concurrently are returned in the order
+        of the game keys, whatever the order in which they complete
+    """
+    def fake_needed_downloads(hapi, key):
+        time.sleep(random.random() / 100)
+        return [key]
+
+    monkeypatch.setattr(HumbleDownload, "needed_downloads_from_key",
+                        fake_needed_downloads)
+    monkeypatch.setattr(ConfigData, "order_workers", 8)
+    game_keys = ["key%d" % i for i in range(50)]
+
+    results = list(Action.needed_downloads_from_keys(None, game_keys))
+    assert([key for key, _ in results] == game_keys)
+    assert(all(downloads == [key] for key, downloads in results))
+
+
+def test_verify(tmpdir, monkeypatch, capsys):
+    """
+        Checks that the verify action reports mismatching, missing and
+        orphaned files
+    """
+    def fake_downloads(hapi, key):
+        return [SimpleNamespace(order_number=key,
+                                full_filename=str(tmpdir.join(name)),
+                                humble_md5=hashlib.md5(b"good").hexdigest())
+                for name in ["good", "bad", "missing"]]
+
+    for name, content in [("good", b"good"), ("bad", b"bad"),
+                          ("orphan", b"orphan")]:
+        tmpdir.join(name).write_binary(content)
+    monkeypatch.setattr(HumbleDownload, "downloads_from_key", fake_downloads)
+    monkeypatch.setattr(ConfigData, "download_location", str(tmpdir))
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+
+    Action.verify(None, ["key"])
+    output = capsys.readouterr().out
+    assert("[  Mismatch] %s" % tmpdir.join("bad") in output)
+    assert("[   Missing] %s" % tmpdir.join("missing") in output)
+    assert("[    Orphan] %s" % tmpdir.join("orphan") in output)
+    assert("1 files verified, 1 mismatches, 1 missing, 1 orphans." in output)
+
+
+def test_verify_separated_files(tmpdir, monkeypatch, capsys):
+    """
+        Checks that the verify action finds the files saved under a distinct
+        filename because another product has the same path
+    """
+    class FakeDownload(SimpleNamespace):
+        @property
+        def full_filename(self):
+            return str(tmpdir.join(self.filename))
+
+    contents = {"first": b"first", "second": b"second"}
+
+    def fake_downloads(hapi, key):
+        return [FakeDownload(order_number=key, filename="shared.zip",
+                             humble_md5=hashlib.md5(contents[key]).hexdigest())]
+
+    monkeypatch.setattr(HumbleDownload, "downloads_from_key", fake_downloads)
+    monkeypatch.setattr(ConfigData, "download_location", str(tmpdir))
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+    monkeypatch.setattr(HumbleState, "database_filename",
+                        str(tmpdir.join(ConfigData.STATE_DATABASE_FILENAME)))
+    monkeypatch.setattr(Dedup, "mode", Dedup.MODE_HARDLINK)
+    tmpdir.join("shared.zip").write_binary(contents["first"])
+    tmpdir.join("shared-%s.zip" % hashlib.md5(
+            contents["second"]).hexdigest()[:8]).write_binary(
+            contents["second"])
+
+    try:
+        Action.verify(None, ["first", "second"])
+    finally:
+        HumbleState.close()
+    output = capsys.readouterr().out
+    assert("2 files verified, 0 mismatches, 0 missing, 0 orphans." in output)
+
+
+def test_pipeline_download(monkeypatch):
+    """
+        Checks that the pipeline downloads the needed files of every order,
+        and starts before the last order is retrieved
+    """
+    fetched = []
+    downloaded = []
+
+    def fake_downloads(hapi, key):
+        fetched.append(key)
+        return [SimpleNamespace(key=key, needed=needed, humble_file_size=1,
+                                download_url="https://dl/%s" % key)
+                for needed in [True, False]]
+
+    def fake_needed(humble_downloads, key=None):
+        return [hd for hd in humble_downloads if hd.needed]
+
+    def fake_download(hapi, hd):
+        downloaded.append((hd.key, len(fetched)))
+
+    monkeypatch.setattr(HumbleDownload, "downloads_from_key", fake_downloads)
+    monkeypatch.setattr(HumbleDownload, "needed_downloads", fake_needed)
+    monkeypatch.setattr(Action, "download", fake_download)
+    monkeypatch.setattr(ConfigData, "order_workers", 1)
+    monkeypatch.setattr(ConfigData, "download_workers", 2)
+    monkeypatch.setattr(ConfigData, "pipeline_queue", 2)
+    game_keys = ["key%d" % i for i in range(50)]
+
+    Action.pipeline_download(None, game_keys)
+    assert(sorted(key for key, _ in downloaded) == sorted(game_keys))
+    assert(downloaded[0][1] < len(game_keys))
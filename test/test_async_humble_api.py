@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from humble_api.exceptions.humble_authentication_exception import \
+    HumbleAuthenticationException
+
+aiohttp = pytest.importorskip("aiohttp")
+from humble_api.async_humble_api import AsyncHumbleApi  # noqa: E402
+
+CONTENT = b"file" * 100000
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """ Answers like humblebundle.com for the cookie "valid" only. """
+    def do_GET(self):
+        if self.path.startswith("/file"):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CONTENT)))
+            self.end_headers()
+            self.wfile.write(CONTENT)
+            return
+        if "_simpleauth_sess=valid" not in self.headers.get("Cookie", ""):
+            body = {"error_id": "login_required",
+                    "errors": {"auth": ["Login required"]}}
+        elif self.path.startswith("/api/v1/user/order"):
+            body = [{"gamekey": "key%d" % i} for i in range(3)]
+        else:
+            key = self.path.split("/")[-1].split("?")[0]
+            body = {"gamekey": key, "subproducts": [],
+                    "product": {"machine_name": key, "human_name": key}}
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ http.server.ThreadingHTTPServer, which Python 3.6 lacks. """
+    daemon_threads = True
+
+
+def run_until_complete(coroutine):
+    """ asyncio.run, which Python 3.6 lacks. """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def api_class():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ApiHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = "http://127.0.0.1:%d" % httpd.server_address[1]
+    yield functools.partial(AsyncHumbleApi, base_url=base)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_get_orders(api_class):
+    async def run():
+        async with api_class("valid") as hapi:
+            assert(await hapi.check_login())
+            gamekeys = await hapi.get_gamekeys()
+            return gamekeys, await hapi.get_orders(gamekeys, concurrency=2)
+
+    gamekeys, orders = run_until_complete(run())
+    assert(gamekeys == ["key0", "key1", "key2"])
+    assert([order.gamekey for order in orders] == gamekeys)
+
+
+def test_authentication_error(api_class):
+    async def run():
+        async with api_class("invalid") as hapi:
+            assert(not await hapi.check_login())
+            await hapi.get_order("key0")
+
+    with pytest.raises(HumbleAuthenticationException):
+        run_until_complete(run())
+
+
+def test_download(api_class, tmpdir):
+    full_filename = str(tmpdir.join("file.bin"))
+
+    async def run():
+        async with api_class("valid") as hapi:
+            return await hapi.download(hapi.BASE_URL + "/file.bin",
+                                       full_filename, chunk_size=65536)
+
+    assert(run_until_complete(run()) == len(CONTENT))
+    assert(tmpdir.join("file.bin").read_binary() == CONTENT)
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from benchmarks.__main__ import compare, parse_command_line, run
+
+
+def test_benchmarks_run():
+    args = parse_command_line(["--size", "1", "--orders", "2",
+                               "--repeat", "1"])
+    report = run(args)
+    names = {result["benchmark"] for result in report["results"]}
+    assert(names == {"checksum", "download", "order_model", "order_memory"})
+    assert(all(result.get("wall_seconds", 1) > 0 and
+               result.get("bytes_per_order", 1) > 0
+               for result in report["results"]))
+    assert(all(ratio == 1 for _, _, ratio in compare(report, report)))
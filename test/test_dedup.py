@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+from types import SimpleNamespace
+import pytest
+from dedup import Dedup
+from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
+
+CONTENT = b"soundtrack" * 1000
+CONTENT_MD5 = hashlib.md5(CONTENT).hexdigest()
+
+
+class FakeDownload(SimpleNamespace):
+    @property
+    def full_filename(self):
+        return os.path.join(self.directory, self.filename)
+
+
+def download(tmpdir, path, md5=CONTENT_MD5, key="key"):
+    directory, filename = os.path.split(str(tmpdir.join(path)))
+    return FakeDownload(directory=directory, filename=filename,
+                        humble_md5=md5, humble_sha1="",
+                        humble_file_size=len(CONTENT), order_number=key,
+                        remove=lambda: None)
+
+
+@pytest.fixture
+def state(tmpdir, monkeypatch):
+    monkeypatch.setattr(HumbleState, "database_filename",
+                        str(tmpdir.join("state.sqlite")))
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+    monkeypatch.setattr(Dedup, "mode", Dedup.MODE_HARDLINK)
+    Dedup.reset()
+    source = str(tmpdir.join("first", "audio", "ost.zip"))
+    os.makedirs(os.path.dirname(source))
+    with open(source, "wb") as f:
+        f.write(CONTENT)
+    HumbleState.record(source, CONTENT_MD5)
+    yield source
+    HumbleState.close()
+
+
+def test_link(state, tmpdir):
+    """
+        Checks that a file with a known MD5 is linked instead of downloaded
+    """
+    hd = download(tmpdir, "second/audio/ost.zip")
+    assert(Dedup.link(hd))
+    assert(os.path.samefile(state, hd.full_filename))
+    assert(HumbleState.checksum(hd.full_filename) == CONTENT_MD5)
+    assert(Dedup.saved_files == 1 and Dedup.saved_bytes == len(CONTENT))
+
+    assert(not Dedup.link(download(tmpdir, "other.zip", "0" * 32)))
+
+
+def test_modified_source_is_ignored(state, tmpdir):
+    with open(state, "ab") as f:
+        f.write(b"more")
+    assert(not Dedup.link(download(tmpdir, "second/audio/ost.zip")))
+
+
+@pytest.mark.parametrize("mode", [Dedup.MODE_REFLINK, Dedup.MODE_COPY])
+def test_place(tmpdir, mode):
+    """
+        Checks that reflinks fall back to a copy where not supported
+    """
+    source = tmpdir.join("source")
+    source.write_binary(CONTENT)
+    target = tmpdir.join("directory", "target")
+    Dedup.place(str(source), str(target), mode)
+    assert(target.read_binary() == CONTENT)
+    assert(not os.path.samefile(str(source), str(target)))
+    assert(not tmpdir.join("directory", "target.tmp").exists())
+
+
+def test_path_collision(state, tmpdir):
+    """
+        Checks that a file colliding with another one is given a distinct
+        path, kept by later runs
+    """
+    first = download(tmpdir, "game.zip", key="first")
+    Dedup.claim(first)
+    Dedup.claim(download(tmpdir, "game.zip", key="second"))
+    third = download(tmpdir, "game.zip", "0" * 32, "third")
+    Dedup.claim(third)
+    assert(first.full_filename == str(tmpdir.join("game.zip")))
+    assert(third.filename == "game-00000000.zip")
+
+    HumbleState.record(str(tmpdir.join("game-00000000.zip")), "0" * 32,
+                       expected_md5="0" * 32, stat=os.stat(state))
+    Dedup.reset()
+    third.filename = "game.zip"
+    Dedup.claim(third)
+    assert(third.filename == "game-00000000.zip")
+
+
+def test_no_claim_when_disabled(tmpdir, monkeypatch):
+    monkeypatch.setattr(Dedup, "mode", Dedup.MODE_OFF)
+    Dedup.reset()
+    for md5 in ["0" * 32, "1" * 32]:
+        hd = download(tmpdir, "game.zip", md5)
+        Dedup.claim(hd)
+        assert(hd.filename == "game.zip")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from download_scheduler import DownloadScheduler
+
+
+class FakeDownload(object):
+    def __init__(self, host, size):
+        self.download_url = "https://%s/file%d" % (host, size)
+        self.humble_file_size = size
+
+
+def test_sort():
+    """
+        Checks the queue is ordered by file size
+    """
+    downloads = [FakeDownload("a", size) for size in [3, 1, 2]]
+    assert([hd.humble_file_size for hd in DownloadScheduler.sort(
+            downloads, DownloadScheduler.ORDER_LARGEST)] == [3, 2, 1])
+    assert([hd.humble_file_size for hd in DownloadScheduler.sort(
+            downloads, DownloadScheduler.ORDER_SMALLEST)] == [1, 2, 3])
+    assert([hd.humble_file_size for hd in DownloadScheduler.sort(
+            downloads, DownloadScheduler.ORDER_NONE)] == [3, 1, 2])
+
+
+def test_connection_limits():
+    """
+        Checks that neither the global nor the per host limit is exceeded
+    """
+    lock = threading.Lock()
+    active = {"total": 0, "a": 0, "b": 0}
+    peak = {"total": 0, "a": 0, "b": 0}
+    done = []
+
+    def transfer(hd):
+        host = DownloadScheduler.host(hd)
+        with lock:
+            active["total"] += 1
+            active[host] += 1
+            for name in ["total", host]:
+                peak[name] = max(peak[name], active[name])
+        time.sleep(0.01)
+        with lock:
+            active["total"] -= 1
+            active[host] -= 1
+            done.append(hd)
+
+    downloads = ([FakeDownload("a", size) for size in range(10)] +
+                 [FakeDownload("b", size) for size in range(10)])
+    DownloadScheduler(3, 2).run(downloads, transfer)
+
+    assert(len(done) == len(downloads))
+    assert(peak["total"] <= 3)
+    assert(peak["a"] <= 2 and peak["b"] <= 2)
+
+
+def test_error():
+    """
+        Checks that a failed transfer is reported once the workers are done
+    """
+    def transfer(hd):
+        raise IOError("failed")
+
+    try:
+        DownloadScheduler(2).run([FakeDownload("a", 1)], transfer)
+        assert(False)
+    except IOError:
+        pass
+
+
+def test_streaming():
+    """
+        Checks that submitted downloads start before the queue is closed, and
+        that submit waits while max_queued downloads are queued
+    """
+    started = threading.Event()
+    release = threading.Event()
+    done = []
+
+    def transfer(hd):
+        started.set()
+        release.wait(5)
+        done.append(hd)
+
+    scheduler = DownloadScheduler(1, 1, max_queued=1)
+    scheduler.start(transfer)
+    scheduler.submit(FakeDownload("a", 1))
+    assert(started.wait(5))
+    scheduler.submit(FakeDownload("a", 2))
+
+    blocked = threading.Thread(
+            target=scheduler.submit, args=(FakeDownload("a", 3),))
+    blocked.start()
+    blocked.join(0.1)
+    assert(blocked.is_alive())
+
+    release.set()
+    blocked.join(5)
+    scheduler.close()
+    scheduler.join()
+    assert([hd.humble_file_size for hd in done] == [1, 2, 3])
+
+
+def test_url_refreshed_during_transfer():
+    """
+        Checks that a download whose url moves to another host releases the
+        connection of the host it started on
+    """
+    def transfer(hd):
+        hd.download_url = "https://other/file"
+
+    scheduler = DownloadScheduler(1, 1)
+    scheduler.run([FakeDownload("a", size) for size in range(3)], transfer)
+    with scheduler._condition:
+        assert(scheduler._active_hosts == {"a": 0})
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+import pytest
+import requests
+from actions import Action
+from config_data import ConfigData
+from dedup import Dedup
+from humble_api.events import Events
+from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
+from humble_api.retry_policy import RetryPolicy
+from humble_download import HumbleDownload
+from sync_index import SyncIndex
+
+CONTENT = bytes(range(256)) * 4099
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """ Serves CONTENT for any path, honoring single byte ranges. """
+    def do_GET(self):
+        if self.path.startswith("/expired"):
+            self.send_response(403)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/truncated"):
+            # The connection drops halfway through the file.
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CONTENT)))
+            self.end_headers()
+            self.wfile.write(CONTENT[:len(CONTENT) // 2])
+            self.close_connection = True
+            return
+        if self.path.startswith("/short"):
+            # A complete response, shorter than the file.
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CONTENT) // 2))
+            self.end_headers()
+            self.wfile.write(CONTENT[:len(CONTENT) // 2])
+            return
+        start, end = 0, len(CONTENT) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(end, int(match.group(2)))
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" %
+                             (start, end, len(CONTENT)))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(CONTENT[start:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ http.server.ThreadingHTTPServer, which Python 3.6 lacks. """
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def download(server, tmpdir, monkeypatch, make_download):
+    monkeypatch.setattr(ConfigData, "download_location", str(tmpdir))
+    monkeypatch.setattr(ConfigData, "chunk_size", 4096)
+    return make_download("file.bin", server + "/file.bin", len(CONTENT),
+                         hashlib.md5(CONTENT).hexdigest(),
+                         hashlib.sha1(CONTENT).hexdigest())
+
+
+def read(hd):
+    with open(hd.full_filename, "rb") as f:
+        return f.read()
+
+
+def test_download(download):
+    download.download_file()
+    assert(read(download) == CONTENT)
+    # The checksum is computed while downloading
+    assert(HumbleHash.read_md5file(download.full_filename) ==
+           download.humble_md5)
+
+
+def test_resume_download(download, monkeypatch):
+    monkeypatch.setattr(ConfigData, "compute_sha1", True)
+    os.makedirs(os.path.dirname(download.full_filename))
+    with open(download.full_filename, "wb") as f:
+        f.write(CONTENT[:5000])
+    download.download_file()
+    assert(read(download) == CONTENT)
+    assert(HumbleHash.read_md5file(download.full_filename) ==
+           download.humble_md5)
+    assert(download.local_sha1 == download.humble_sha1)
+
+
+def test_hard_link_is_not_written_through(download, tmpdir):
+    """
+        Checks that a file deduplicated with a hard link is replaced, not
+        overwritten, when downloaded again
+    """
+    other = tmpdir.join("other.bin")
+    other.write_binary(CONTENT[:5000])
+    os.makedirs(os.path.dirname(download.full_filename))
+    os.link(str(other), download.full_filename)
+    download.download_file()
+    assert(read(download) == CONTENT)
+    assert(other.read_binary() == CONTENT[:5000])
+
+
+def test_parallel_status_check_is_quiet(download, monkeypatch):
+    """
+        Checks that hashing during a status check on several order workers
+        does not trigger console events
+    """
+    events = []
+    monkeypatch.setattr(ConfigData, "order_workers", 4)
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+    monkeypatch.setattr(Events, "trigger",
+                        lambda *args, **kwargs: events.append(args))
+    os.makedirs(os.path.dirname(download.full_filename))
+    with open(download.full_filename, "wb") as f:
+        f.write(CONTENT)
+    assert(download.check_status())
+    assert(events == [])
+
+
+def test_interrupted_download_keeps_partial_file(download, server,
+                                                 monkeypatch):
+    monkeypatch.setattr(HumbleDownload, "retry_policy", RetryPolicy(0))
+    download.download_url = server + "/truncated"
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        download.download_file()
+    # The preallocated space is released so the download can be resumed.
+    assert(read(download) == CONTENT[:len(CONTENT) // 2])
+
+
+def test_connection_errors_are_retried_once(download, monkeypatch):
+    """
+        Checks that a request failing to connect is retried by the retry
+        policy only, not again by the resume of interrupted transfers
+    """
+    attempts = []
+
+    def refuse(*args, **kwargs):
+        attempts.append(args)
+        raise requests.ConnectionError()
+
+    monkeypatch.setattr("time.sleep", lambda delay: None)
+    monkeypatch.setattr(HumbleDownload, "retry_policy", RetryPolicy(2))
+    monkeypatch.setattr(HumbleDownload, "download_session",
+                        lambda: SimpleNamespace(get=refuse))
+    with pytest.raises(requests.ConnectionError):
+        download.download_file()
+    assert(len(attempts) == 3)
+
+
+def test_resumable_download_is_not_preallocated(download, monkeypatch):
+    """
+        Checks that a download resumed from the size of its file is not
+        preallocated, since a killed run would leave it full size
+    """
+    preallocated = []
+    monkeypatch.setattr(HumbleDownload, "preallocate",
+                        lambda f, size: preallocated.append(size))
+    monkeypatch.setattr(ConfigData, "resume_downloads", True)
+    download.download_file()
+    assert(preallocated == [])
+    download.remove()
+    monkeypatch.setattr(ConfigData, "resume_downloads", False)
+    download.download_file()
+    assert(preallocated == [len(CONTENT)])
+    assert(read(download) == CONTENT)
+
+
+def test_short_download_is_not_synced(download, server, tmpdir,
+                                      monkeypatch):
+    """
+        Checks that a response shorter than the file fails the download,
+        keeps the partial file and leaves the order out of the SyncIndex
+    """
+    monkeypatch.setattr(HumbleState, "database_filename",
+                        str(tmpdir.join("state.sqlite")))
+    monkeypatch.setattr(SyncIndex, "incremental", True)
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+    Dedup.reset()
+    download.download_url = server + "/short"
+    try:
+        assert(HumbleDownload.needed_downloads([download], "key") ==
+               [download])
+        Action.download(None, download)
+        assert(download.status_message)
+        assert(read(download) == CONTENT[:len(CONTENT) // 2])
+        assert(HumbleState.order_fingerprint("key") is None)
+    finally:
+        HumbleState.close()
+
+
+def test_segmented_download(download, monkeypatch):
+    monkeypatch.setattr(ConfigData, "segments", 4)
+    monkeypatch.setattr(ConfigData, "segment_threshold", 0)
+    download.download_file()
+    assert(read(download) == CONTENT)
+    assert(not os.path.exists(download.segments_filename))
+    assert(download.check_status())
+
+
+def test_segmented_download_resume(download, monkeypatch):
+    """
+        Checks that an interrupted segmented download is reported as
+        incomplete and only fetches the missing parts of each segment
+    """
+    monkeypatch.setattr(ConfigData, "segments", 2)
+    monkeypatch.setattr(ConfigData, "segment_threshold", 0)
+    half = len(CONTENT) // 2
+    os.makedirs(os.path.dirname(download.full_filename))
+    with open(download.full_filename, "wb") as f:
+        f.write(CONTENT[:100] + bytes(half - 100) +
+                CONTENT[half:half + 200] + bytes(len(CONTENT) - half - 200))
+    download._HumbleDownload__save_segments(
+            [[0, half - 1, 100], [half, len(CONTENT) - 1, 200]])
+
+    assert(not download.check_status())
+    download.download_file()
+    assert(read(download) == CONTENT)
+    assert(not os.path.exists(download.segments_filename))
+
+
+def test_segmented_progress_is_synced_first(download, monkeypatch):
+    """
+        Checks that the progress of a segmented download is saved only every
+        segments_save_bytes, each time after the data is synced to disk
+    """
+    calls = []
+    save_segments = HumbleDownload._HumbleDownload__save_segments
+    fsync = os.fsync
+
+    def record_save(hd, segments):
+        calls.append("save")
+        save_segments(hd, segments)
+
+    def record_fsync(fd):
+        calls.append("fsync")
+        fsync(fd)
+
+    monkeypatch.setattr(ConfigData, "segments", 2)
+    monkeypatch.setattr(ConfigData, "segment_threshold", 0)
+    monkeypatch.setattr(HumbleDownload, "segments_save_bytes",
+                        len(CONTENT) // 4)
+    monkeypatch.setattr(HumbleDownload, "segments_save_interval", 3600)
+    monkeypatch.setattr(HumbleDownload, "_HumbleDownload__save_segments",
+                        record_save)
+    monkeypatch.setattr(os, "fsync", record_fsync)
+    download.download_file()
+    assert(read(download) == CONTENT)
+    # The plan, then a save per quarter of the file.
+    assert(calls.count("save") <= 4)
+    assert(all(calls[index - 1] == "fsync"
+               for index, call in enumerate(calls) if call == "save" and
+               index > 0))
+
+
+def test_expired_url_is_refreshed(download, server, monkeypatch):
+    """
+        Checks that a rejected url is refreshed once per order and the
+        transfer retried
+    """
+    refreshed = []
+
+    def fake_downloads(hapi, key, refresh=False):
+        refreshed.append(key)
+        return [SimpleNamespace(humble_md5=download.humble_md5,
+                                download_url=server + "/file.bin")]
+
+    monkeypatch.setattr(HumbleDownload, "downloads_from_key", fake_downloads)
+    monkeypatch.setattr(HumbleDownload, "_refreshed_urls", {})
+    download.download_url = server + "/expired/file.bin"
+    download.download_file(hapi=object())
+    assert(read(download) == CONTENT)
+    assert(refreshed == ["key"])
+
+
+def test_expiring_url_is_refreshed(download, server, monkeypatch):
+    """
+        Checks that a url about to expire is refreshed before the transfer
+    """
+    def fake_downloads(hapi, key, refresh=False):
+        return [SimpleNamespace(humble_md5=download.humble_md5,
+                                download_url=server + "/file.bin")]
+
+    monkeypatch.setattr(HumbleDownload, "downloads_from_key", fake_downloads)
+    monkeypatch.setattr(HumbleDownload, "_refreshed_urls", {})
+    download.download_url = server + "/file.bin?ttl=%d" % time.time()
+    download.download_file(hapi=object())
+    assert(download.download_url == server + "/file.bin")
+
+
+def test_orders_are_refreshed_concurrently(monkeypatch):
+    """
+        Checks that the urls of different orders are refreshed at the same
+        time
+    """
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_urls(hapi, key):
+        barrier.wait()
+        return {key: "https://dl/%s" % key}
+
+    monkeypatch.setattr(HumbleDownload, "download_urls_from_key", fake_urls)
+    monkeypatch.setattr(HumbleDownload, "_refreshed_urls", {})
+    monkeypatch.setattr(HumbleDownload, "_refresh_locks", {})
+    hds = [SimpleNamespace(order_number=key, humble_md5=key,
+                           download_url="") for key in ["a", "b"]]
+    threads = [threading.Thread(target=HumbleDownload.refresh_download_url,
+                                args=(None, hd)) for hd in hds]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert([hd.download_url for hd in hds] == ["https://dl/a", "https://dl/b"])
+
+
+def test_downloads_share_session(download, monkeypatch):
+    """
+        Checks that successive downloads reuse the pooled connection
+    """
+    monkeypatch.setattr(HumbleDownload, "session", None)
+    download.download_file()
+    session = HumbleDownload.session
+    download.remove()
+    download.download_file()
+    assert(HumbleDownload.session is session)
+    assert(read(download) == CONTENT)
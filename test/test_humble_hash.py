@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import pytest
+from humble_api.humble_hash import HumbleHash
+
+CONTENT = bytes(range(256)) * 1000
+
+
+@pytest.fixture
+def hashed_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(HumbleHash, "chunk_size", 4096)
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+    path = tmpdir.join("file.bin")
+    path.write_binary(CONTENT)
+    return str(path)
+
+
+@pytest.mark.parametrize("engine", HumbleHash.engines)
+def test_engines(hashed_file, monkeypatch, engine):
+    monkeypatch.setattr(HumbleHash, "engine", engine)
+    assert(HumbleHash.calculate_checksum(hashed_file, notify=False) ==
+           hashlib.md5(CONTENT).hexdigest())
+
+    hashes = [hashlib.md5()]
+    HumbleHash.update_hashes(hashed_file, hashes, 10000)
+    assert(hashes[0].hexdigest() == hashlib.md5(CONTENT[:10000]).hexdigest())
+
+
+@pytest.mark.parametrize("engine", HumbleHash.engines)
+def test_empty_file(tmpdir, engine):
+    path = tmpdir.join("empty.bin")
+    path.write_binary(b"")
+    with open(str(path), "rb") as f:
+        assert(list(HumbleHash.read_chunks(f, engine=engine)) == [])
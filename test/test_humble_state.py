@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import pytest
+from humble_api.humble_hash import HumbleHash
+from humble_api.humble_state import HumbleState
+
+CONTENT = b"humble" * 1000
+CONTENT_MD5 = hashlib.md5(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def state(tmpdir, monkeypatch):
+    monkeypatch.setattr(HumbleState, "database_filename",
+                        str(tmpdir.join("state.sqlite")))
+    monkeypatch.setattr(HumbleHash, "write_md5", False)
+    full_filename = str(tmpdir.join("file.bin"))
+    with open(full_filename, "wb") as f:
+        f.write(CONTENT)
+    yield full_filename
+    HumbleState.close()
+
+
+def test_checksum_is_stored(state):
+    assert(HumbleHash.checksum(state) == CONTENT_MD5)
+    assert(HumbleState.checksum(state) == CONTENT_MD5)
+    assert(not os.path.exists(HumbleHash.md5filename(state)))
+
+
+def test_modified_file_is_hashed_again(state):
+    HumbleState.record(state, "0" * 32)
+    assert(HumbleHash.checksum(state) == "0" * 32)
+
+    with open(state, "ab") as f:
+        f.write(b"more")
+    assert(HumbleState.checksum(state) == "")
+    assert(HumbleHash.checksum(state) ==
+           hashlib.md5(CONTENT + b"more").hexdigest())
+
+
+def test_import_export(state, tmpdir, monkeypatch):
+    monkeypatch.setattr(HumbleHash, "write_md5", True)
+    HumbleHash.write_md5file(state, CONTENT_MD5)
+    assert(HumbleHash.import_md5files(str(tmpdir)) == 1)
+    assert(HumbleState.checksum(state) == CONTENT_MD5)
+
+    os.remove(HumbleHash.md5filename(state))
+    assert(HumbleHash.export_md5files() == 1)
+    assert(HumbleHash.read_md5file(state) == CONTENT_MD5)
+
+
+def test_reverify_interval(state, monkeypatch):
+    HumbleState.record(state, "0" * 32)
+    assert(HumbleState.checksum(state, max_age=60) == "0" * 32)
+
+    monkeypatch.setattr(HumbleHash, "reverify_interval", 60)
+    connection = HumbleState.connection()
+    connection.execute("UPDATE files SET verified_at = verified_at - 120")
+    assert(HumbleState.checksum(state, max_age=60) == "")
+    assert(HumbleHash.checksum(state) == CONTENT_MD5)
+
+
+def test_record_keeps_expected_checksums(state):
+    HumbleState.record(state, "0" * 32, expected_md5=CONTENT_MD5)
+    HumbleState.record(state, CONTENT_MD5)
+    entry = HumbleState.get(state)
+    assert(entry["md5"] == CONTENT_MD5)
+    assert(entry["expected_md5"] == CONTENT_MD5)
+
+
+def test_removed_file_is_forgotten(state):
+    HumbleState.record(state, CONTENT_MD5)
+    os.remove(state)
+    HumbleHash.remove_md5file(state)
+    assert(HumbleState.get(state) is None)
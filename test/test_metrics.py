@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import pytest
+from benchmarks.mock_humble_server import MockHumbleServer
+from config_data import ConfigData
+from humble_api.events import Events
+from humble_api.humble_api import HumbleApi
+from humble_api.humble_state import HumbleState
+from humble_download import HumbleDownload
+from metrics import Metrics
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setattr(Metrics, "transfers", [])
+    monkeypatch.setattr(Metrics, "api_requests", {})
+    monkeypatch.setattr(Metrics, "http_retries", {})
+    monkeypatch.setattr(Events, "_callbacks", None)
+    Metrics.initialize()
+    return Metrics
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert(Metrics.percentile(values, 0.5) == 50)
+    assert(Metrics.percentile(values, 0.95) == 95)
+    assert(Metrics.percentile([], 0.5) is None)
+
+
+def test_transfer_and_api_metrics(metrics, tmpdir, monkeypatch):
+    monkeypatch.setattr(ConfigData, "download_location", str(tmpdir))
+    monkeypatch.setattr(HumbleState, "database_filename", None)
+    httpd = MockHumbleServer(orders=1, subproducts=2, file_size=30000)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        hapi = HumbleApi("mock", base_url=httpd.base_url)
+        for hd in HumbleDownload.downloads_from_key(hapi, httpd.gamekeys[0]):
+            hd.download_file(hapi)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    summary = metrics.summary()
+    assert(summary["transfers"]["count"] == 2)
+    assert(summary["transfers"]["bytes"] == 60000)
+    assert(summary["transfers"]["ttfb"]["count"] == 2)
+    assert(summary["api"]["order"]["count"] == 1)
+
+    text = metrics.prometheus(summary)
+    assert("hb_downloader_transfer_bytes_total 60000.0" in text)
+    assert('hb_downloader_api_request_seconds_count{endpoint="order"} 1.0'
+           in text)
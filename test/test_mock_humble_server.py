@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import pytest
+from benchmarks.mock_humble_server import MockHumbleServer
+from config_data import ConfigData
+from humble_api.humble_api import HumbleApi
+from humble_api.humble_state import HumbleState
+from humble_api.retry_policy import RetryPolicy
+from humble_download import HumbleDownload
+
+
+@pytest.fixture
+def mock_server():
+    httpd = MockHumbleServer(orders=3, subproducts=2, file_size=50000,
+                             error_rate=0.3)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_login(mock_server):
+    assert(HumbleApi("mock", base_url=mock_server.base_url).check_login())
+    assert(not HumbleApi("wrong", base_url=mock_server.base_url).check_login())
+
+
+def test_download_from_mock_server(mock_server, tmpdir, monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda delay: None)
+    monkeypatch.setattr(ConfigData, "download_location", str(tmpdir))
+    monkeypatch.setattr(HumbleState, "database_filename", None)
+    monkeypatch.setattr(HumbleDownload, "retry_policy", RetryPolicy(10))
+    monkeypatch.setattr(HumbleDownload, "_refreshed_urls", {})
+    hapi = HumbleApi("mock", retry_policy=RetryPolicy(10),
+                     base_url=mock_server.base_url)
+
+    gamekeys = hapi.get_gamekeys()
+    assert(gamekeys == mock_server.gamekeys)
+    downloads = HumbleDownload.downloads_from_key(hapi, gamekeys[0])
+    assert(len(downloads) == 2)
+    # Distinct files, none of which would be deduplicated.
+    assert(downloads[0].humble_md5 != downloads[1].humble_md5)
+
+    hd = downloads[0]
+    # An expired url is refreshed through the API.
+    hd.download_url = hd.download_url.split("?")[0] + "?ttl=1&t=0"
+    hd.download_file(hapi)
+    assert(hd.local_md5 == hd.humble_md5)
+
+    # Byte ranges span the bytes distinct to the file.
+    monkeypatch.setattr(ConfigData, "segments", 3)
+    monkeypatch.setattr(ConfigData, "segment_threshold", 0)
+    hd = downloads[1]
+    hd.download_file(hapi)
+    assert(hd.local_md5 == hd.humble_md5)
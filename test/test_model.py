@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from benchmarks.synthetic import order_json
+from humble_api.model.base_model import BaseModel, UnparsedModels
+from humble_api.model.download_struct import DownloadStruct
+from humble_api.model.order import Order
+
+
+def test_url_expiry():
+    """
+        Checks the expiry of the various kinds of signed urls
+    """
+    assert(DownloadStruct.url_expiry(
+            "https://dl.humble.com/game.zip?gamekey=abc&ttl=1563893021&t=ff")
+           == 1563893021)
+    assert(DownloadStruct.url_expiry(
+            "https://cdn.example.com/game.zip?Expires=1563893022&Signature=x")
+           == 1563893022)
+    assert(DownloadStruct.url_expiry(
+            "https://a.akamaihd.net/game.zip?__gda__=1563893023_ac5ab0")
+           == 1563893023)
+    assert(DownloadStruct.url_expiry("https://dl.humble.com/game.zip") is None)
+    assert(DownloadStruct.url_expiry(None) is None)
+
+
+def test_download_struct_expiry():
+    struct = DownloadStruct({
+            "md5": "0" * 32, "file_size": 1, "url": {
+                    "web": "https://dl.humble.com/game.zip?ttl=1563893021"}})
+    assert(struct.filename == "game.zip")
+    assert(struct.download_web_expiry == 1563893021)
+
+
+def test_lazy_children(monkeypatch):
+    monkeypatch.setattr(BaseModel, "keep_data", False)
+    order = Order(order_json("key", "https://dl.humble.com", subproducts=2))
+    assert(order._data is None)
+    assert(type(order._subproducts) is UnparsedModels)
+    assert(order.subscriptions is None)
+
+    download = order.subproducts[1].downloads[0]
+    assert(download.download_structs[0].filename.startswith("gamekey1_"))
+    # Lists are built once
+    assert(order.subproducts[1].downloads[0] is download)
+    assert("subproducts" in list(order))
+    assert(not hasattr(order, "__dict__"))
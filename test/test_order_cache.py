@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+from humble_api.humble_api import HumbleApi
+from humble_api.order_cache import OrderCache
+
+ORDER = {"product": {"machine_name": "bundle", "human_name": "Bundle"},
+         "gamekey": "key", "subproducts": []}
+
+
+class FakeApi(HumbleApi):
+    """ Answers order requests from a list of (status, headers) tuples. """
+    def __init__(self, order_cache, responses):
+        super(FakeApi, self).__init__("", order_cache)
+        self.responses = responses
+        self.requests = []
+
+    def _request(self, *args, **kwargs):
+        self.requests.append(kwargs.get("headers") or {})
+        status_code, headers = self.responses.pop(0)
+        return SimpleNamespace(status_code=status_code, headers=headers,
+                               json=lambda: ORDER, request=None)
+
+
+def test_fresh_order_is_not_requested(tmpdir):
+    hapi = FakeApi(OrderCache(str(tmpdir), 3600), [(200, {"ETag": "v1"})])
+    assert(hapi.get_order("key").gamekey == "key")
+    assert(hapi.get_order("key").gamekey == "key")
+    assert(len(hapi.requests) == 1)
+
+
+def test_expired_order_is_revalidated(tmpdir):
+    hapi = FakeApi(OrderCache(str(tmpdir), 0),
+                   [(200, {"ETag": "v1"}), (304, {})])
+    hapi.get_order("key")
+    assert(hapi.get_order("key").gamekey == "key")
+    assert(hapi.requests[1] == {"If-None-Match": "v1"})
+
+
+def test_refresh_bypasses_cache(tmpdir):
+    hapi = FakeApi(OrderCache(str(tmpdir), 3600),
+                   [(200, {"ETag": "v1"}), (200, {})])
+    hapi.get_order("key")
+    hapi.get_order("key", refresh=True)
+    assert(hapi.requests == [{}, {}])
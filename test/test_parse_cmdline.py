@@ -7,6 +7,7 @@ from config_data import ConfigData
 from configuration import Configuration
 
 actions = ["download", "list"]
+all_actions = actions + ["state"]
 
 
 def test_help():
@@ -14,7 +15,7 @@ def test_help():
     subprocess.check_output(["python3", "hb-downloader.py", "-h"])
 
     # Check the same with basic actions
-    for a in actions:
+    for a in all_actions:
         subprocess.check_output(["python3", "hb-downloader.py", a, "-h"])
 
 
@@ -60,3 +61,25 @@ def test_simple_parse_to_config():
     for platform in ["mac", "ebook", "audio", "asmjs"]:
         print("checking if %s is disabled as it should" % platform)
         assert(ConfigData.download_platforms.get(platform) is False)
+
+
+def test_order_workers():
+    """
+        Checks that the order worker count can be set on the command line
+    """
+    sys.argv = ["", "--order_workers", "12", "download"]
+    Configuration.load_configuration("hb-downloader-settings.yaml")
+    Configuration.parse_command_line()
+    assert(ConfigData.order_workers == 12)
+
+
+def test_state_action():
+    """
+        Checks the options of the state action
+    """
+    sys.argv = ["", "state", "--import-md5"]
+    Configuration.load_configuration("hb-downloader-settings.yaml")
+    Configuration.parse_command_line()
+    assert(ConfigData.action == "state")
+    assert(ConfigData.import_md5 is True)
+    assert(ConfigData.export_md5 is False)
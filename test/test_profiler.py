@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from profiler import Profiler
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setattr(Profiler, "enabled", True)
+    monkeypatch.setattr(Profiler, "phases", {})
+    monkeypatch.setattr(Profiler, "_start", time.monotonic())
+    return Profiler
+
+
+def test_phases(profiler):
+    for _ in range(2):
+        with profiler.phase("transfer"):
+            pass
+    profiler.add("hashing", 1.5)
+    assert(profiler.phases["transfer"][1] == 2)
+    assert(profiler.phases["hashing"][0] == 1.5)
+    report = profiler.report()
+    assert(report.index("hashing") < report.index("transfer"))
+
+
+def test_disabled_phase(monkeypatch):
+    monkeypatch.setattr(Profiler, "phases", {})
+    with Profiler.phase("transfer"):
+        pass
+    assert(Profiler.phases == {})
+
+
+def test_write_report(profiler, tmpdir, monkeypatch, capsys):
+    report_filename = str(tmpdir.join("profile.txt"))
+    monkeypatch.setattr(Profiler, "report_filename", report_filename)
+    profiler.add("transfer", 1.0)
+    profiler.write_report()
+    assert("transfer" in tmpdir.join("profile.txt").read())
+    assert("[   Profile] Profile written to %s." % report_filename in
+           capsys.readouterr().out)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from rate_limiter import RateLimiter, TokenBucket
+
+
+def test_parse_rate():
+    assert(RateLimiter.parse_rate(0) == 0)
+    assert(RateLimiter.parse_rate("512") == 512)
+    assert(RateLimiter.parse_rate("5M") == 5 * 1024 ** 2)
+    assert(RateLimiter.parse_rate("1.5k") == 1536)
+    with pytest.raises(ValueError):
+        RateLimiter.parse_rate("fast")
+
+
+def test_schedule_spanning_midnight(monkeypatch):
+    monkeypatch.setattr(RateLimiter, "max_rate", "1M")
+    monkeypatch.setattr(RateLimiter, "schedule",
+                        [{"start": "22:00", "end": "06:00", "rate": 0}])
+    at = time.struct_time((2020, 1, 1, 23, 30, 0, 0, 1, 0))
+    assert(RateLimiter.current_rate(at) == 0)
+    at = time.struct_time((2020, 1, 1, 12, 0, 0, 0, 1, 0))
+    assert(RateLimiter.current_rate(at) == 1024 ** 2)
+
+
+def test_bucket_throttles(monkeypatch):
+    delays = []
+    monkeypatch.setattr("time.sleep", delays.append)
+    bucket = TokenBucket(1000)
+    bucket.consume(1000)
+    bucket.consume(3000)
+    assert(len(delays) == 1 and delays[0] == pytest.approx(3, abs=0.1))
+    TokenBucket(0).consume(10 ** 9)
+    assert(len(delays) == 1)
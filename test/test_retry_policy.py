@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+import requests
+from humble_api.retry_policy import RetryPolicy
+
+
+def response(status_code, headers=None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {},
+                           url="https://example.com/", close=lambda: None)
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    delays = []
+    monkeypatch.setattr("time.sleep", delays.append)
+    answers = [requests.ConnectionError(), response(503),
+               response(429, {"Retry-After": "7"}), response(200)]
+
+    def request():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert(RetryPolicy(retries=3, backoff=1).send(request).status_code == 200)
+    assert(len(delays) == 3)
+    assert(0 <= delays[0] <= 1 and 0 <= delays[1] <= 2)
+    assert(delays[2] == 7)
+
+
+def test_retries_are_limited(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda delay: None)
+    answers = [response(500), response(502)]
+    policy = RetryPolicy(retries=1)
+    assert(policy.send(lambda: answers.pop(0)).status_code == 502)
+
+
+def test_delay_is_capped():
+    policy = RetryPolicy(backoff=1, max_backoff=5)
+    assert(all(policy.delay(10) <= 5 for _ in range(100)))
+    assert(policy.delay(0, response(429, {"Retry-After": "3600"})) == 5)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+from actions import Action
+from config_data import ConfigData
+from humble_download import HumbleDownload
+from run_journal import RunJournal
+
+
+@pytest.fixture
+def downloads(make_download):
+    return [make_download("file%d" % i, "https://dl/file%d" % i, 10,
+                          "%032d" % i) for i in range(3)]
+
+
+@pytest.fixture
+def journal(tmpdir, monkeypatch):
+    monkeypatch.setattr(ConfigData, "download_location", str(tmpdir))
+    monkeypatch.setattr(RunJournal, "filename",
+                        str(tmpdir.join(ConfigData.JOURNAL_FILENAME)))
+    yield tmpdir
+    RunJournal.end()
+
+
+def test_interrupted_scan_is_not_resumed(journal, downloads):
+    RunJournal.begin()
+    RunJournal.plan(downloads)
+    assert(RunJournal.load() is None)
+
+
+def test_journal(journal, downloads):
+    """
+        Checks that the files left are the planned ones not done, whatever
+        happened to the last line of the journal
+    """
+    hds = downloads
+    RunJournal.begin()
+    RunJournal.plan(hds)
+    RunJournal.scanned()
+    RunJournal.started(hds[0])
+    RunJournal.finished(hds[0], True)
+    RunJournal.started(hds[1])
+    RunJournal.finished(hds[1], False)
+    RunJournal.started(hds[2])
+    with open(RunJournal.filename, "a") as f:
+        f.write('{"event": "do')
+
+    journal_state = RunJournal.load()
+    remaining = [HumbleDownload.from_dict(download)
+                 for download in journal_state["remaining"]]
+    assert([hd.full_filename for hd in remaining] ==
+           [hd.full_filename for hd in hds[1:]])
+    assert(remaining[0].to_dict() == hds[1].to_dict())
+    assert(journal_state["failed"] == {hds[1].full_filename})
+    assert(journal_state["in_flight"] == {hds[2].full_filename})
+
+
+def test_resume_skips_scan(journal, downloads, monkeypatch):
+    hds = downloads
+    RunJournal.begin()
+    RunJournal.plan(hds)
+    RunJournal.scanned()
+    RunJournal.finished(hds[0], True)
+
+    downloaded = []
+    monkeypatch.setattr(HumbleDownload, "needed_downloads_from_key",
+                        lambda hapi, key: pytest.fail("orders scanned"))
+    monkeypatch.setattr(HumbleDownload, "download_file",
+                        lambda hd, hapi=None: downloaded.append(hd.filename))
+    Action.batch_download(None, ["key"])
+    assert(sorted(downloaded) == ["file1", "file2"])
+    assert(not journal.join(ConfigData.JOURNAL_FILENAME).exists())
+
+
+def test_resume_applies_platforms(journal, downloads, monkeypatch):
+    """
+        Checks that files of a platform turned off since the interruption
+        are not downloaded
+    """
+    hds = downloads
+    hds[1].platform = "windows"
+    RunJournal.begin()
+    RunJournal.plan(hds)
+    RunJournal.scanned()
+
+    downloaded = []
+    monkeypatch.setattr(ConfigData, "download_platforms",
+                        {"linux": True, "windows": False})
+    monkeypatch.setattr(HumbleDownload, "download_file",
+                        lambda hd, hapi=None: downloaded.append(hd.filename))
+    Action.batch_download(None, ["key"])
+    assert(sorted(downloaded) == ["file0", "file2"])
+
+
+def test_resume_applies_game_keys(journal, downloads, monkeypatch):
+    """
+        Checks that only the files of the requested orders are resumed
+    """
+    hds = downloads
+    hds[1].order_number = "other"
+    RunJournal.begin()
+    RunJournal.plan(hds)
+    RunJournal.scanned()
+
+    downloaded = []
+    monkeypatch.setattr(HumbleDownload, "download_file",
+                        lambda hd, hapi=None: downloaded.append(hd.filename))
+    Action.batch_download(None, ["key"])
+    assert(sorted(downloaded) == ["file0", "file2"])
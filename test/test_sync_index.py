@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+import pytest
+from dedup import Dedup
+from humble_api.humble_state import HumbleState
+from humble_download import HumbleDownload
+from sync_index import SyncIndex
+
+
+class FakeDownload(SimpleNamespace):
+    def check_status(self):
+        self.checked = True
+        return False
+
+
+def downloads(md5="0" * 32):
+    return [FakeDownload(order_number="key", full_filename="/games/%d" % i,
+                         humble_md5=md5, humble_file_size=i, checked=False)
+            for i in range(3)]
+
+
+@pytest.fixture
+def state(tmpdir, monkeypatch):
+    monkeypatch.setattr(HumbleState, "database_filename",
+                        str(tmpdir.join("state.sqlite")))
+    monkeypatch.setattr(SyncIndex, "incremental", True)
+    monkeypatch.setattr(Dedup, "mode", Dedup.MODE_OFF)
+    yield
+    HumbleState.close()
+
+
+def test_fingerprint():
+    assert(SyncIndex.fingerprint(downloads()) ==
+           SyncIndex.fingerprint(list(reversed(downloads()))))
+    assert(SyncIndex.fingerprint(downloads()) !=
+           SyncIndex.fingerprint(downloads("1" * 32)))
+    assert(SyncIndex.fingerprint(downloads()) !=
+           SyncIndex.fingerprint(downloads()[:2]))
+
+
+def test_synced_order_is_skipped(state):
+    """
+        Checks that an order is only recorded once all its downloads have
+        succeeded, and then skipped until its download set changes
+    """
+    needed = HumbleDownload.needed_downloads(downloads(), "key")
+    assert(len(needed) == 3 and all(hd.checked for hd in needed))
+    assert(HumbleState.order_fingerprint("key") is None)
+
+    SyncIndex.finish(needed[0], True)
+    SyncIndex.finish(needed[1], False)
+    SyncIndex.finish(needed[2], True)
+    assert(HumbleState.order_fingerprint("key") is None)
+
+    needed = HumbleDownload.needed_downloads(downloads(), "key")
+    for hd in needed:
+        SyncIndex.finish(hd, True)
+    assert(HumbleState.order_fingerprint("key") ==
+           SyncIndex.fingerprint(downloads()))
+
+    unchanged = downloads()
+    assert(HumbleDownload.needed_downloads(unchanged, "key") == [])
+    assert(not any(hd.checked for hd in unchanged))
+    # The files were replaced on humblebundle.com.
+    assert(len(HumbleDownload.needed_downloads(
+            downloads("1" * 32), "key")) == 3)
+
+    SyncIndex.forget("key")
+    assert(HumbleState.order_fingerprint("key") is None)